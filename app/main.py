@@ -5,7 +5,9 @@ import streamlit as st
 import os
 from pathlib import Path
 from dotenv import load_dotenv
-from src.core.knowledge_bases_manager import KnowledgeBasesManager
+from src.core.knowledge_bases_manager import get_shared_manager
+from src.core.ingestion_queue import get_shared_worker
+from src.core.search_engine import SearchEngine
 from src.pages.chat_page import ChatPage
 from src.pages.sidebar_page import KnowledgeBasePage
 from src.config.load_config import load_config
@@ -13,6 +15,11 @@ from src.config.load_config import load_config
 # Chargement des variables d'environnement
 load_dotenv()
 
+@st.cache_resource
+def get_search_engine(storage_directory: str) -> SearchEngine:
+    """Retourne le moteur de recherche partagé par toutes les sessions."""
+    return SearchEngine(kb_manager=get_shared_manager(storage_directory))
+
 class App:
     """Application principale de l'Assistant Documentaire."""
     
@@ -29,13 +36,15 @@ class App:
         # Chargement de la configuration
         self.config = load_config()
         
-        # Initialisation du gestionnaire de bases
+        # Gestionnaire de bases, moteur de recherche et worker d'ingestion partagés par le processus
         storage_dir = Path(self.config.knowledge_base.storage_directory).expanduser()
-        self.kb_manager = KnowledgeBasesManager(storage_directory=str(storage_dir))
+        self.kb_manager = get_shared_manager(str(storage_dir))
+        search_engine = get_search_engine(str(storage_dir))
+        ingestion_worker = get_shared_worker(self.kb_manager)
         
         # Initialisation des pages
-        self.chat_page = ChatPage(kb_manager=self.kb_manager)
-        self.kb_page = KnowledgeBasePage(self.kb_manager)
+        self.chat_page = ChatPage(kb_manager=self.kb_manager, search_engine=search_engine)
+        self.kb_page = KnowledgeBasePage(self.kb_manager, ingestion_worker=ingestion_worker)
         
         # Initialisation de l'état de session
         if 'messages' not in st.session_state:
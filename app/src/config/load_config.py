@@ -8,7 +8,7 @@ Ce module charge la configuration depuis:
 """
 
 import os
-from dataclasses import dataclass
+from dataclasses import dataclass, field
 from typing import Dict, Optional
 from pathlib import Path
 import yaml
@@ -29,12 +29,15 @@ class EmbeddingConfig:
     """Configuration du modèle d'embedding."""
     provider: str
     model: str
+    cache_enabled: bool = True
 
 @dataclass
 class RerankerConfig:
     """Configuration du modèle de reranking."""
     provider: str
     model: str
+    cache_enabled: bool = True
+    cache_max_entries: int = 100000
 
 @dataclass
 class SearchConfig:
@@ -42,6 +45,19 @@ class SearchConfig:
     max_results: int
     min_score: float
     rerank_top_k: int
+    max_workers: int = 8
+    kb_timeout: float = 30.0
+    mode_strategy: str = "all"
+    cascade_min_segments: int = 3
+    cascade_min_score: float = 0.5
+    cache_max_entries: int = 128
+    cache_ttl: float = 600.0
+    semantic_cache_enabled: bool = False
+    semantic_cache_threshold: float = 0.95
+    semantic_cache_max_entries: int = 256
+    context_max_tokens: int = 6000
+    context_min_segment_tokens: int = 100
+    global_rerank_enabled: bool = True
 
 @dataclass
 class KnowledgeBaseConfig:
@@ -51,6 +67,25 @@ class KnowledgeBaseConfig:
     max_results_per_search: int
     chunk_size: int
     min_length_for_chunking: int
+    max_open_bases: int = 16
+    max_open_bytes: int = 0
+    idle_timeout: float = 1800.0
+    vector_db_backend: str = "basic"
+    vector_dtype: str = "float32"
+    vector_quantization: str = "none"
+    rescore_factor: int = 4
+    vector_index: str = "flat"
+    prefilter_max_rows: int = 20000
+    chunk_db_backend: str = "basic"
+
+@dataclass
+class IngestionConfig:
+    """Configuration du pipeline d'ingestion."""
+    max_processes: int = 2
+    max_threads: int = 4
+    embedding_batch_size: int = 64
+    poll_interval: float = 2.0
+    lease_timeout: float = 300.0
 
 @dataclass
 class AppConfig:
@@ -62,6 +97,7 @@ class AppConfig:
     embedding: EmbeddingConfig
     reranker: RerankerConfig
     search: SearchConfig
+    ingestion: IngestionConfig = field(default_factory=IngestionConfig)
 
 def _deep_update(base_dict: Dict, update_dict: Dict) -> None:
     """Met à jour récursivement un dictionnaire.
@@ -151,7 +187,17 @@ def load_config(config_path: Optional[str] = None) -> AppConfig:
                 default_language=config_dict["knowledge_base"]["default_language"],
                 max_results_per_search=config_dict["knowledge_base"]["max_results_per_search"],
                 chunk_size=config_dict["knowledge_base"]["chunk_size"],
-                min_length_for_chunking=config_dict["knowledge_base"]["min_length_for_chunking"]
+                min_length_for_chunking=config_dict["knowledge_base"]["min_length_for_chunking"],
+                max_open_bases=config_dict["knowledge_base"].get("max_open_bases", 16),
+                max_open_bytes=config_dict["knowledge_base"].get("max_open_bytes", 0),
+                idle_timeout=config_dict["knowledge_base"].get("idle_timeout", 1800.0),
+                vector_db_backend=config_dict["knowledge_base"].get("vector_db_backend", "basic"),
+                vector_dtype=config_dict["knowledge_base"].get("vector_dtype", "float32"),
+                vector_quantization=config_dict["knowledge_base"].get("vector_quantization", "none"),
+                rescore_factor=config_dict["knowledge_base"].get("rescore_factor", 4),
+                vector_index=config_dict["knowledge_base"].get("vector_index", "flat"),
+                prefilter_max_rows=config_dict["knowledge_base"].get("prefilter_max_rows", 20000),
+                chunk_db_backend=config_dict["knowledge_base"].get("chunk_db_backend", "basic")
             ),
             logging=LoggingConfig(
                 level=config_dict["logging"]["level"],
@@ -159,16 +205,39 @@ def load_config(config_path: Optional[str] = None) -> AppConfig:
             ),
             embedding=EmbeddingConfig(
                 provider=config_dict["embedding"]["provider"],
-                model=config_dict["embedding"]["model"]
+                model=config_dict["embedding"]["model"],
+                cache_enabled=config_dict["embedding"].get("cache_enabled", True)
             ),
             reranker=RerankerConfig(
                 provider=config_dict["reranker"]["provider"],
-                model=config_dict["reranker"]["model"]
+                model=config_dict["reranker"]["model"],
+                cache_enabled=config_dict["reranker"].get("cache_enabled", True),
+                cache_max_entries=config_dict["reranker"].get("cache_max_entries", 100000)
             ),
             search=SearchConfig(
                 max_results=config_dict["search"]["max_results"],
                 min_score=config_dict["search"]["min_score"],
-                rerank_top_k=config_dict["search"]["rerank_top_k"]
+                rerank_top_k=config_dict["search"]["rerank_top_k"],
+                max_workers=config_dict["search"].get("max_workers", 8),
+                kb_timeout=config_dict["search"].get("kb_timeout", 30.0),
+                mode_strategy=config_dict["search"].get("mode_strategy", "all"),
+                cascade_min_segments=config_dict["search"].get("cascade_min_segments", 3),
+                cascade_min_score=config_dict["search"].get("cascade_min_score", 0.5),
+                cache_max_entries=config_dict["search"].get("cache_max_entries", 128),
+                cache_ttl=config_dict["search"].get("cache_ttl", 600.0),
+                semantic_cache_enabled=config_dict["search"].get("semantic_cache_enabled", False),
+                semantic_cache_threshold=config_dict["search"].get("semantic_cache_threshold", 0.95),
+                semantic_cache_max_entries=config_dict["search"].get("semantic_cache_max_entries", 256),
+                context_max_tokens=config_dict["search"].get("context_max_tokens", 6000),
+                context_min_segment_tokens=config_dict["search"].get("context_min_segment_tokens", 100),
+                global_rerank_enabled=config_dict["search"].get("global_rerank_enabled", True)
+            ),
+            ingestion=IngestionConfig(
+                max_processes=config_dict.get("ingestion", {}).get("max_processes", 2),
+                max_threads=config_dict.get("ingestion", {}).get("max_threads", 4),
+                embedding_batch_size=config_dict.get("ingestion", {}).get("embedding_batch_size", 64),
+                poll_interval=config_dict.get("ingestion", {}).get("poll_interval", 2.0),
+                lease_timeout=config_dict.get("ingestion", {}).get("lease_timeout", 300.0)
             )
         )
     except KeyError as e:
@@ -3,13 +3,32 @@ Package core contenant les composants principaux de l'application.
 
 Modules:
 - knowledge_bases_manager: Gestion des bases de connaissances
+- kb_catalog: Catalogue persistant des bases et de leurs compteurs
+- ingestion: Pipeline d'ingestion concurrente des documents
+- ingestion_queue: File d'attente persistante et worker d'ingestion
 - search_engine: Moteur de recherche
+- answer_stream: Génération des réponses en streaming
+- query_embeddings: Partage des embeddings de requête entre les bases
+- global_rerank: Reranking unique des candidats de toutes les bases
+- rerank_cache: Cache persistant des scores de reranking
+- embedding_cache: Cache disque des embeddings de chunks
+- memmap_vector_db: Stockage vectoriel projeté en mémoire
+- vector_quantization: Quantification int8 et produit des vecteurs
+- vector_index: Index FAISS approchés (IVF, HNSW) du stockage projeté
+- vector_evaluation: Mesure du rappel et de la latence de la recherche vectorielle
+- sqlite_chunk_db: Stockage des chunks dans SQLite
+- document_reference: Référence à un segment trouvé par la recherche
+- segment_merger: Fusion des segments redondants
+- context_builder: Assemblage du contexte dans un budget de tokens
+- result_cache: Cache versionné des résultats de recherche
+- semantic_cache: Cache des résultats par similarité des requêtes
 """
 
-from src.core.knowledge_bases_manager import KnowledgeBasesManager
+from src.core.knowledge_bases_manager import KnowledgeBasesManager, get_shared_manager
 from src.core.search_engine import SearchEngine
 
 __all__ = [
     'KnowledgeBasesManager',
+    'get_shared_manager',
     'SearchEngine',
 ]
@@ -0,0 +1,35 @@
+"""
+Génération des réponses en streaming.
+
+OpenAIChatAPI.make_llm_call ne rend la réponse qu'une fois entièrement
+générée. Ce module interroge le même modèle, avec les mêmes paramètres, en
+mode streaming afin d'afficher les tokens dès leur arrivée.
+"""
+
+import os
+from typing import Dict, Iterator, List
+
+from dsrag.llm import OpenAIChatAPI
+from openai import OpenAI
+
+def stream_chat_answer(llm: OpenAIChatAPI, messages: List[Dict[str, str]]) -> Iterator[str]:
+    """Génère la réponse du modèle fragment par fragment.
+    
+    Args:
+        llm: Modèle de chat dont le nom, la température et la limite de tokens sont repris
+        messages: Messages de la conversation
+        
+    Yields:
+        str: Fragments de texte dans l'ordre de génération
+    """
+    client = OpenAI(base_url=os.environ.get("DSRAG_OPENAI_BASE_URL"))
+    stream = client.chat.completions.create(
+        model=llm.model,
+        messages=messages,
+        temperature=llm.temperature,
+        max_tokens=llm.max_tokens,
+        stream=True,
+    )
+    for chunk in stream:
+        if chunk.choices and chunk.choices[0].delta.content:
+            yield chunk.choices[0].delta.content
@@ -0,0 +1,117 @@
+"""
+Assemblage du contexte fourni au LLM.
+
+Les segments trouvés sont retenus par score décroissant, dans la limite de
+SearchConfig.max_results, au-dessus de SearchConfig.min_score et dans un
+budget de tokens. Le dernier segment retenu est tronqué pour finir le budget
+s'il reste assez de place, sinon il est écarté.
+"""
+
+import logging
+from dataclasses import dataclass, field, replace
+from typing import Callable, List, Optional
+
+from src.config import config
+from src.core.document_reference import DocumentReference
+
+try:
+    import tiktoken
+except ImportError:  # Estimation approximative si tiktoken est absent
+    tiktoken = None
+
+logger = logging.getLogger(__name__)
+
+# Encodage des modèles OpenAI récents
+_ENCODING_NAME = "cl100k_base"
+_encoding = None
+
+def _get_encoding():
+    """Retourne l'encodeur tiktoken, chargé au premier appel."""
+    global _encoding
+    if _encoding is None and tiktoken is not None:
+        _encoding = tiktoken.get_encoding(_ENCODING_NAME)
+    return _encoding
+
+def count_tokens(text: str) -> int:
+    """Compte les tokens d'un texte (environ 4 caractères par token sans tiktoken)."""
+    encoding = _get_encoding()
+    if encoding is None:
+        return (len(text) + 3) // 4
+    return len(encoding.encode(text))
+
+def truncate_to_tokens(text: str, max_tokens: int) -> str:
+    """Tronque un texte à max_tokens tokens."""
+    encoding = _get_encoding()
+    if encoding is None:
+        return text[:max_tokens * 4]
+    return encoding.decode(encoding.encode(text)[:max_tokens])
+
+@dataclass
+class PackedContext:
+    """Contexte assemblé pour le prompt."""
+    segments: List[DocumentReference] = field(default_factory=list)
+    text: str = ""
+    tokens_used: int = 0
+    token_budget: int = 0
+    # Segments écartés par le score, le nombre maximal ou le budget
+    dropped: int = 0
+    truncated: int = 0
+
+def pack_context(
+    segments: List[DocumentReference],
+    max_tokens: Optional[int] = None,
+    max_results: Optional[int] = None,
+    min_score: Optional[float] = None,
+    min_segment_tokens: Optional[int] = None,
+    token_counter: Callable[[str], int] = count_tokens
+) -> PackedContext:
+    """Assemble les segments les plus pertinents dans un budget de tokens.
+
+    Args:
+        segments: Segments trouvés par la recherche
+        max_tokens: Budget de tokens du contexte
+        max_results: Nombre maximal de segments retenus
+        min_score: Score minimal d'un segment
+        min_segment_tokens: Place minimale pour retenir un segment tronqué
+        token_counter: Fonction de comptage des tokens
+
+    Returns:
+        PackedContext: Segments retenus (numérotés dans l'ordre) et texte du contexte
+    """
+    max_tokens = max_tokens if max_tokens is not None else config.search.context_max_tokens
+    max_results = max_results if max_results is not None else config.search.max_results
+    min_score = min_score if min_score is not None else config.search.min_score
+    min_segment_tokens = (
+        min_segment_tokens if min_segment_tokens is not None else config.search.context_min_segment_tokens
+    )
+
+    packed = PackedContext(token_budget=max_tokens)
+    parts = []
+    candidates = sorted(segments, key=lambda x: x.relevance_score, reverse=True)
+    for segment in candidates:
+        if len(packed.segments) >= max_results or segment.relevance_score < min_score:
+            break
+
+        header = f"[Source {len(packed.segments) + 1}] "
+        remaining = max_tokens - packed.tokens_used
+        header_tokens = token_counter(header)
+        text_tokens = token_counter(segment.text)
+        if header_tokens + text_tokens > remaining:
+            available = remaining - header_tokens
+            if available < min_segment_tokens:
+                break
+            segment = replace(segment, text=truncate_to_tokens(segment.text, available))
+            text_tokens = token_counter(segment.text)
+            packed.truncated += 1
+
+        parts.append(header + segment.text)
+        packed.segments.append(segment)
+        packed.tokens_used += header_tokens + text_tokens
+
+    packed.dropped = len(candidates) - len(packed.segments)
+    packed.text = "\n\n".join(parts)
+    logger.info(
+        f"Contexte: {len(packed.segments)} segments, {packed.tokens_used}/{max_tokens} tokens "
+        f"({packed.dropped} écartés, {packed.truncated} tronqués)"
+    )
+    return packed
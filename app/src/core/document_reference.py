@@ -0,0 +1,17 @@
+"""
+Référence à un segment de document retourné par la recherche.
+"""
+
+from dataclasses import dataclass
+from typing import Optional, Tuple
+
+@dataclass
+class DocumentReference:
+    """Référence à un document trouvé lors d'une recherche."""
+    doc_id: str
+    kb_id: str
+    text: str
+    relevance_score: float
+    page_numbers: Tuple[int, int]
+    search_mode: str
+    chunk_range: Optional[Tuple[int, int]] = None
@@ -0,0 +1,219 @@
+"""
+Cache disque des embeddings de chunks.
+
+Réingérer un PDF modifié, reconstruire une base ou créer une base sur le même
+corpus réembarque normalement tous les chunks, alors que la plupart des textes
+n'ont pas changé. Les embeddings sont ici indexés par le modèle (avec sa
+dimension) et l'empreinte SHA-256 du texte, et seuls les textes inconnus sont
+envoyés à l'API.
+
+Chaque modèle dispose de trois fichiers dans le répertoire du cache :
+- <clé>.json : configuration du modèle et dimension des vecteurs
+- <clé>.f32 : vecteurs float32 bruts, ajoutés à la suite
+- <clé>.idx : empreintes de 32 octets des textes, dans le même ordre
+
+Les ajouts sont sérialisés entre processus par un verrou sur <clé>.lock ; les
+numéros de ligne sont déduits de la taille des fichiers sous ce verrou. Les
+vecteurs étant écrits avant les empreintes, chaque empreinte complète désigne
+une ligne présente : les lectures, sans verrou, reprennent les empreintes
+ajoutées par les autres processus.
+"""
+
+import hashlib
+import json
+import os
+import threading
+from typing import Dict, List, Optional, Union
+
+import numpy as np
+from dsrag.embedding import Embedding
+
+from src.utils.file_lock import exclusive_file_lock
+
+_DIGEST_SIZE = 32
+
+def _digest(text: str) -> bytes:
+    """Empreinte SHA-256 binaire d'un texte."""
+    return hashlib.sha256(text.encode("utf-8")).digest()
+
+class _ModelFiles:
+    """Fichiers et index en mémoire du cache d'un modèle."""
+
+    def __init__(self, directory: str, model_key: str):
+        name = hashlib.sha256(model_key.encode("utf-8")).hexdigest()[:24]
+        self.meta_path = os.path.join(directory, f"{name}.json")
+        self.vectors_path = os.path.join(directory, f"{name}.f32")
+        self.index_path = os.path.join(directory, f"{name}.idx")
+        self.lock_path = os.path.join(directory, f"{name}.lock")
+        self.model_key = model_key
+        self.dimension: Optional[int] = None
+        self.rows: Dict[bytes, int] = {}
+        # Nombre d'empreintes lues dans l'index (lignes couvertes par rows)
+        self.row_count = 0
+        self.lock = threading.Lock()
+        self.refresh()
+
+    def refresh(self) -> None:
+        """Lit les empreintes ajoutées depuis la dernière lecture, y compris par un autre processus.
+
+        Une fin de fichier incomplète (écriture en cours ou interrompue) est
+        ignorée ; elle n'est jamais tronquée ici (voir repair).
+        """
+        if self.dimension is None:
+            if not os.path.exists(self.meta_path):
+                return
+            with open(self.meta_path, "r") as f:
+                self.dimension = json.load(f)["dimension"]
+        if not os.path.exists(self.index_path):
+            return
+        with open(self.index_path, "rb") as f:
+            f.seek(self.row_count * _DIGEST_SIZE)
+            index = f.read()
+        new_rows = len(index) // _DIGEST_SIZE
+        for offset in range(new_rows):
+            self.rows.setdefault(index[offset * _DIGEST_SIZE:(offset + 1) * _DIGEST_SIZE], self.row_count + offset)
+        self.row_count += new_rows
+
+    def repair(self) -> int:
+        """Aligne les deux fichiers après une écriture interrompue (verrou de fichier tenu).
+
+        Returns:
+            Nombre de lignes complètes, numéro de la prochaine ligne ajoutée
+        """
+        row_size = 4 * self.dimension
+        index_size = os.path.getsize(self.index_path) if os.path.exists(self.index_path) else 0
+        vectors_size = os.path.getsize(self.vectors_path) if os.path.exists(self.vectors_path) else 0
+        row_count = min(index_size // _DIGEST_SIZE, vectors_size // row_size)
+        if index_size != row_count * _DIGEST_SIZE:
+            os.truncate(self.index_path, row_count * _DIGEST_SIZE)
+        if vectors_size != row_count * row_size:
+            os.truncate(self.vectors_path, row_count * row_size)
+        return row_count
+
+class EmbeddingDiskCache:
+    """Cache des embeddings indexé par modèle et par empreinte de texte."""
+
+    def __init__(self, directory: str):
+        """Initialise le cache.
+
+        Args:
+            directory: Répertoire des fichiers du cache
+        """
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+        self.hits = 0
+        self.misses = 0
+        self._models: Dict[str, _ModelFiles] = {}
+        self._lock = threading.Lock()
+
+    def _files(self, model_key: str) -> _ModelFiles:
+        """Retourne les fichiers d'un modèle, chargés au premier accès."""
+        with self._lock:
+            files = self._models.get(model_key)
+            if files is None:
+                files = _ModelFiles(self.directory, model_key)
+                self._models[model_key] = files
+            return files
+
+    def get_many(self, model_key: str, texts: List[str]) -> Dict[int, List[float]]:
+        """Retourne les embeddings connus, par position dans texts."""
+        files = self._files(model_key)
+        with files.lock:
+            files.refresh()
+            if files.dimension is None or not files.rows:
+                self.misses += len(texts)
+                return {}
+            positions = {}
+            for position, text in enumerate(texts):
+                row = files.rows.get(_digest(text))
+                if row is not None:
+                    positions[position] = row
+            self.hits += len(positions)
+            self.misses += len(texts) - len(positions)
+            if not positions:
+                return {}
+            vectors = np.memmap(
+                files.vectors_path,
+                dtype=np.float32,
+                mode="r",
+                shape=(files.row_count, files.dimension)
+            )
+            return {position: vectors[row].tolist() for position, row in positions.items()}
+
+    def put_many(self, model_key: str, texts: List[str], vectors: List[List[float]]) -> None:
+        """Ajoute des embeddings au cache (les textes déjà présents sont ignorés)."""
+        if not texts:
+            return
+        files = self._files(model_key)
+        with files.lock, exclusive_file_lock(files.lock_path):
+            files.refresh()
+            if files.dimension is None:
+                files.dimension = len(vectors[0])
+                temporary_path = f"{files.meta_path}.tmp"
+                with open(temporary_path, "w") as f:
+                    json.dump({"model": model_key, "dimension": files.dimension}, f)
+                os.replace(temporary_path, files.meta_path)
+
+            new_digests = {}
+            for text, vector in zip(texts, vectors):
+                digest = _digest(text)
+                if digest in files.rows or digest in new_digests or len(vector) != files.dimension:
+                    continue
+                new_digests[digest] = vector
+            if not new_digests:
+                return
+
+            # Aucun autre ajout en cours : toutes les lignes des fichiers ont été lues par refresh
+            first_row = files.repair()
+            # Vecteurs écrits avant les empreintes : l'index ne désigne jamais une ligne absente
+            with open(files.vectors_path, "ab") as f:
+                np.asarray(list(new_digests.values()), dtype=np.float32).tofile(f)
+            with open(files.index_path, "ab") as f:
+                f.write(b"".join(new_digests))
+            # Lignes enregistrées une fois écrites
+            for offset, digest in enumerate(new_digests):
+                files.rows[digest] = first_row + offset
+            files.row_count = first_row + len(new_digests)
+
+    def stats(self) -> Dict[str, int]:
+        """Retourne les compteurs du cache."""
+        with self._lock:
+            entries = sum(len(files.rows) for files in self._models.values())
+        return {"hits": self.hits, "misses": self.misses, "entries": entries}
+
+class CachedEmbedding(Embedding):
+    """Modèle d'embedding qui sert les chunks déjà connus depuis le cache disque.
+
+    Les embeddings de requête sont délégués tels quels au modèle d'origine, et
+    la sérialisation reste celle du modèle d'origine : les métadonnées de la
+    base ne sont pas modifiées.
+    """
+
+    def __init__(self, embedding_model: Embedding, cache: EmbeddingDiskCache):
+        super().__init__(dimension=embedding_model.dimension)
+        self.embedding_model = embedding_model
+        self.cache = cache
+        self.model_key = json.dumps(embedding_model.to_dict(), sort_keys=True)
+
+    def get_embeddings(self, text: Union[str, List[str]], input_type: Optional[str] = None):
+        if input_type == "query":
+            return self.embedding_model.get_embeddings(text, input_type)
+
+        texts = [text] if isinstance(text, str) else list(text)
+        vectors = self.cache.get_many(self.model_key, texts)
+
+        # Un texte répété dans le lot n'est envoyé qu'une fois
+        missing = list(dict.fromkeys(texts[position] for position in range(len(texts)) if position not in vectors))
+        if missing:
+            new_vectors = self.embedding_model.get_embeddings(missing, input_type)
+            self.cache.put_many(self.model_key, missing, new_vectors)
+            by_text = dict(zip(missing, new_vectors))
+            for position, t in enumerate(texts):
+                if position not in vectors:
+                    vectors[position] = by_text[t]
+
+        ordered = [vectors[position] for position in range(len(texts))]
+        return ordered[0] if isinstance(text, str) else ordered
+
+    def to_dict(self):
+        return self.embedding_model.to_dict()
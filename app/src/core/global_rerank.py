@@ -0,0 +1,86 @@
+"""
+Reranking global des candidats de toutes les bases.
+
+Sans ce module, chaque appel à kb.query() ou kb.search() lance son propre
+appel au reranker, pour chaque mode RSE et chaque base. Le moteur de
+recherche réunit ici les meilleurs candidats vectoriels de toutes les bases
+interrogées et les soumet au reranker en un seul appel, limité à
+SearchConfig.rerank_top_k candidats. Les scores obtenus sont ensuite servis
+aux bases par un reranker enveloppe, avant la construction des segments RSE.
+"""
+
+import json
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Dict, Iterator, List, Optional, Tuple
+from dsrag.reranker import Reranker
+
+ChunkKey = Tuple[str, int]
+
+def reranker_key(reranker: Reranker) -> str:
+    """Retourne la clé d'un reranker (sa configuration sérialisée)."""
+    if isinstance(reranker, GlobalRerankReranker):
+        reranker = reranker.reranker
+    return json.dumps(reranker.to_dict(), sort_keys=True)
+
+def chunk_key(result: Dict) -> ChunkKey:
+    """Retourne la clé (doc_id, chunk_index) d'un résultat de recherche vectorielle."""
+    metadata = result.get("metadata", {})
+    return metadata.get("doc_id", ""), metadata.get("chunk_index", 0)
+
+# Scores du reranking global de la question en cours : (requête, scores par base).
+# Un contexte par appel, propagé aux threads du moteur de recherche
+_current_scores: ContextVar[Optional[Tuple[str, Dict[str, Dict[ChunkKey, float]]]]] = ContextVar(
+    "global_rerank_scores", default=None
+)
+
+@contextmanager
+def global_rerank_scores(query: str, scores: Dict[str, Dict[ChunkKey, float]]) -> Iterator[None]:
+    """Sert des scores du reranking global aux recherches du contexte courant.
+
+    Args:
+        query: Requête pour laquelle les scores ont été calculés
+        scores: Scores des candidats retenus, par ID de base (une base absente
+            conserve son reranking habituel)
+    """
+    token = _current_scores.set((query, scores))
+    try:
+        yield
+    finally:
+        _current_scores.reset(token)
+
+def current_rerank_scores(kb_id: str, query: str) -> Optional[Dict[ChunkKey, float]]:
+    """Retourne les scores d'une base pour la requête du contexte courant, ou None."""
+    current = _current_scores.get()
+    if current is None or current[0] != query:
+        return None
+    return current[1].get(kb_id)
+
+class GlobalRerankReranker(Reranker):
+    """Reranker qui sert les scores du reranking global.
+
+    Pour une requête passée par le reranking global dans le contexte courant
+    (voir global_rerank_scores), seuls les candidats retenus sont renvoyés,
+    avec leur score global. Les autres requêtes sont déléguées au reranker
+    d'origine, dont la sérialisation est conservée.
+    """
+
+    def __init__(self, reranker: Reranker, kb_id: str):
+        self.reranker = reranker
+        self.kb_id = kb_id
+
+    def rerank_search_results(self, query: str, search_results: List[Dict]) -> List[Dict]:
+        scores = current_rerank_scores(self.kb_id, query)
+        if scores is None:
+            return self.reranker.rerank_search_results(query, search_results)
+
+        reranked = []
+        for result in search_results:
+            score = scores.get(chunk_key(result))
+            if score is not None:
+                reranked.append({**result, "similarity": score})
+        reranked.sort(key=lambda result: result["similarity"], reverse=True)
+        return reranked
+
+    def to_dict(self):
+        return self.reranker.to_dict()
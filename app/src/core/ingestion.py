@@ -0,0 +1,233 @@
+"""
+Pipeline d'ingestion par lots des documents.
+
+Les étapes de KnowledgeBase.add_document sont exécutées avec une concurrence
+adaptée à chacune :
+- analyse et découpage des fichiers (CPU) sur un pool de processus
+- auto-contexte (appels LLM) et embeddings (appels API) sur un pool de threads,
+  les embeddings étant envoyés par lots
+- écriture dans les stockages de la base, sérialisée par base
+
+Un échec sur un fichier est rapporté sans interrompre le reste du lot.
+
+Chaque fichier est identifié par l'empreinte SHA-256 de son contenu : un
+contenu déjà présent dans la base est ignoré sans analyse, et un contenu
+modifié sous un doc_id existant remplace l'ancienne version du document.
+"""
+
+import logging
+from concurrent.futures import FIRST_COMPLETED, Future, ProcessPoolExecutor, ThreadPoolExecutor, wait
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from dsrag.add_document import add_chunks_to_db, add_vectors_to_db, auto_context
+from dsrag.dsparse.main import parse_and_chunk
+from dsrag.knowledge_base import KnowledgeBase
+
+from src.config import config
+from src.core.knowledge_bases_manager import KnowledgeBasesManager
+from src.utils.hashing import file_sha256
+
+@dataclass
+class IngestionItem:
+    """Document à ingérer et suivi de son état."""
+    doc_id: str
+    file_path: str
+    document_title: str = ""
+    auto_context_config: Dict[str, Any] = field(default_factory=dict)
+    file_parsing_config: Dict[str, Any] = field(default_factory=dict)
+    semantic_sectioning_config: Dict[str, Any] = field(default_factory=dict)
+    chunking_config: Dict[str, Any] = field(default_factory=dict)
+    metadata: Dict[str, Any] = field(default_factory=dict)
+    # Identifiant complémentaire transmis au stockage des chunks (voir KnowledgeBase.add_document)
+    supp_id: str = ""
+    # Empreinte SHA-256 du fichier, calculée à l'ingestion si absente
+    content_hash: Optional[str] = None
+    # "add" pour un nouveau document, "update" pour le remplacement d'un document existant
+    action: str = "add"
+    # queued, parsing, embedding, done, skipped ou failed
+    status: str = "queued"
+    # Motif d'un document ignoré
+    message: Optional[str] = None
+    error: Optional[str] = None
+
+def _parse_document(kb_id: str, item: IngestionItem, file_system: Any) -> Tuple[List[Dict], List[Dict]]:
+    """Analyse et découpe un fichier (exécuté dans un processus séparé)."""
+    return parse_and_chunk(
+        kb_id=kb_id,
+        doc_id=item.doc_id,
+        file_parsing_config=item.file_parsing_config,
+        semantic_sectioning_config=item.semantic_sectioning_config,
+        chunking_config=item.chunking_config,
+        file_system=file_system,
+        file_path=item.file_path,
+    )
+
+class IngestionPipeline:
+    """Ingestion concurrente d'un lot de documents dans une base."""
+
+    def __init__(
+        self,
+        kb_manager: KnowledgeBasesManager,
+        max_processes: Optional[int] = None,
+        max_threads: Optional[int] = None,
+        embedding_batch_size: Optional[int] = None
+    ):
+        """Initialise le pipeline.
+
+        Args:
+            kb_manager: Gestionnaire des bases de connaissances
+            max_processes: Taille du pool de processus pour l'analyse des fichiers
+            max_threads: Taille du pool de threads pour les appels LLM et embedding
+            embedding_batch_size: Nombre de chunks par requête d'embedding
+        """
+        self.kb_manager = kb_manager
+        self.max_processes = max_processes or config.ingestion.max_processes
+        self.max_threads = max_threads or config.ingestion.max_threads
+        self.embedding_batch_size = embedding_batch_size or config.ingestion.embedding_batch_size
+        self.logger = logging.getLogger(__name__)
+
+    def _embed(self, kb: KnowledgeBase, chunks_to_embed: List[str]) -> List[Any]:
+        """Calcule les embeddings des chunks par lots de embedding_batch_size."""
+        embeddings = []
+        for start in range(0, len(chunks_to_embed), self.embedding_batch_size):
+            batch = chunks_to_embed[start:start + self.embedding_batch_size]
+            embeddings.extend(kb.embedding_model.get_embeddings(batch, input_type="document"))
+        return embeddings
+
+    def _enrich_and_store(
+        self,
+        kb_id: str,
+        kb: KnowledgeBase,
+        item: IngestionItem,
+        sections: List[Dict],
+        chunks: List[Dict]
+    ) -> IngestionItem:
+        """Auto-contexte, embeddings puis écriture d'un document déjà découpé."""
+        document_text = "".join(section["content"] for section in sections)
+        chunks, chunks_to_embed = auto_context(
+            auto_context_model=kb.auto_context_model,
+            sections=sections,
+            chunks=chunks,
+            text=document_text,
+            doc_id=item.doc_id,
+            document_title=item.document_title,
+            auto_context_config=item.auto_context_config,
+            language=kb.kb_metadata.get("language", config.knowledge_base.default_language),
+        )
+        chunk_embeddings = self._embed(kb, chunks_to_embed)
+
+        def write(kb: KnowledgeBase) -> None:
+            add_chunks_to_db(
+                chunk_db=kb.chunk_db,
+                chunks=chunks,
+                chunks_to_embed=chunks_to_embed,
+                chunk_embeddings=chunk_embeddings,
+                metadata=item.metadata,
+                doc_id=item.doc_id,
+                supp_id=item.supp_id,
+            )
+            add_vectors_to_db(
+                vector_db=kb.vector_db,
+                chunks=chunks,
+                chunk_embeddings=chunk_embeddings,
+                metadata=item.metadata,
+                doc_id=item.doc_id,
+            )
+
+        # L'ancienne version n'est retirée qu'une fois la nouvelle prête à être écrite,
+        # sous le même verrou d'écriture
+        self.kb_manager.write_document(kb_id, item.doc_id, write, item.content_hash)
+        item.status = "done"
+        return item
+
+    def ingest(
+        self,
+        kb_id: str,
+        items: List[IngestionItem],
+        on_progress: Optional[Callable[[IngestionItem], None]] = None,
+        on_stage: Optional[Callable[[IngestionItem], None]] = None
+    ) -> List[IngestionItem]:
+        """Ingère un lot de documents dans une base.
+
+        Args:
+            kb_id: ID de la base de connaissances
+            items: Documents à ingérer
+            on_progress: Appelé depuis le thread appelant à chaque document
+                terminé, ignoré ou en échec
+            on_stage: Appelé depuis le thread appelant quand un document passe
+                à l'étape d'analyse puis à celle d'embedding
+
+        Returns:
+            Les éléments du lot avec leur état final
+        """
+        def report(item: IngestionItem) -> None:
+            if on_progress:
+                on_progress(item)
+
+        def stage(item: IngestionItem, status: str) -> None:
+            item.status = status
+            if on_stage:
+                on_stage(item)
+
+        def fail(item: IngestionItem, error: Exception) -> None:
+            item.status = "failed"
+            item.error = str(error)
+            self.logger.error(f"Erreur lors de l'ingestion de {item.doc_id} dans {kb_id}: {item.error}")
+            report(item)
+
+        kb = self.kb_manager.get_knowledge_base(kb_id)
+        if not kb:
+            raise ValueError(f"Base de connaissances {kb_id} introuvable")
+
+        catalog = self.kb_manager.catalog
+        existing_doc_ids = self.kb_manager.get_document_ids(kb_id)
+        batch_hashes: Dict[str, str] = {}
+        pending = []
+        for item in items:
+            try:
+                if item.content_hash is None:
+                    item.content_hash = file_sha256(item.file_path)
+            except OSError as e:
+                fail(item, e)
+                continue
+
+            duplicate = batch_hashes.get(item.content_hash) or catalog.find_document_by_hash(kb_id, item.content_hash)
+            if duplicate is not None:
+                item.status = "skipped"
+                item.message = f"contenu identique à {duplicate}" if duplicate != item.doc_id else "déjà présent"
+                report(item)
+                continue
+
+            if item.doc_id in existing_doc_ids:
+                item.action = "update"
+            batch_hashes[item.content_hash] = item.doc_id
+            pending.append(item)
+
+        with ProcessPoolExecutor(max_workers=self.max_processes) as processes, \
+                ThreadPoolExecutor(max_workers=self.max_threads, thread_name_prefix="ingestion") as threads:
+            futures: Dict[Future, Tuple[str, IngestionItem]] = {}
+            for item in pending:
+                stage(item, "parsing")
+                futures[processes.submit(_parse_document, kb_id, item, kb.file_system)] = ("parse", item)
+
+            # Chaque document découpé passe immédiatement à l'étape suivante
+            while futures:
+                done, _ = wait(futures, return_when=FIRST_COMPLETED)
+                for future in done:
+                    step, item = futures.pop(future)
+                    try:
+                        result = future.result()
+                    except Exception as e:
+                        fail(item, e)
+                        continue
+                    if step == "parse":
+                        sections, chunks = result
+                        stage(item, "embedding")
+                        futures[threads.submit(self._enrich_and_store, kb_id, kb, item, sections, chunks)] = ("store", item)
+                    else:
+                        verb = "mis à jour dans" if item.action == "update" else "ajouté à"
+                        self.logger.info(f"Document {item.doc_id} {verb} la base {kb_id}")
+                        report(item)
+
+        return items
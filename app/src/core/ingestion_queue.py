@@ -0,0 +1,406 @@
+"""
+File d'attente persistante des ingestions.
+
+Les lots de documents déposés dans l'interface sont enregistrés dans une base
+SQLite du répertoire de stockage, avec une copie des fichiers, puis traités
+par un worker en arrière-plan. L'état de chaque document (queued, parsing,
+embedding, done, skipped, failed) est conservé au fil du traitement :
+l'interface se contente de l'interroger, et un lot interrompu par un arrêt du
+processus est repris au démarrage suivant.
+
+Un lot en cours est réservé par un bail renouvelé par son worker. Un bail
+expiré signale un worker disparu : le lot peut alors être repris par un autre.
+"""
+
+import json
+import logging
+import os
+import shutil
+import sqlite3
+import threading
+import time
+import uuid
+from contextlib import closing, contextmanager
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+from src.config import config
+from src.core.ingestion import IngestionItem, IngestionPipeline
+from src.core.knowledge_bases_manager import KnowledgeBasesManager
+
+# États des documents qui ne seront plus modifiés
+FINAL_STATUSES = ("done", "skipped", "failed")
+
+# Champs de IngestionItem conservés tels quels dans la colonne payload
+_PAYLOAD_FIELDS = (
+    "file_path",
+    "document_title",
+    "auto_context_config",
+    "file_parsing_config",
+    "semantic_sectioning_config",
+    "chunking_config",
+    "metadata",
+    "supp_id",
+)
+
+class IngestionJobQueue:
+    """File SQLite des lots d'ingestion et de l'état de leurs documents."""
+
+    def __init__(self, storage_directory: str):
+        """Initialise la file et crée les tables si nécessaire.
+
+        Args:
+            storage_directory: Répertoire de stockage des bases
+        """
+        self.directory = os.path.join(storage_directory, "ingestion_queue")
+        os.makedirs(self.directory, exist_ok=True)
+        self.db_path = os.path.join(self.directory, "jobs.sqlite3")
+        self._lock = threading.Lock()
+        with self._connect() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS ingestion_jobs (
+                    job_id TEXT PRIMARY KEY,
+                    kb_id TEXT NOT NULL,
+                    status TEXT NOT NULL DEFAULT 'queued',
+                    worker_id TEXT,
+                    lease_expires REAL NOT NULL DEFAULT 0,
+                    created_at REAL NOT NULL,
+                    updated_at REAL NOT NULL
+                )
+                """
+            )
+            conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS ingestion_items (
+                    job_id TEXT NOT NULL,
+                    position INTEGER NOT NULL,
+                    doc_id TEXT NOT NULL,
+                    payload TEXT NOT NULL,
+                    content_hash TEXT,
+                    action TEXT NOT NULL DEFAULT 'add',
+                    status TEXT NOT NULL DEFAULT 'queued',
+                    message TEXT,
+                    error TEXT,
+                    updated_at REAL NOT NULL,
+                    PRIMARY KEY (job_id, position)
+                )
+                """
+            )
+            conn.execute(
+                "CREATE INDEX IF NOT EXISTS idx_ingestion_jobs_status ON ingestion_jobs (status, created_at)"
+            )
+
+    @contextmanager
+    def _connect(self) -> Iterator[sqlite3.Connection]:
+        """Ouvre une connexion dédiée et valide la transaction en sortie."""
+        with self._lock, closing(sqlite3.connect(self.db_path, timeout=30)) as conn:
+            conn.row_factory = sqlite3.Row
+            with conn:
+                yield conn
+
+    def create_job_directory(self) -> Tuple[str, str]:
+        """Réserve un identifiant de lot et le répertoire de ses fichiers.
+
+        Returns:
+            L'identifiant du lot et le répertoire où copier ses fichiers
+        """
+        job_id = uuid.uuid4().hex
+        path = os.path.join(self.directory, "uploads", job_id)
+        os.makedirs(path, exist_ok=True)
+        return job_id, path
+
+    def enqueue(self, job_id: str, kb_id: str, items: List[IngestionItem]) -> str:
+        """Enregistre un lot de documents à ingérer.
+
+        Args:
+            job_id: Identifiant obtenu par create_job_directory
+            kb_id: ID de la base de connaissances cible
+            items: Documents du lot, dont les fichiers sont dans le répertoire du lot
+
+        Returns:
+            L'identifiant du lot
+        """
+        now = time.time()
+        with self._connect() as conn:
+            conn.execute(
+                "INSERT INTO ingestion_jobs (job_id, kb_id, created_at, updated_at) VALUES (?, ?, ?, ?)",
+                (job_id, kb_id, now, now)
+            )
+            conn.executemany(
+                """
+                INSERT INTO ingestion_items (job_id, position, doc_id, payload, content_hash, updated_at)
+                VALUES (?, ?, ?, ?, ?, ?)
+                """,
+                [
+                    (
+                        job_id,
+                        position,
+                        item.doc_id,
+                        json.dumps({name: getattr(item, name) for name in _PAYLOAD_FIELDS}),
+                        item.content_hash,
+                        now
+                    )
+                    for position, item in enumerate(items)
+                ]
+            )
+        return job_id
+
+    def claim_next(self, worker_id: str, lease_timeout: float) -> Optional[Tuple[str, str, Dict[int, IngestionItem]]]:
+        """Réserve le plus ancien lot en attente ou dont le bail a expiré.
+
+        Les documents du lot qui n'étaient pas terminés sont remis en attente.
+
+        Args:
+            worker_id: Identifiant du worker
+            lease_timeout: Durée du bail en secondes
+
+        Returns:
+            L'identifiant du lot, sa base et ses documents à traiter par
+            position, ou None si la file est vide
+        """
+        now = time.time()
+        with self._connect() as conn:
+            row = conn.execute(
+                """
+                SELECT job_id, kb_id FROM ingestion_jobs
+                WHERE status = 'queued' OR (status = 'running' AND lease_expires < ?)
+                ORDER BY created_at
+                LIMIT 1
+                """,
+                (now,)
+            ).fetchone()
+            if row is None:
+                return None
+            job_id, kb_id = row["job_id"], row["kb_id"]
+            claimed = conn.execute(
+                """
+                UPDATE ingestion_jobs
+                SET status = 'running', worker_id = ?, lease_expires = ?, updated_at = ?
+                WHERE job_id = ? AND (status = 'queued' OR (status = 'running' AND lease_expires < ?))
+                """,
+                (worker_id, now + lease_timeout, now, job_id, now)
+            ).rowcount
+            if not claimed:
+                return None
+            conn.execute(
+                f"""
+                UPDATE ingestion_items SET status = 'queued', updated_at = ?
+                WHERE job_id = ? AND status NOT IN ({",".join("?" * len(FINAL_STATUSES))})
+                """,
+                (now, job_id, *FINAL_STATUSES)
+            )
+            rows = conn.execute(
+                "SELECT * FROM ingestion_items WHERE job_id = ? AND status = 'queued' ORDER BY position",
+                (job_id,)
+            ).fetchall()
+
+        items = {
+            row["position"]: IngestionItem(
+                doc_id=row["doc_id"],
+                content_hash=row["content_hash"],
+                **json.loads(row["payload"])
+            )
+            for row in rows
+        }
+        return job_id, kb_id, items
+
+    def renew_lease(self, job_id: str, worker_id: str, lease_timeout: float) -> None:
+        """Prolonge le bail d'un lot en cours."""
+        now = time.time()
+        with self._connect() as conn:
+            conn.execute(
+                """
+                UPDATE ingestion_jobs SET lease_expires = ?, updated_at = ?
+                WHERE job_id = ? AND worker_id = ? AND status = 'running'
+                """,
+                (now + lease_timeout, now, job_id, worker_id)
+            )
+
+    def update_item(self, job_id: str, position: int, item: IngestionItem) -> None:
+        """Enregistre l'état courant d'un document."""
+        with self._connect() as conn:
+            conn.execute(
+                """
+                UPDATE ingestion_items
+                SET status = ?, action = ?, content_hash = ?, message = ?, error = ?, updated_at = ?
+                WHERE job_id = ? AND position = ?
+                """,
+                (item.status, item.action, item.content_hash, item.message, item.error, time.time(), job_id, position)
+            )
+
+    def complete_job(self, job_id: str, error: Optional[str] = None) -> None:
+        """Termine un lot et supprime la copie de ses fichiers.
+
+        Args:
+            job_id: Identifiant du lot
+            error: Erreur ayant interrompu le lot ; les documents non traités
+                sont alors marqués en échec
+        """
+        now = time.time()
+        with self._connect() as conn:
+            if error is not None:
+                conn.execute(
+                    f"""
+                    UPDATE ingestion_items SET status = 'failed', error = ?, updated_at = ?
+                    WHERE job_id = ? AND status NOT IN ({",".join("?" * len(FINAL_STATUSES))})
+                    """,
+                    (error, now, job_id, *FINAL_STATUSES)
+                )
+            failed = conn.execute(
+                "SELECT COUNT(*) FROM ingestion_items WHERE job_id = ? AND status = 'failed'",
+                (job_id,)
+            ).fetchone()[0]
+            conn.execute(
+                "UPDATE ingestion_jobs SET status = ?, lease_expires = 0, updated_at = ? WHERE job_id = ?",
+                ("failed" if failed else "done", now, job_id)
+            )
+        shutil.rmtree(os.path.join(self.directory, "uploads", job_id), ignore_errors=True)
+
+    def get_job(self, job_id: str) -> Optional[Dict[str, Any]]:
+        """Retourne l'état d'un lot et de ses documents, ou None s'il est inconnu."""
+        with self._connect() as conn:
+            job = conn.execute("SELECT * FROM ingestion_jobs WHERE job_id = ?", (job_id,)).fetchone()
+            if job is None:
+                return None
+            rows = conn.execute(
+                """
+                SELECT doc_id, action, status, message, error FROM ingestion_items
+                WHERE job_id = ? ORDER BY position
+                """,
+                (job_id,)
+            ).fetchall()
+        result = dict(job)
+        result["items"] = [dict(row) for row in rows]
+        return result
+
+    def list_jobs(self, kb_id: Optional[str] = None, limit: int = 20) -> List[Dict[str, Any]]:
+        """Retourne les lots les plus récents, sans le détail des documents.
+
+        Args:
+            kb_id: Limite la liste aux lots de cette base
+            limit: Nombre maximal de lots retournés
+        """
+        query = "SELECT * FROM ingestion_jobs"
+        params: List[Any] = []
+        if kb_id is not None:
+            query += " WHERE kb_id = ?"
+            params.append(kb_id)
+        query += " ORDER BY created_at DESC LIMIT ?"
+        params.append(limit)
+        with self._connect() as conn:
+            rows = conn.execute(query, params).fetchall()
+        return [dict(row) for row in rows]
+
+class IngestionWorker:
+    """Worker d'arrière-plan qui vide la file d'ingestion."""
+
+    def __init__(
+        self,
+        kb_manager: KnowledgeBasesManager,
+        queue: IngestionJobQueue,
+        pipeline: Optional[IngestionPipeline] = None,
+        poll_interval: Optional[float] = None,
+        lease_timeout: Optional[float] = None
+    ):
+        """Initialise le worker.
+
+        Args:
+            kb_manager: Gestionnaire des bases de connaissances
+            queue: File d'attente des lots
+            pipeline: Pipeline d'ingestion (créé si absent)
+            poll_interval: Délai entre deux consultations d'une file vide
+            lease_timeout: Durée du bail d'un lot en cours
+        """
+        self.kb_manager = kb_manager
+        self.queue = queue
+        self.pipeline = pipeline or IngestionPipeline(kb_manager)
+        self.poll_interval = poll_interval or config.ingestion.poll_interval
+        self.lease_timeout = lease_timeout or config.ingestion.lease_timeout
+        self.worker_id = f"{os.getpid()}-{uuid.uuid4().hex[:8]}"
+        self.logger = logging.getLogger(__name__)
+        self._wakeup = threading.Event()
+        self._stopped = threading.Event()
+        self._current_job: Optional[str] = None
+        self._thread: Optional[threading.Thread] = None
+        self._heartbeat: Optional[threading.Thread] = None
+
+    def start(self) -> None:
+        """Démarre le worker et son renouvellement de bail."""
+        if self._thread is not None:
+            return
+        self._thread = threading.Thread(target=self._run, name="ingestion-worker", daemon=True)
+        self._heartbeat = threading.Thread(target=self._renew_leases, name="ingestion-heartbeat", daemon=True)
+        self._thread.start()
+        self._heartbeat.start()
+
+    def stop(self) -> None:
+        """Arrête le worker après le lot en cours."""
+        self._stopped.set()
+        self._wakeup.set()
+
+    def wake(self) -> None:
+        """Signale qu'un lot vient d'être ajouté à la file."""
+        self._wakeup.set()
+
+    def _renew_leases(self) -> None:
+        """Prolonge régulièrement le bail du lot en cours."""
+        while not self._stopped.wait(self.lease_timeout / 3):
+            job_id = self._current_job
+            if job_id is not None:
+                try:
+                    self.queue.renew_lease(job_id, self.worker_id, self.lease_timeout)
+                except sqlite3.Error as e:
+                    self.logger.warning(f"Renouvellement du bail du lot {job_id} impossible: {str(e)}")
+
+    def _run(self) -> None:
+        """Traite les lots jusqu'à l'arrêt du worker."""
+        while not self._stopped.is_set():
+            try:
+                claimed = self.queue.claim_next(self.worker_id, self.lease_timeout)
+            except sqlite3.Error as e:
+                self.logger.error(f"Lecture de la file d'ingestion impossible: {str(e)}")
+                claimed = None
+            if claimed is None:
+                self._wakeup.wait(self.poll_interval)
+                self._wakeup.clear()
+                continue
+            self._process(*claimed)
+
+    def _process(self, job_id: str, kb_id: str, items: Dict[int, IngestionItem]) -> None:
+        """Ingère les documents d'un lot en enregistrant leur état."""
+        self._current_job = job_id
+        positions = {id(item): position for position, item in items.items()}
+
+        def save(item: IngestionItem) -> None:
+            self.queue.update_item(job_id, positions[id(item)], item)
+
+        self.logger.info(f"Lot {job_id} : ingestion de {len(items)} documents dans {kb_id}")
+        error = None
+        try:
+            self.pipeline.ingest(kb_id, list(items.values()), on_progress=save, on_stage=save)
+        except Exception as e:
+            error = str(e)
+            self.logger.error(f"Erreur lors du traitement du lot {job_id}: {error}")
+        finally:
+            self._current_job = None
+            self.queue.complete_job(job_id, error)
+
+# Workers démarrés dans le processus, par répertoire de stockage
+_shared_workers: Dict[str, IngestionWorker] = {}
+_shared_workers_lock = threading.Lock()
+
+def get_shared_worker(kb_manager: KnowledgeBasesManager) -> IngestionWorker:
+    """Retourne le worker d'ingestion démarré pour le répertoire du gestionnaire.
+
+    Args:
+        kb_manager: Gestionnaire des bases de connaissances
+    """
+    key = os.path.abspath(kb_manager.storage_directory)
+    with _shared_workers_lock:
+        worker = _shared_workers.get(key)
+        if worker is None:
+            worker = IngestionWorker(kb_manager, IngestionJobQueue(key))
+            worker.start()
+            _shared_workers[key] = worker
+        return worker
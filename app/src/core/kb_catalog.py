@@ -0,0 +1,197 @@
+"""
+Catalogue persistant des bases de connaissances.
+
+Le catalogue est une base SQLite placée dans le répertoire de stockage. Il
+conserve pour chaque base ses métadonnées d'affichage et ses compteurs, mis à
+jour de façon incrémentale lors des créations, suppressions et ingestions :
+lister les bases ne nécessite qu'une seule requête. Il conserve aussi
+l'empreinte SHA-256 du contenu de chaque document ingéré.
+"""
+
+import sqlite3
+import threading
+import time
+from contextlib import closing, contextmanager
+from typing import Any, Dict, Iterator, List, Optional
+
+class KnowledgeBaseCatalog:
+    """Catalogue SQLite des bases de connaissances."""
+
+    def __init__(self, db_path: str):
+        """Initialise le catalogue et crée la table si nécessaire.
+
+        Args:
+            db_path: Chemin du fichier SQLite
+        """
+        self.db_path = db_path
+        self._lock = threading.Lock()
+        with self._connect() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS knowledge_bases (
+                    kb_id TEXT PRIMARY KEY,
+                    title TEXT NOT NULL DEFAULT '',
+                    description TEXT NOT NULL DEFAULT '',
+                    language TEXT NOT NULL DEFAULT '',
+                    document_count INTEGER NOT NULL DEFAULT 0,
+                    chunk_count INTEGER NOT NULL DEFAULT 0,
+                    version INTEGER NOT NULL DEFAULT 0,
+                    updated_at REAL NOT NULL DEFAULT 0
+                )
+                """
+            )
+            conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS document_hashes (
+                    kb_id TEXT NOT NULL,
+                    doc_id TEXT NOT NULL,
+                    sha256 TEXT NOT NULL,
+                    PRIMARY KEY (kb_id, doc_id)
+                )
+                """
+            )
+            conn.execute(
+                "CREATE INDEX IF NOT EXISTS idx_document_hashes_sha256 ON document_hashes (kb_id, sha256)"
+            )
+            # Versions conservées après la suppression d'une base, pour qu'une
+            # base recréée ne reprenne pas une version déjà utilisée
+            conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS kb_versions (
+                    kb_id TEXT PRIMARY KEY,
+                    version INTEGER NOT NULL
+                )
+                """
+            )
+            conn.execute("INSERT OR IGNORE INTO kb_versions (kb_id, version) SELECT kb_id, version FROM knowledge_bases")
+
+    @contextmanager
+    def _connect(self) -> Iterator[sqlite3.Connection]:
+        """Ouvre une connexion dédiée et valide la transaction en sortie."""
+        with self._lock, closing(sqlite3.connect(self.db_path, timeout=30)) as conn:
+            conn.row_factory = sqlite3.Row
+            with conn:
+                yield conn
+
+    def upsert(
+        self,
+        kb_id: str,
+        title: str = "",
+        description: str = "",
+        language: str = "",
+        document_count: int = 0,
+        chunk_count: int = 0,
+        version: int = 0
+    ) -> None:
+        """Enregistre ou remplace une base dans le catalogue."""
+        with self._connect() as conn:
+            conn.execute(
+                """
+                INSERT OR REPLACE INTO knowledge_bases
+                    (kb_id, title, description, language, document_count, chunk_count, version, updated_at)
+                VALUES (?, ?, ?, ?, ?, ?, MAX(?, COALESCE((SELECT version FROM kb_versions WHERE kb_id = ?), 0)), ?)
+                """,
+                (kb_id, title, description, language, document_count, chunk_count, version, kb_id, time.time())
+            )
+
+    def update_counts(
+        self,
+        kb_id: str,
+        document_delta: int = 0,
+        chunk_delta: int = 0,
+        version: Optional[int] = None
+    ) -> None:
+        """Applique une variation aux compteurs d'une base.
+
+        Args:
+            kb_id: ID de la base
+            document_delta: Variation du nombre de documents
+            chunk_delta: Variation du nombre de chunks
+            version: Nouvelle version de la base, si elle a changé
+        """
+        with self._connect() as conn:
+            conn.execute(
+                """
+                UPDATE knowledge_bases
+                SET document_count = MAX(document_count + ?, 0),
+                    chunk_count = MAX(chunk_count + ?, 0),
+                    version = COALESCE(?, version),
+                    updated_at = ?
+                WHERE kb_id = ?
+                """,
+                (document_delta, chunk_delta, version, time.time(), kb_id)
+            )
+
+    def set_version(self, kb_id: str, version: int) -> None:
+        """Enregistre la dernière version connue d'une base, y compris si elle a été retirée."""
+        with self._connect() as conn:
+            conn.execute(
+                "UPDATE knowledge_bases SET version = MAX(version, ?), updated_at = ? WHERE kb_id = ?",
+                (version, time.time(), kb_id)
+            )
+            conn.execute(
+                """
+                INSERT INTO kb_versions (kb_id, version) VALUES (?, ?)
+                ON CONFLICT (kb_id) DO UPDATE SET version = MAX(version, excluded.version)
+                """,
+                (kb_id, version)
+            )
+
+    def versions(self) -> Dict[str, int]:
+        """Retourne la dernière version connue de chaque base, retirées comprises."""
+        with self._connect() as conn:
+            rows = conn.execute("SELECT kb_id, version FROM kb_versions").fetchall()
+        return {row["kb_id"]: row["version"] for row in rows}
+
+    def remove(self, kb_id: str) -> None:
+        """Retire une base du catalogue, avec les empreintes de ses documents.
+
+        Sa version est conservée (voir set_version).
+        """
+        with self._connect() as conn:
+            conn.execute("DELETE FROM knowledge_bases WHERE kb_id = ?", (kb_id,))
+            conn.execute("DELETE FROM document_hashes WHERE kb_id = ?", (kb_id,))
+
+    def get_document_hash(self, kb_id: str, doc_id: str) -> Optional[str]:
+        """Retourne l'empreinte SHA-256 enregistrée pour un document, ou None."""
+        with self._connect() as conn:
+            row = conn.execute(
+                "SELECT sha256 FROM document_hashes WHERE kb_id = ? AND doc_id = ?",
+                (kb_id, doc_id)
+            ).fetchone()
+        return row["sha256"] if row else None
+
+    def find_document_by_hash(self, kb_id: str, sha256: str) -> Optional[str]:
+        """Retourne le doc_id d'un document de la base ayant ce contenu, ou None."""
+        with self._connect() as conn:
+            row = conn.execute(
+                "SELECT doc_id FROM document_hashes WHERE kb_id = ? AND sha256 = ? LIMIT 1",
+                (kb_id, sha256)
+            ).fetchone()
+        return row["doc_id"] if row else None
+
+    def set_document_hash(self, kb_id: str, doc_id: str, sha256: str) -> None:
+        """Enregistre l'empreinte du contenu d'un document."""
+        with self._connect() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO document_hashes (kb_id, doc_id, sha256) VALUES (?, ?, ?)",
+                (kb_id, doc_id, sha256)
+            )
+
+    def remove_document_hash(self, kb_id: str, doc_id: str) -> None:
+        """Supprime l'empreinte d'un document."""
+        with self._connect() as conn:
+            conn.execute("DELETE FROM document_hashes WHERE kb_id = ? AND doc_id = ?", (kb_id, doc_id))
+
+    def get(self, kb_id: str) -> Optional[Dict[str, Any]]:
+        """Retourne l'entrée d'une base, ou None si elle est absente."""
+        with self._connect() as conn:
+            row = conn.execute("SELECT * FROM knowledge_bases WHERE kb_id = ?", (kb_id,)).fetchone()
+        return dict(row) if row else None
+
+    def list(self) -> List[Dict[str, Any]]:
+        """Retourne toutes les bases du catalogue, triées par ID."""
+        with self._connect() as conn:
+            rows = conn.execute("SELECT * FROM knowledge_bases ORDER BY kb_id").fetchall()
+        return [dict(row) for row in rows]
@@ -5,14 +5,27 @@ Gestionnaire de bases de connaissances utilisant ChromaDB.
 import os
 import json
 import logging
+import threading
+import time
 import chromadb
-from typing import Dict, List, Optional, Any
+from collections import OrderedDict
+from typing import Callable, Dict, List, Optional, Any, Set, Tuple, Union
 import shutil
 from dsrag.knowledge_base import KnowledgeBase
+from dsrag.database.chunk.db import ChunkDB
+from dsrag.database.vector.db import VectorDB
 from dsrag.database.vector.types import MetadataFilter
 from src.config import config
-from dsrag.embedding import OpenAIEmbedding
-from dsrag.reranker import CohereReranker
+from src.core.kb_catalog import KnowledgeBaseCatalog
+from src.core.rerank_cache import CachedReranker, RerankScoreCache
+from src.core.embedding_cache import CachedEmbedding, EmbeddingDiskCache
+from src.core.memmap_vector_db import MemmapVectorDB
+from src.core.sqlite_chunk_db import SQLiteChunkDB
+from src.core.vector_evaluation import evaluate_vector_search
+from src.core.vector_index import parse_index_spec
+from src.utils.hashing import file_sha256
+from dsrag.embedding import Embedding, OpenAIEmbedding
+from dsrag.reranker import CohereReranker, Reranker
 from pathlib import Path
 
 class KnowledgeBasesManager:
@@ -33,54 +46,125 @@ class KnowledgeBasesManager:
         # Configure logging
         self.logger = logging.getLogger(__name__)
         
-        # Cache des bases de connaissances
-        self._knowledge_bases: Dict[str, KnowledgeBase] = {}
-        self._loading = False  # Flag pour éviter les chargements récursifs
-        self._load_existing_bases()
+        # Cache LRU des bases ouvertes, chargées à la demande
+        self._knowledge_bases: "OrderedDict[str, KnowledgeBase]" = OrderedDict()
+        self._last_access: Dict[str, float] = {}
+        self._estimated_sizes: Dict[str, int] = {}
+        self.max_open_bases = config.knowledge_base.max_open_bases
+        self.max_open_bytes = config.knowledge_base.max_open_bytes
+        self.idle_timeout = config.knowledge_base.idle_timeout
+        # Verrou protégeant le cache : le gestionnaire est partagé entre sessions
+        self._lock = threading.RLock()
+        # Verrous d'écriture par base : les stockages dsrag ne sont pas thread-safe
+        self._write_locks: Dict[str, threading.Lock] = {}
+        # Verrous de chargement par base : une base n'est chargée qu'une fois,
+        # sans bloquer les sessions qui utilisent les autres bases
+        self._load_locks: Dict[str, threading.Lock] = {}
+        
+        # Index des doc_id par base, reconstruit à la demande après modification
+        self._doc_id_index: Dict[str, Set[str]] = {}
+        # Métadonnées des documents par base, triées par doc_id
+        self._document_listing: Dict[str, List[Dict[str, Any]]] = {}
+        # Plages de pages par chunk, par (kb_id, doc_id)
+        self._page_ranges: Dict[Tuple[str, str], Dict[int, Tuple[int, int]]] = {}
+        self._index_lock = threading.Lock()
+        
+        # Cache disque des embeddings de chunks, partagé par toutes les bases
+        self.embedding_cache = None
+        if config.embedding.cache_enabled:
+            self.embedding_cache = EmbeddingDiskCache(os.path.join(self.storage_directory, "embedding_cache"))
+        
+        # Cache persistant des scores de reranking, partagé par toutes les bases
+        self.rerank_cache = None
+        if config.reranker.cache_enabled:
+            self.rerank_cache = RerankScoreCache(
+                os.path.join(self.storage_directory, "rerank_cache.sqlite3"),
+                max_entries=config.reranker.cache_max_entries
+            )
+        
+        # Catalogue persistant : métadonnées, compteurs et versions des bases
+        self.catalog = KnowledgeBaseCatalog(os.path.join(self.storage_directory, "catalog.sqlite3"))
+        self._sync_catalog()
+        # Version de chaque base, incrémentée à chaque modification
+        self._versions: Dict[str, int] = self.catalog.versions()
     
-    def _load_existing_bases(self) -> None:
-        """Charge les bases de connaissances existantes depuis le stockage."""
-        if self._loading:  # Évite les chargements récursifs
-            return
-            
-        try:
-            self._loading = True
-            if not os.path.exists(self.metadata_dir):
-                self.logger.warning(f"Le répertoire de métadonnées n'existe pas: {self.metadata_dir}")
-                return
-                
-            for filename in os.listdir(self.metadata_dir):
-                if filename.endswith('.json'):
-                    kb_id = filename[:-5]
-                    if kb_id not in self._knowledge_bases:  # Évite les rechargements inutiles
-                        try:
-                            kb = KnowledgeBase(
-                                kb_id=kb_id,
-                                storage_directory=self.storage_directory,
-                                exists_ok=True
-                            )
-                            self._knowledge_bases[kb_id] = kb
-                            self.logger.info(f"Base de connaissances chargée: {kb_id}")
-                        except Exception as e:
-                            self.logger.warning(f"Erreur lors du chargement de la base {kb_id}: {str(e)}")
-        finally:
-            self._loading = False
+    @staticmethod
+    def _count_chunks(kb: KnowledgeBase, doc_id: Optional[str] = None) -> int:
+        """Compte les chunks d'un document, ou de toute la base si doc_id est None."""
+        if isinstance(kb.chunk_db, SQLiteChunkDB):
+            return kb.chunk_db.count_chunks(doc_id)
+        data = getattr(kb.chunk_db, "data", None)
+        if data is None:
+            # Stockage sans accès direct aux chunks : les chunks sont numérotés à partir de 0
+            doc_ids = [doc_id] if doc_id is not None else kb.chunk_db.get_all_doc_ids()
+            count = 0
+            for current_doc_id in doc_ids:
+                chunk_index = 0
+                while kb.chunk_db.get_chunk_text(current_doc_id, chunk_index) is not None:
+                    chunk_index += 1
+                count += chunk_index
+            return count
+        if doc_id is not None:
+            return len(data.get(doc_id, {}))
+        return sum(len(chunks) for chunks in data.values())
 
-    def _get_document_count(self, kb: KnowledgeBase) -> int:
-        """Retourne le nombre de documents dans une base."""
+    def _register_in_catalog(self, kb_id: str) -> None:
+        """Ajoute au catalogue une base qui n'y figure pas encore.
+        
+        Utilisé une seule fois par base, pour les bases créées avant le
+        catalogue : la base est ouverte le temps de compter ses documents.
+        """
         try:
-            # Utilise l'API de dsrag pour obtenir les IDs des documents
-            doc_ids = kb.chunk_db.get_all_doc_ids()
-            return len(doc_ids)
+            with open(os.path.join(self.metadata_dir, f"{kb_id}.json"), 'r') as f:
+                metadata = json.load(f)
         except Exception as e:
-            self.logger.warning(f"Erreur lors du comptage des documents: {str(e)}")
-            return 0
-
-    def get_knowledge_base(self, kb_id: str) -> Optional[KnowledgeBase]:
-        """Récupère une base de connaissances par son ID."""
-        if kb_id in self._knowledge_bases:
-            return self._knowledge_bases[kb_id]
+            self.logger.warning(f"Erreur lors de la lecture des métadonnées de {kb_id}: {str(e)}")
+            metadata = {}
             
+        document_count = chunk_count = 0
+        kb = self._open_knowledge_base(kb_id)
+        if kb is not None:
+            try:
+                document_count = len(kb.chunk_db.get_all_doc_ids())
+                chunk_count = self._count_chunks(kb)
+            except Exception as e:
+                self.logger.warning(f"Erreur lors du comptage des documents de {kb_id}: {str(e)}")
+                
+        self.catalog.upsert(
+            kb_id,
+            title=metadata.get('title', kb_id),
+            description=metadata.get('description', ''),
+            language=metadata.get('language', config.knowledge_base.default_language),
+            document_count=document_count,
+            chunk_count=chunk_count
+        )
+
+    def _sync_catalog(self) -> None:
+        """Aligne le catalogue sur les fichiers de métadonnées présents."""
+        known = {entry['kb_id'] for entry in self.catalog.list()}
+        on_disk = {filename[:-5] for filename in os.listdir(self.metadata_dir) if filename.endswith('.json')}
+        for kb_id in known - on_disk:
+            self.catalog.remove(kb_id)
+        for kb_id in sorted(on_disk - known):
+            self.logger.info(f"Ajout de la base {kb_id} au catalogue")
+            self._register_in_catalog(kb_id)
+    
+    def _estimate_size(self, kb_id: str) -> int:
+        """Estime l'empreinte mémoire d'une base à partir de ses fichiers de stockage."""
+        size = 0
+        for subdirectory in ("vector_storage", "chunk_storage"):
+            directory = os.path.join(self.storage_directory, subdirectory)
+            if not os.path.isdir(directory):
+                continue
+            for filename in os.listdir(directory):
+                if filename == kb_id or filename.startswith(f"{kb_id}."):
+                    path = os.path.join(directory, filename)
+                    if os.path.isfile(path):
+                        size += os.path.getsize(path)
+        return size
+
+    def _open_knowledge_base(self, kb_id: str) -> Optional[KnowledgeBase]:
+        """Charge une base depuis le stockage, sans l'ajouter au cache."""
         metadata_file = os.path.join(self.metadata_dir, f"{kb_id}.json")
         if not os.path.exists(metadata_file):
             self.logger.warning(f"La base {kb_id} n'existe pas")
@@ -92,41 +176,224 @@ class KnowledgeBasesManager:
                 storage_directory=self.storage_directory,
                 exists_ok=True
             )
-            self._knowledge_bases[kb_id] = kb
+            # Les modèles sont reconstruits depuis les métadonnées : ajout des caches
+            kb.embedding_model = self._wrap_embedding_model(kb.embedding_model)
+            kb.reranker = self._wrap_reranker(kb.reranker)
+            self.logger.info(f"Base de connaissances chargée: {kb_id}")
             return kb
         except Exception as e:
             self.logger.error(f"Erreur lors du chargement de la base {kb_id}: {str(e)}")
             return None
 
-    def list_knowledge_bases(self) -> List[Dict[str, Any]]:
-        """Liste toutes les bases de connaissances disponibles."""
-        if not self._knowledge_bases:
-            self._load_existing_bases()
-            
-        kb_list = []
-        for filename in os.listdir(self.metadata_dir):
-            if filename.endswith('.json'):
-                kb_id = filename[:-5]
+    def _cache_knowledge_base(self, kb_id: str, kb: KnowledgeBase) -> None:
+        """Ajoute une base au cache puis évince les bases en excès ou inactives."""
+        with self._lock:
+            self._knowledge_bases[kb_id] = kb
+            self._knowledge_bases.move_to_end(kb_id)
+            self._last_access[kb_id] = time.monotonic()
+            self._estimated_sizes[kb_id] = self._estimate_size(kb_id)
+            self._evict(keep=kb_id)
+
+    def _is_writing(self, kb_id: str) -> bool:
+        """Indique si une écriture est en cours dans une base."""
+        write_lock = self._write_locks.get(kb_id)
+        return write_lock is not None and write_lock.locked()
+
+    def _evict(self, keep: Optional[str] = None) -> None:
+        """Ferme les bases inactives puis les moins récemment utilisées au-delà des limites.
+        
+        Une base en cours d'écriture n'est pas fermée : la recharger créerait une
+        seconde instance dont les sauvegardes écraseraient celles de l'écriture.
+        """
+        with self._lock:
+            now = time.monotonic()
+            for kb_id in list(self._knowledge_bases):
+                if kb_id == keep or self._is_writing(kb_id):
+                    continue
+                if self.idle_timeout and now - self._last_access[kb_id] > self.idle_timeout:
+                    self._close_knowledge_base(kb_id, "inactive")
+                    
+            def over_limits() -> bool:
+                if self.max_open_bases and len(self._knowledge_bases) > self.max_open_bases:
+                    return True
+                total = sum(self._estimated_sizes.get(kb_id, 0) for kb_id in self._knowledge_bases)
+                return bool(self.max_open_bytes) and total > self.max_open_bytes
+                
+            for kb_id in list(self._knowledge_bases):
+                if not over_limits():
+                    break
+                if kb_id != keep and not self._is_writing(kb_id):
+                    self._close_knowledge_base(kb_id, "limite mémoire atteinte")
+
+    def _close_knowledge_base(self, kb_id: str, reason: str) -> Optional[KnowledgeBase]:
+        """Retire une base du cache ; elle sera rechargée à la prochaine demande."""
+        with self._lock:
+            kb = self._knowledge_bases.pop(kb_id, None)
+            self._last_access.pop(kb_id, None)
+            self._estimated_sizes.pop(kb_id, None)
+        if kb is not None:
+            self.logger.info(f"Base de connaissances fermée ({reason}): {kb_id}")
+        return kb
+
+    def get_document_ids(self, kb_id: str) -> Set[str]:
+        """Retourne l'ensemble des doc_id d'une base.
+        
+        L'ensemble est mis en cache et invalidé à chaque ajout ou suppression
+        de document via le gestionnaire.
+        
+        Args:
+            kb_id: ID de la base de connaissances
+            
+        Returns:
+            Set[str]: doc_id présents dans la base (vide si la base est introuvable)
+        """
+        with self._index_lock:
+            doc_ids = self._doc_id_index.get(kb_id)
+            version = self._versions.get(kb_id, 0)
+        if doc_ids is not None:
+            return doc_ids
+            
+        kb = self.get_knowledge_base(kb_id)
+        if not kb:
+            return set()
+        try:
+            doc_ids = set(kb.chunk_db.get_all_doc_ids())
+        except Exception as e:
+            self.logger.warning(f"Erreur lors de l'indexation des documents de {kb_id}: {str(e)}")
+            return set()
+            
+        with self._index_lock:
+            # Ne pas mettre en cache un index lu pendant une modification
+            if self._versions.get(kb_id, 0) == version:
+                self._doc_id_index[kb_id] = doc_ids
+        return doc_ids
+
+    def _load_page_ranges(self, kb: KnowledgeBase, doc_id: str) -> Dict[int, Tuple[int, int]]:
+        """Construit en une passe la table chunk -> plage de pages d'un document."""
+        # BasicChunkDB expose directement ses chunks et SQLiteChunkDB les lit
+        # en une requête ; les autres stockages sont interrogés chunk par chunk
+        # dans get_chunk_page_ranges
+        if isinstance(kb.chunk_db, SQLiteChunkDB):
+            return kb.chunk_db.get_page_ranges(doc_id)
+        chunks = getattr(kb.chunk_db, "data", {}).get(doc_id, {})
+        return {
+            int(chunk_index): (chunk.get("chunk_page_start"), chunk.get("chunk_page_end"))
+            for chunk_index, chunk in chunks.items()
+        }
+
+    def get_chunk_page_ranges(
+        self,
+        kb_id: str,
+        chunks: List[Tuple[str, int]]
+    ) -> Dict[Tuple[str, int], Tuple[int, int]]:
+        """Résout en lot les plages de pages d'une liste de chunks.
+        
+        Args:
+            kb_id: ID de la base de connaissances
+            chunks: Couples (doc_id, chunk_index) à résoudre
+            
+        Returns:
+            Dict associant chaque couple à sa plage (page de début, page de fin)
+        """
+        kb = self.get_knowledge_base(kb_id)
+        if not kb:
+            return {}
+            
+        page_ranges = {}
+        for doc_id, chunk_index in set(chunks):
+            key = (kb_id, doc_id)
+            with self._index_lock:
+                doc_ranges = self._page_ranges.get(key)
+                version = self._versions.get(kb_id, 0)
+            if doc_ranges is None:
+                doc_ranges = self._load_page_ranges(kb, doc_id)
+                with self._index_lock:
+                    if self._versions.get(kb_id, 0) == version:
+                        self._page_ranges[key] = doc_ranges
+                    
+            page_range = doc_ranges.get(chunk_index)
+            if page_range is None:
                 try:
-                    with open(os.path.join(self.metadata_dir, filename), 'r') as f:
-                        metadata = json.load(f)
-                        kb_list.append({
-                            'kb_id': kb_id,
-                            'title': metadata.get('title', kb_id),
-                            'description': metadata.get('description', ''),
-                            'language': metadata.get('language', config.knowledge_base.default_language),
-                            'document_count': self._get_document_count(self._knowledge_bases[kb_id]) if kb_id in self._knowledge_bases else 0
-                        })
+                    page_range = tuple(kb.chunk_db.get_chunk_page_numbers(doc_id, chunk_index))
                 except Exception as e:
-                    self.logger.warning(f"Erreur lors de la lecture des métadonnées de {kb_id}: {str(e)}")
-                    kb_list.append({
-                        'kb_id': kb_id,
-                        'title': kb_id,
-                        'description': str(e),
-                        'language': config.knowledge_base.default_language,
-                        'document_count': 0
-                    })
-        return kb_list
+                    self.logger.warning(f"Pages introuvables pour {doc_id}#{chunk_index}: {str(e)}")
+                    page_range = (0, 0)
+                doc_ranges[chunk_index] = page_range
+            page_ranges[(doc_id, chunk_index)] = page_range
+        return page_ranges
+
+    def get_kb_version(self, kb_id: str) -> int:
+        """Retourne la version courante d'une base.
+        
+        La version est incrémentée à chaque création, suppression ou
+        modification des documents de la base ; elle ne revient jamais en
+        arrière, y compris si la base est supprimée puis recréée.
+        """
+        with self._index_lock:
+            return self._versions.get(kb_id, 0)
+
+    def _mark_modified(self, kb_id: str) -> int:
+        """Incrémente la version d'une base et invalide ses index.
+        
+        Returns:
+            int: Nouvelle version de la base
+        """
+        with self._index_lock:
+            version = self._versions.get(kb_id, 0) + 1
+            self._versions[kb_id] = version
+            self._doc_id_index.pop(kb_id, None)
+            self._document_listing.pop(kb_id, None)
+            for key in [key for key in self._page_ranges if key[0] == kb_id]:
+                del self._page_ranges[key]
+        self.catalog.set_version(kb_id, version)
+        return version
+
+    def get_knowledge_base(self, kb_id: str) -> Optional[KnowledgeBase]:
+        """Récupère une base de connaissances par son ID, en la chargeant si besoin.
+        
+        Le chargement se fait hors du verrou du cache, sous un verrou propre à
+        la base : les sessions demandant d'autres bases ne sont pas bloquées, et
+        les demandes simultanées d'une même base ne la chargent qu'une fois.
+        """
+        def cached() -> Optional[KnowledgeBase]:
+            kb = self._knowledge_bases.get(kb_id)
+            if kb is not None:
+                self._knowledge_bases.move_to_end(kb_id)
+                self._last_access[kb_id] = time.monotonic()
+            return kb
+            
+        with self._lock:
+            kb = cached()
+            if kb is not None:
+                return kb
+            load_lock = self._load_locks.setdefault(kb_id, threading.Lock())
+        
+        with load_lock:
+            with self._lock:
+                kb = cached()
+            if kb is None:
+                kb = self._open_knowledge_base(kb_id)
+                if kb is not None:
+                    self._cache_knowledge_base(kb_id, kb)
+            return kb
+
+    def list_knowledge_bases(self) -> List[Dict[str, Any]]:
+        """Liste toutes les bases de connaissances disponibles.
+        
+        La liste est lue en une requête depuis le catalogue : aucune base n'est chargée.
+        """
+        return [
+            {
+                'kb_id': entry['kb_id'],
+                'title': entry['title'] or entry['kb_id'],
+                'description': entry['description'],
+                'language': entry['language'] or config.knowledge_base.default_language,
+                'document_count': entry['document_count'],
+                'chunk_count': entry['chunk_count'],
+                'version': entry['version']
+            }
+            for entry in self.catalog.list()
+        ]
 
     def create_knowledge_base(
         self,
@@ -139,6 +406,11 @@ class KnowledgeBasesManager:
         embedding_dimension: Optional[int] = None,
         reranker_provider: str = "cohere",
         reranker_model: str = "rerank-multilingual-v3.0",
+        vector_db_backend: Optional[str] = None,
+        vector_dtype: Optional[str] = None,
+        vector_quantization: Optional[str] = None,
+        vector_index: Union[str, Dict[str, Any], None] = None,
+        chunk_db_backend: Optional[str] = None,
         exists_ok: bool = False,
         **kwargs
     ) -> KnowledgeBase:
@@ -154,6 +426,11 @@ class KnowledgeBasesManager:
             embedding_dimension: Dimension des vecteurs (optionnel)
             reranker_provider: Fournisseur du modèle de reranking
             reranker_model: Nom du modèle de reranking
+            vector_db_backend: Stockage vectoriel ("basic" ou "memmap", par défaut celui de la configuration)
+            vector_dtype: Type des vecteurs du stockage "memmap" ("float32" ou "float16")
+            vector_quantization: Quantification du stockage "memmap" ("none", "int8" ou "pq")
+            vector_index: Index du stockage "memmap" ("flat", "ivf:nlist=1024,nprobe=16", "hnsw:m=32,ef_search=64"...)
+            chunk_db_backend: Stockage des chunks ("basic" ou "sqlite", par défaut celui de la configuration)
             exists_ok: Si True, écrase la base si elle existe déjà
         """
         try:
@@ -163,8 +440,11 @@ class KnowledgeBasesManager:
             os.makedirs(self.storage_directory, exist_ok=True)
             os.makedirs(self.metadata_dir, exist_ok=True)
             
-            # Vérifier si la base existe déjà
-            if kb_id in self._knowledge_bases:
+            # Vérifier si la base existe déjà. La suppression peut charger la
+            # base : elle a lieu hors du verrou du cache
+            with self._lock:
+                exists = kb_id in self._knowledge_bases
+            if exists or os.path.exists(os.path.join(self.metadata_dir, f"{kb_id}.json")):
                 if not exists_ok:
                     raise ValueError(f"La base {kb_id} existe déjà")
                 self.delete_knowledge_base(kb_id)
@@ -181,6 +461,18 @@ class KnowledgeBasesManager:
                 reranker_model
             )
             
+            if "vector_db" not in kwargs:
+                vector_db = self._create_vector_db(
+                    kb_id, vector_db_backend, vector_dtype, vector_quantization, vector_index
+                )
+                if vector_db is not None:
+                    kwargs["vector_db"] = vector_db
+            
+            if "chunk_db" not in kwargs:
+                chunk_db = self._create_chunk_db(kb_id, chunk_db_backend)
+                if chunk_db is not None:
+                    kwargs["chunk_db"] = chunk_db
+            
             # Créer la base de connaissances
             kb = KnowledgeBase(
                 kb_id=kb_id,
@@ -200,8 +492,11 @@ class KnowledgeBasesManager:
                 self.logger.error(f"Le fichier de métadonnées n'a pas été créé pour {kb_id}")
                 raise RuntimeError("Échec de la création des fichiers de la base")
             
-            # Mettre à jour le cache
-            self._knowledge_bases[kb_id] = kb
+            # Mettre à jour le cache et le catalogue
+            with self._lock:
+                self._cache_knowledge_base(kb_id, kb)
+                self.catalog.upsert(kb_id, title=title or kb_id, description=description, language=language)
+            self._mark_modified(kb_id)
             
             self.logger.info(f"Base de connaissances créée avec succès: {kb_id}")
             return kb
@@ -215,37 +510,87 @@ class KnowledgeBasesManager:
                 self.logger.error(f"Impossible de lister le répertoire: {str(dir_error)}")
             raise
 
+    def _wrap_embedding_model(self, embedding_model: Embedding) -> Embedding:
+        """Ajoute le cache disque des embeddings à un modèle, s'il est activé."""
+        if self.embedding_cache is None or isinstance(embedding_model, CachedEmbedding):
+            return embedding_model
+        return CachedEmbedding(embedding_model, self.embedding_cache)
+
     def _create_embedding_model(
         self,
         provider: str = "openai",
         model_name: str = "text-embedding-3-small",
         dimension: Optional[int] = None
-    ) -> OpenAIEmbedding:
+    ) -> Embedding:
         """Crée une instance du modèle d'embedding selon la configuration"""
         if provider == "openai":
-            return OpenAIEmbedding(model=model_name, dimension=dimension)
+            return self._wrap_embedding_model(OpenAIEmbedding(model=model_name, dimension=dimension))
         raise ValueError(f"Provider d'embedding non supporté: {provider}")
 
+    def _create_vector_db(
+        self,
+        kb_id: str,
+        backend: Optional[str] = None,
+        dtype: Optional[str] = None,
+        quantization: Optional[str] = None,
+        index: Union[str, Dict[str, Any], None] = None
+    ) -> Optional[VectorDB]:
+        """Crée le stockage vectoriel d'une base (None pour le stockage par défaut de dsrag)"""
+        backend = backend or config.knowledge_base.vector_db_backend
+        quantization = quantization or config.knowledge_base.vector_quantization
+        index = index or config.knowledge_base.vector_index
+        if backend == "basic":
+            if quantization != "none":
+                raise ValueError("La quantification des vecteurs nécessite le stockage \"memmap\"")
+            if parse_index_spec(index)["type"] != "flat":
+                raise ValueError("Les index approchés nécessitent le stockage \"memmap\"")
+            return None
+        if backend == "memmap":
+            return MemmapVectorDB(
+                kb_id=kb_id,
+                storage_directory=self.storage_directory,
+                dtype=dtype or config.knowledge_base.vector_dtype,
+                quantization=quantization,
+                rescore_factor=config.knowledge_base.rescore_factor,
+                index=index,
+                prefilter_max_rows=config.knowledge_base.prefilter_max_rows
+            )
+        raise ValueError(f"Stockage vectoriel non supporté: {backend}")
+
+    def _create_chunk_db(self, kb_id: str, backend: Optional[str] = None) -> Optional[ChunkDB]:
+        """Crée le stockage des chunks d'une base (None pour le stockage par défaut de dsrag)"""
+        backend = backend or config.knowledge_base.chunk_db_backend
+        if backend == "basic":
+            return None
+        if backend == "sqlite":
+            return SQLiteChunkDB(kb_id=kb_id, storage_directory=self.storage_directory)
+        raise ValueError(f"Stockage des chunks non supporté: {backend}")
+
+    def _wrap_reranker(self, reranker: Reranker) -> Reranker:
+        """Ajoute le cache persistant des scores à un reranker, s'il est activé."""
+        if self.rerank_cache is None or isinstance(reranker, CachedReranker):
+            return reranker
+        return CachedReranker(reranker, self.rerank_cache)
+
     def _create_reranker(
         self,
         provider: str = "cohere",
         model_name: str = "rerank-multilingual-v3.0"
-    ) -> CohereReranker:
+    ) -> Reranker:
         """Crée une instance du modèle de reranking selon la configuration"""
         if provider == "cohere":
-            return CohereReranker(model=model_name)
+            return self._wrap_reranker(CohereReranker(model=model_name))
         raise ValueError(f"Provider de reranking non supporté: {provider}")
 
     def delete_knowledge_base(self, kb_id: str) -> bool:
         """Supprime une base de connaissances."""
         try:
-            # Si la base est dans le cache, utiliser son API pour la suppression
-            if kb_id in self._knowledge_bases:
-                kb = self._knowledge_bases[kb_id]
+            # Utiliser l'API de la base pour la suppression, en la chargeant si besoin
+            kb = self._close_knowledge_base(kb_id, "suppression") or self._open_knowledge_base(kb_id)
+            if kb is not None:
                 kb.delete()
-                del self._knowledge_bases[kb_id]
             else:
-                # Si la base n'est pas dans le cache (erreur de chargement), supprimer manuellement
+                # Si la base ne peut pas être chargée, supprimer manuellement
                 # Supprimer le fichier de métadonnées
                 metadata_path = os.path.join(self.metadata_dir, f"{kb_id}.json")
                 if os.path.exists(metadata_path):
@@ -262,37 +607,201 @@ class KnowledgeBasesManager:
                 except Exception:
                     pass
             
+            self.catalog.remove(kb_id)
             self.logger.info(f"Base de connaissances supprimée: {kb_id}")
             return True
             
         except Exception as e:
             self.logger.error(f"Erreur lors de la suppression de la base {kb_id}: {str(e)}")
             return False
+        finally:
+            # Une suppression partielle peut avoir modifié la base
+            self._mark_modified(kb_id)
 
-    def list_documents(self, kb_id: str) -> List[Dict[str, Any]]:
-        """Liste tous les documents d'une base de connaissances."""
-        kb = self.get_knowledge_base(kb_id)
-        if not kb:
-            return []
-            
-        documents = []
-        try:
-            doc_ids = kb.chunk_db.get_all_doc_ids()
-            for doc_id in doc_ids:
+    def _load_document_listing(self, kb: KnowledgeBase) -> List[Dict[str, Any]]:
+        """Construit en une passe les métadonnées de tous les documents d'une base."""
+        if isinstance(kb.chunk_db, SQLiteChunkDB):
+            return kb.chunk_db.list_documents()
+        data = getattr(kb.chunk_db, "data", None)
+        if data is None:
+            # Stockage sans accès direct aux chunks : une lecture par document
+            documents = []
+            for doc_id in kb.chunk_db.get_all_doc_ids():
                 try:
                     doc = kb.chunk_db.get_document(doc_id, include_content=False)
-                    if doc:
-                        documents.append({
-                            'doc_id': doc_id,
-                            'title': doc.get('title', doc_id)
-                        })
                 except Exception as e:
                     self.logger.warning(f"Erreur lors de la récupération du document {doc_id}: {str(e)}")
                     continue
-        except Exception as e:
-            self.logger.error(f"Erreur lors de la liste des documents: {str(e)}")
+                if doc:
+                    documents.append({
+                        'doc_id': doc_id,
+                        'title': doc.get('title', doc_id),
+                        'page_count': None,
+                        'chunk_count': doc.get('chunk_count'),
+                        'created_on': doc.get('created_on')
+                    })
+            return sorted(documents, key=lambda doc: doc['doc_id'])
             
-        return documents
+        documents = []
+        for doc_id, chunks in data.items():
+            if not chunks:
+                continue
+            first_chunk = chunks[min(chunks)]
+            page_starts = [chunk.get("chunk_page_start") for chunk in chunks.values() if chunk.get("chunk_page_start") is not None]
+            page_ends = [chunk.get("chunk_page_end") for chunk in chunks.values() if chunk.get("chunk_page_end") is not None]
+            documents.append({
+                'doc_id': doc_id,
+                'title': first_chunk.get("document_title") or doc_id,
+                'page_count': max(page_ends) - min(page_starts) + 1 if page_starts and page_ends else None,
+                'chunk_count': len(chunks),
+                'created_on': first_chunk.get("created_on")
+            })
+        return sorted(documents, key=lambda doc: doc['doc_id'])
+
+    def list_documents(
+        self,
+        kb_id: str,
+        offset: int = 0,
+        limit: Optional[int] = None,
+        title_prefix: Optional[str] = None
+    ) -> List[Dict[str, Any]]:
+        """Liste les documents d'une base de connaissances.
+        
+        Les métadonnées de tous les documents sont lues en une seule passe puis
+        mises en cache jusqu'à la prochaine modification de la base.
+        
+        Args:
+            kb_id: ID de la base de connaissances
+            offset: Nombre de documents à ignorer (pagination)
+            limit: Nombre maximal de documents retournés
+            title_prefix: Ne retourne que les titres commençant par ce préfixe (insensible à la casse)
+            
+        Returns:
+            List[Dict]: doc_id, title, page_count, chunk_count et created_on de chaque document
+        """
+        with self._index_lock:
+            documents = self._document_listing.get(kb_id)
+            version = self._versions.get(kb_id, 0)
+        
+        if documents is None:
+            kb = self.get_knowledge_base(kb_id)
+            if not kb:
+                return []
+            try:
+                documents = self._load_document_listing(kb)
+            except Exception as e:
+                self.logger.error(f"Erreur lors de la liste des documents: {str(e)}")
+                return []
+            with self._index_lock:
+                if self._versions.get(kb_id, 0) == version:
+                    self._document_listing[kb_id] = documents
+        
+        if title_prefix:
+            prefix = title_prefix.casefold()
+            documents = [doc for doc in documents if str(doc['title']).casefold().startswith(prefix)]
+        end = offset + limit if limit is not None else None
+        # Copies : les appelants enrichissent parfois les dictionnaires retournés
+        return [dict(doc) for doc in documents[offset:end]]
+
+    def write_lock(self, kb_id: str) -> threading.Lock:
+        """Retourne le verrou sérialisant les écritures dans une base."""
+        with self._lock:
+            return self._write_locks.setdefault(kb_id, threading.Lock())
+
+    def write_document(
+        self,
+        kb_id: str,
+        doc_id: str,
+        write: Callable[[KnowledgeBase], None],
+        content_hash: Optional[str] = None
+    ) -> None:
+        """Écrit un document hors de add_document, en remplaçant sa version précédente.
+        
+        La suppression de l'ancienne version et l'écriture de la nouvelle sont
+        faites sous le même verrou d'écriture. Si l'écriture échoue, la version
+        partiellement écrite est retirée et le document est compté comme supprimé.
+        
+        Args:
+            kb_id: ID de la base de connaissances
+            doc_id: ID du document écrit
+            write: Écrit les chunks et vecteurs du document dans la base
+            content_hash: Empreinte SHA-256 du fichier source
+        """
+        try:
+            with self.write_lock(kb_id):
+                # Instance obtenue sous le verrou d'écriture : elle ne peut plus être évincée
+                kb = self.get_knowledge_base(kb_id)
+                if not kb:
+                    raise ValueError(f"Base de connaissances {kb_id} introuvable")
+                was_present = doc_id in self.get_document_ids(kb_id)
+                previous_chunk_count = self._count_chunks(kb, doc_id) if was_present else 0
+                if was_present:
+                    kb.delete_document(doc_id)
+                try:
+                    write(kb)
+                except Exception:
+                    try:
+                        kb.delete_document(doc_id)
+                    except Exception as e:
+                        self.logger.error(f"Erreur lors du retrait de l'écriture partielle de {doc_id}: {str(e)}")
+                    if was_present:
+                        self.catalog.update_counts(kb_id, document_delta=-1, chunk_delta=-previous_chunk_count)
+                    self.catalog.remove_document_hash(kb_id, doc_id)
+                    raise
+                chunk_count = self._count_chunks(kb, doc_id)
+            
+            # Mise à jour incrémentale du catalogue
+            self.catalog.update_counts(
+                kb_id,
+                document_delta=0 if was_present else 1,
+                chunk_delta=chunk_count - previous_chunk_count
+            )
+            if content_hash:
+                self.catalog.set_document_hash(kb_id, doc_id, content_hash)
+        finally:
+            self._mark_modified(kb_id)
+
+    def add_document(self, kb_id: str, doc_id: str, file_path: str, **kwargs) -> bool:
+        """Ajoute un document à une base de connaissances.
+        
+        Args:
+            kb_id: ID de la base de connaissances
+            doc_id: ID du document à ajouter
+            file_path: Chemin du fichier à ingérer
+            **kwargs: Paramètres transmis à KnowledgeBase.add_document
+            
+        Returns:
+            bool: True si le document a été ajouté avec succès
+        """
+        try:
+            with self.write_lock(kb_id):
+                # Instance obtenue sous le verrou d'écriture : elle ne peut plus être évincée
+                kb = self.get_knowledge_base(kb_id)
+                if not kb:
+                    raise ValueError(f"Base de connaissances {kb_id} introuvable")
+                already_present = doc_id in self.get_document_ids(kb_id)
+                previous_chunk_count = self._count_chunks(kb, doc_id) if already_present else 0
+                kb.add_document(doc_id=doc_id, file_path=file_path, **kwargs)
+                chunk_count = self._count_chunks(kb, doc_id)
+            
+            # Mise à jour incrémentale du catalogue : les chunks sont recomptés,
+            # dsrag ignorant l'ajout d'un doc_id déjà présent
+            self.catalog.update_counts(
+                kb_id,
+                document_delta=0 if already_present else 1,
+                chunk_delta=chunk_count - previous_chunk_count
+            )
+            if not already_present:
+                self.catalog.set_document_hash(kb_id, doc_id, file_sha256(file_path))
+            self.logger.info(f"Document {doc_id} ajouté à la base {kb_id}")
+            return True
+            
+        except Exception as e:
+            self.logger.error(f"Erreur lors de l'ajout du document {doc_id} à la base {kb_id}: {str(e)}")
+            raise
+        finally:
+            # Un ajout partiel peut avoir modifié la base
+            self._mark_modified(kb_id)
 
     def delete_document(self, kb_id: str, doc_id: str) -> bool:
         """Supprime un document d'une base de connaissances.
@@ -305,15 +814,120 @@ class KnowledgeBasesManager:
             bool: True si le document a été supprimé avec succès
         """
         try:
-            kb = self.get_knowledge_base(kb_id)
-            if not kb:
-                raise ValueError(f"Base de connaissances {kb_id} introuvable")
-            
             # Supprimer le document de la base
-            kb.delete_document(doc_id)
+            with self.write_lock(kb_id):
+                # Instance obtenue sous le verrou d'écriture : elle ne peut plus être évincée
+                kb = self.get_knowledge_base(kb_id)
+                if not kb:
+                    raise ValueError(f"Base de connaissances {kb_id} introuvable")
+                was_present = doc_id in self.get_document_ids(kb_id)
+                chunk_count = self._count_chunks(kb, doc_id) if was_present else 0
+                kb.delete_document(doc_id)
+            
+            # Mise à jour incrémentale du catalogue
+            if was_present:
+                self.catalog.update_counts(kb_id, document_delta=-1, chunk_delta=-chunk_count)
+            self.catalog.remove_document_hash(kb_id, doc_id)
             self.logger.info(f"Document {doc_id} supprimé de la base {kb_id}")
             return True
             
         except Exception as e:
             self.logger.error(f"Erreur lors de la suppression du document {doc_id} de la base {kb_id}: {str(e)}")
-            raise
\ No newline at end of file
+            raise
+        finally:
+            self._mark_modified(kb_id)
+
+    def _evaluation_queries(self, kb_id: str, queries: Optional[List[str]], sample_size: int):
+        """Retourne la base et les vecteurs de requête d'une évaluation."""
+        kb = self.get_knowledge_base(kb_id)
+        if not kb:
+            raise ValueError(f"Base de connaissances {kb_id} introuvable")
+        if not hasattr(kb.vector_db, "sample_vectors"):
+            raise ValueError(f"Le stockage vectoriel de la base {kb_id} ne permet pas de comparaison exacte")
+        
+        if queries:
+            return kb, kb.embedding_model.get_embeddings(queries, input_type="query")
+        return kb, kb.vector_db.sample_vectors(sample_size)
+
+    def evaluate_vector_index(
+        self,
+        kb_id: str,
+        queries: Optional[List[str]] = None,
+        sample_size: int = 50,
+        top_k: int = 10,
+        **search_kwargs
+    ) -> Dict[str, Any]:
+        """Mesure le rappel et la latence de la recherche vectorielle d'une base.
+        
+        La recherche configurée (quantifiée ou approchée) est comparée à la
+        recherche exacte du même stockage.
+        
+        Args:
+            kb_id: ID de la base de connaissances
+            queries: Questions réelles à embarquer ; à défaut, des vecteurs de la base sont tirés au hasard
+            sample_size: Nombre de vecteurs tirés quand queries n'est pas fourni
+            top_k: Nombre de résultats comparés par requête
+            **search_kwargs: Paramètres transmis à la recherche évaluée (nprobe, ef_search)
+            
+        Returns:
+            Dict: rapport de evaluate_vector_search
+        """
+        kb, query_vectors = self._evaluation_queries(kb_id, queries, sample_size)
+        report = evaluate_vector_search(kb.vector_db, query_vectors, top_k, **search_kwargs)
+        self.logger.info(f"Évaluation de la recherche vectorielle de {kb_id}: {report}")
+        return report
+
+    def sweep_vector_index(
+        self,
+        kb_id: str,
+        param_grid: List[Dict[str, int]],
+        queries: Optional[List[str]] = None,
+        sample_size: int = 50,
+        top_k: int = 10
+    ) -> List[Dict[str, Any]]:
+        """Mesure le compromis latence/rappel d'une base pour plusieurs paramètres de recherche.
+        
+        Args:
+            kb_id: ID de la base de connaissances
+            param_grid: Paramètres à comparer, par exemple [{"nprobe": 8}, {"nprobe": 32}]
+            queries: Questions réelles à embarquer ; à défaut, des vecteurs de la base sont tirés au hasard
+            sample_size: Nombre de vecteurs tirés quand queries n'est pas fourni
+            top_k: Nombre de résultats comparés par requête
+            
+        Returns:
+            List[Dict]: un rapport de evaluate_vector_search par paramètres, complété des paramètres
+        """
+        kb, query_vectors = self._evaluation_queries(kb_id, queries, sample_size)
+        reports = []
+        for params in param_grid:
+            report = {**params, **evaluate_vector_search(kb.vector_db, query_vectors, top_k, **params)}
+            self.logger.info(f"Évaluation de la recherche vectorielle de {kb_id}: {report}")
+            reports.append(report)
+        return reports
+
+# Gestionnaires partagés par toutes les sessions du processus, par répertoire
+_shared_managers: Dict[str, KnowledgeBasesManager] = {}
+_shared_managers_lock = threading.Lock()
+
+def get_shared_manager(storage_directory: Optional[str] = None) -> KnowledgeBasesManager:
+    """Retourne le gestionnaire de bases partagé par tout le processus.
+    
+    Les bases ne sont ainsi chargées qu'une fois par processus, quel que soit
+    le nombre de sessions ou de moteurs de recherche.
+    
+    Args:
+        storage_directory: Répertoire de stockage des bases
+        
+    Returns:
+        KnowledgeBasesManager: Instance unique pour ce répertoire
+    """
+    storage_directory = os.path.expanduser(
+        storage_directory if storage_directory else config.knowledge_base.storage_directory
+    )
+    key = os.path.abspath(storage_directory)
+    with _shared_managers_lock:
+        manager = _shared_managers.get(key)
+        if manager is None:
+            manager = KnowledgeBasesManager(storage_directory=storage_directory)
+            _shared_managers[key] = manager
+        return manager
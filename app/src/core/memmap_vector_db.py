@@ -0,0 +1,754 @@
+"""
+Stockage vectoriel projeté en mémoire.
+
+BasicVectorDB conserve une base dans un pickle entièrement désérialisé à
+l'ouverture et entièrement réécrit à chaque ajout de document. Ce stockage
+sépare :
+- les vecteurs normalisés, ajoutés à la suite dans un fichier brut float32
+  (ou float16) ouvert avec numpy.memmap : l'ouverture est immédiate et les
+  pages sont partagées entre processus par le cache du système ;
+- les identifiants et métadonnées des lignes, dans une base SQLite (WAL) où
+  seules les lignes retournées par une recherche sont lues.
+
+Un ajout n'écrit que les nouveaux chunks. Une suppression retire les lignes de
+la base SQLite ; la place occupée par leurs vecteurs est récupérée par
+compact().
+
+Les écritures prennent le verrou d'écriture SQLite (BEGIN IMMEDIATE) avant de
+toucher aux fichiers : elles sont sérialisées entre processus. Un compactage
+écrit ses fichiers sous de nouveaux noms (une nouvelle époque) et change
+d'époque dans la transaction qui renumérote les lignes. Une recherche lit les
+lignes, l'époque et les métadonnées dans une même transaction de lecture :
+elle voit l'état d'avant ou d'après le compactage, jamais un mélange des deux.
+
+Avec une quantification ("int8" ou "pq", voir vector_quantization), les
+vecteurs sont aussi encodés dans un fichier de codes compacts. La recherche
+parcourt les codes, puis rescore exactement les rescore_factor × top_k
+meilleurs candidats à partir des vecteurs d'origine : seules leurs pages sont
+lues dans le fichier de vecteurs.
+
+Codes et index sont complétés après la validation d'un ajout, hors de tout
+verrou tenu par les recherches, qui scorent exactement les lignes qu'ils ne
+couvrent pas encore. Apprentissage, encodage et construction d'index sont
+sérialisés entre processus par un verrou de fichier.
+
+Avec un index approché ("ivf" ou "hnsw", voir vector_index), les candidats
+sont proposés par un index FAISS, dont les vecteurs sont encodés selon la
+quantification choisie, puis rescorés de la même façon.
+
+Les lignes de chaque document étant ajoutées à la suite, un index en mémoire
+associe chaque doc_id à ses plages de lignes. Un filtre doc_id "equals" ou
+"in" y lit directement les lignes des documents choisis : si elles sont peu
+nombreuses (prefilter_max_rows), seules ces lignes sont scorées exactement ;
+sinon, la recherche habituelle est restreinte à ces lignes.
+"""
+
+import json
+import os
+import shutil
+import sqlite3
+import threading
+from contextlib import closing, contextmanager
+from typing import Any, Callable, Dict, Iterator, List, Optional, Sequence, Tuple, Union
+
+import numpy as np
+from dsrag.database.vector.db import VectorDB
+from dsrag.database.vector.types import MetadataFilter
+
+from src.core.vector_index import FaissIndex, SEARCH_PARAMS, current_vector_search_params, format_index_spec, parse_index_spec
+from src.core.vector_quantization import create_quantizer
+from src.utils.file_lock import exclusive_file_lock
+
+SUPPORTED_DTYPES = {"float32": np.float32, "float16": np.float16}
+
+# Nombre de lignes scorées par bloc, pour borner la mémoire d'une recherche
+_BLOCK_ROWS = 65536
+# Tentatives de lecture d'un état cohérent avant de recharger toutes les lignes
+_SNAPSHOT_ATTEMPTS = 3
+
+_FILTER_OPERATORS = {
+    "equals": lambda value, expected: value == expected,
+    "not_equals": lambda value, expected: value != expected,
+    "in": lambda value, expected: value in expected,
+    "not_in": lambda value, expected: value not in expected,
+    "greater_than": lambda value, expected: value is not None and value > expected,
+    "less_than": lambda value, expected: value is not None and value < expected,
+    "greater_than_equals": lambda value, expected: value is not None and value >= expected,
+    "less_than_equals": lambda value, expected: value is not None and value <= expected,
+}
+
+class MemmapVectorDB(VectorDB):
+    """Stockage vectoriel en fichiers projetés en mémoire, avec métadonnées SQLite."""
+
+    def __init__(
+        self,
+        kb_id: str,
+        storage_directory: str = "~/dsRAG",
+        dtype: str = "float32",
+        quantization: str = "none",
+        rescore_factor: int = 4,
+        pq_subvector_dims: int = 4,
+        index: Union[str, Dict[str, Any], None] = "flat",
+        prefilter_max_rows: int = 20000
+    ):
+        """Ouvre (ou prépare) le stockage d'une base.
+
+        Args:
+            kb_id: ID de la base de connaissances
+            storage_directory: Répertoire de stockage des bases
+            dtype: Type des vecteurs stockés ("float32" ou "float16")
+            quantization: Quantification des vecteurs parcourus ("none", "int8" ou "pq")
+            rescore_factor: Candidats rescorés exactement, en multiple de top_k
+            pq_subvector_dims: Dimensions par sous-vecteur de la quantification "pq"
+            index: Spécification de l'index ("flat", "ivf:nlist=1024,nprobe=16", "hnsw:m=32,ef_search=64"...)
+            prefilter_max_rows: Nombre maximal de lignes filtrées scorées exactement, sans index ni codes
+        """
+        if dtype not in SUPPORTED_DTYPES:
+            raise ValueError(f"Type de vecteurs non supporté: {dtype}")
+        self.kb_id = kb_id
+        self.storage_directory = storage_directory
+        self.dtype = dtype
+        self._np_dtype = SUPPORTED_DTYPES[dtype]
+        self.directory = os.path.join(os.path.expanduser(storage_directory), "vector_storage", f"{kb_id}.memmap")
+        os.makedirs(self.directory, exist_ok=True)
+        self.db_path = os.path.join(self.directory, "rows.sqlite3")
+        self._maintenance_lock_path = os.path.join(self.directory, "maintenance.lock")
+        self.quantization = quantization
+        self.rescore_factor = rescore_factor
+        self.pq_subvector_dims = pq_subvector_dims
+        self.index_spec = parse_index_spec(index)
+        # Fichiers de données, renommés à chaque époque de compactage (voir _path)
+        self._vectors_name = f"vectors.{dtype}"
+        self._codes_name = f"codes.{quantization}"
+        self._index_name = "index.faiss"
+        # Avec un index approché, la quantification s'applique aux vecteurs de l'index
+        self._quantizer = create_quantizer(quantization, self.directory, pq_subvector_dims)
+        # Index de l'époque courante, remplacé quand l'époque change
+        self._index: Optional[FaissIndex] = None
+        if self.index_spec["type"] != "flat":
+            self._quantizer = None
+            self._index = FaissIndex(self._path(self._index_name, 0), self.index_spec, quantization, pq_subvector_dims)
+        self.prefilter_max_rows = prefilter_max_rows
+        # Verrou de l'état en mémoire (lignes, index), tenu brièvement
+        self._lock = threading.RLock()
+        # Verrou des écritures de cette instance, qui attendent ainsi sans limite de durée
+        # le verrou d'écriture SQLite tenu par une autre écriture de l'instance
+        self._write_lock = threading.RLock()
+        # Verrou des mises à jour des codes et de l'index de cette instance (voir _maintenance)
+        self._maintenance_lock = threading.Lock()
+        # Lignes vivantes, leurs doc_id et les plages de chaque document, mis à jour quand la génération change.
+        # Les tampons sont alloués par doublement : un ajout n'y écrit qu'au-delà des vues publiées.
+        self._generation = -1
+        self._layout = -1
+        self._epoch = 0
+        self._row_count = 0
+        self._row_buffer = np.zeros(0, dtype=np.int64)
+        self._doc_buffer = np.zeros(0, dtype=object)
+        self._row_ids = self._row_buffer[:0]
+        self._doc_ids = self._doc_buffer[:0]
+        self._doc_ranges: Dict[str, List[Tuple[int, int]]] = {}
+        with self._connect() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS rows (
+                    row_id INTEGER PRIMARY KEY,
+                    doc_id TEXT NOT NULL,
+                    chunk_index INTEGER,
+                    metadata TEXT NOT NULL
+                )
+                """
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_rows_doc_id ON rows (doc_id, chunk_index)")
+            conn.execute("CREATE TABLE IF NOT EXISTS info (key TEXT PRIMARY KEY, value INTEGER NOT NULL)")
+            # generation : toute modification ; layout : suppressions et compactages ; epoch : compactages
+            conn.execute(
+                "INSERT OR IGNORE INTO info (key, value) VALUES "
+                "('generation', 0), ('dimension', 0), ('layout', 0), ('epoch', 0)"
+            )
+
+    @contextmanager
+    def _connect(self) -> Iterator[sqlite3.Connection]:
+        """Ouvre une connexion dédiée et valide la transaction en sortie."""
+        with closing(sqlite3.connect(self.db_path, timeout=30)) as conn:
+            with conn:
+                yield conn
+
+    @contextmanager
+    def _maintenance(self) -> Iterator[None]:
+        """Verrou exclusif des mises à jour des codes et de l'index, entre threads et entre processus."""
+        with self._maintenance_lock, exclusive_file_lock(self._maintenance_lock_path):
+            yield
+
+    def _path(self, name: str, epoch: int) -> str:
+        """Chemin d'un fichier de données à une époque (l'époque 0 garde le nom d'origine)."""
+        return os.path.join(self.directory, name if epoch == 0 else f"{epoch}.{name}")
+
+    def _info(self, conn: sqlite3.Connection, key: str) -> int:
+        return conn.execute("SELECT value FROM info WHERE key = ?", (key,)).fetchone()[0]
+
+    def _bump(self, conn: sqlite3.Connection, *keys: str) -> None:
+        """Incrémente des compteurs d'état, toujours avec la génération."""
+        for key in ("generation", *keys):
+            conn.execute("UPDATE info SET value = value + 1 WHERE key = ?", (key,))
+
+    def _refresh_rows(self, conn: sqlite3.Connection, full: bool = False) -> None:
+        """Met à jour les lignes vivantes si la base a été modifiée, y compris par un autre processus.
+
+        Après des ajouts seulement, seules les nouvelles lignes sont lues ; une
+        suppression ou un compactage (ou full) entraîne une relecture complète.
+        Verrou tenu par l'appelant.
+        """
+        generation = self._info(conn, "generation")
+        if generation == self._generation and not full:
+            return
+        layout = self._info(conn, "layout")
+        if full or layout != self._layout:
+            rows = conn.execute("SELECT row_id, doc_id FROM rows ORDER BY row_id").fetchall()
+            self._row_buffer = np.fromiter((row[0] for row in rows), dtype=np.int64, count=len(rows))
+            self._doc_buffer = np.array([row[1] for row in rows], dtype=object)
+            self._row_count = len(rows)
+            self._doc_ranges = self._build_doc_ranges(self._row_buffer, self._doc_buffer)
+        else:
+            last_row = int(self._row_buffer[self._row_count - 1]) if self._row_count else -1
+            rows = conn.execute(
+                "SELECT row_id, doc_id FROM rows WHERE row_id > ? ORDER BY row_id", (last_row,)
+            ).fetchall()
+            self._append_rows(rows)
+        self._row_ids = self._row_buffer[:self._row_count]
+        self._doc_ids = self._doc_buffer[:self._row_count]
+        self._generation, self._layout = generation, layout
+        self._epoch = self._info(conn, "epoch")
+
+    def _append_rows(self, rows: List[Tuple[int, str]]) -> None:
+        """Ajoute des lignes à la suite des tampons et complète les plages des documents."""
+        if not rows:
+            return
+        count = self._row_count
+        new_count = count + len(rows)
+        if new_count > len(self._row_buffer):
+            capacity = max(new_count, 2 * len(self._row_buffer), 1024)
+            row_buffer = np.empty(capacity, dtype=np.int64)
+            doc_buffer = np.empty(capacity, dtype=object)
+            row_buffer[:count] = self._row_buffer[:count]
+            doc_buffer[:count] = self._doc_buffer[:count]
+            self._row_buffer, self._doc_buffer = row_buffer, doc_buffer
+        self._row_buffer[count:new_count] = [row[0] for row in rows]
+        self._doc_buffer[count:new_count] = [row[1] for row in rows]
+
+        # Plages remplacées, jamais modifiées : les recherches en cours gardent les précédentes
+        doc_ranges = dict(self._doc_ranges)
+        new_ranges = self._build_doc_ranges(self._row_buffer[count:new_count], self._doc_buffer[count:new_count])
+        for doc_id, ranges in new_ranges.items():
+            ranges = [(start + count, end + count) for start, end in ranges]
+            previous = doc_ranges.get(doc_id, [])
+            # Suite d'une plage terminée sur la dernière ligne déjà chargée
+            if (
+                previous and previous[-1][1] == count and ranges[0][0] == count
+                and self._row_buffer[count] == self._row_buffer[count - 1] + 1
+            ):
+                ranges[0] = (previous[-1][0], ranges[0][1])
+                previous = previous[:-1]
+            doc_ranges[doc_id] = previous + ranges
+        self._doc_ranges = doc_ranges
+        self._row_count = new_count
+
+    @staticmethod
+    def _build_doc_ranges(row_ids: np.ndarray, doc_ids: np.ndarray) -> Dict[str, List[Tuple[int, int]]]:
+        """Plages [début, fin) des positions de chaque document dans row_ids.
+
+        Une plage se termine quand le document change ou que les numéros de
+        ligne ne se suivent plus (lignes supprimées) ; un document ajouté en
+        une fois occupe donc une seule plage.
+        """
+        if len(row_ids) == 0:
+            return {}
+        breaks = np.flatnonzero((doc_ids[1:] != doc_ids[:-1]) | (np.diff(row_ids) != 1)) + 1
+        starts = np.concatenate([[0], breaks]).tolist()
+        ends = np.concatenate([breaks, [len(row_ids)]]).tolist()
+        ranges: Dict[str, List[Tuple[int, int]]] = {}
+        for start, end in zip(starts, ends):
+            ranges.setdefault(doc_ids[start], []).append((start, end))
+        return ranges
+
+    def _snapshot(self, conn: sqlite3.Connection) -> Tuple[np.ndarray, np.ndarray, Dict[str, List[Tuple[int, int]]], int, int, Optional[np.memmap]]:
+        """Ouvre une transaction de lecture et retourne l'état qu'elle voit.
+
+        Les requêtes suivantes sur conn (filtres, métadonnées) voient le même
+        état que les lignes et les fichiers retournés, même si un autre
+        processus valide entre-temps un ajout, une suppression ou un compactage.
+
+        Returns:
+            Lignes vivantes, leurs doc_id, plages des documents, dimension, époque et vecteurs
+        """
+        for attempt in range(_SNAPSHOT_ATTEMPTS + 1):
+            conn.execute("BEGIN")
+            generation = self._info(conn, "generation")
+            with self._lock:
+                if generation != self._generation:
+                    if generation < self._generation and attempt < _SNAPSHOT_ATTEMPTS:
+                        # État en mémoire déjà plus récent que la transaction : nouvelle transaction
+                        conn.rollback()
+                        continue
+                    self._refresh_rows(conn, full=generation < self._generation)
+                row_ids, doc_ids, doc_ranges, epoch = self._row_ids, self._doc_ids, self._doc_ranges, self._epoch
+            dimension = self._info(conn, "dimension")
+            if len(row_ids) == 0:
+                return row_ids, doc_ids, doc_ranges, dimension, epoch, None
+            try:
+                vectors = self._open_vectors(dimension, epoch)
+            except FileNotFoundError:
+                # Fichiers d'une époque retirée par un compactage validé depuis : nouvelle transaction
+                conn.rollback()
+                continue
+            return row_ids, doc_ids, doc_ranges, dimension, epoch, vectors
+        raise RuntimeError(f"Lecture d'un état cohérent du stockage {self.kb_id} impossible")
+
+    @staticmethod
+    def _preselect(
+        metadata_filter: MetadataFilter,
+        doc_ranges: Dict[str, List[Tuple[int, int]]],
+        row_count: int
+    ) -> Optional[np.ndarray]:
+        """Positions des lignes d'un filtre doc_id "equals" ou "in", lues dans les plages des documents.
+
+        Returns:
+            Positions triées dans les row_count premières lignes, ou None si le filtre ne s'y prête pas
+        """
+        if metadata_filter["field"] != "doc_id" or metadata_filter["operator"] not in ("equals", "in"):
+            return None
+        selected = metadata_filter["value"]
+        if metadata_filter["operator"] == "equals":
+            selected = [selected]
+        positions = [
+            np.arange(start, min(end, row_count))
+            for doc_id in set(selected)
+            for start, end in doc_ranges.get(doc_id, [])
+            if start < row_count
+        ]
+        if not positions:
+            return np.zeros(0, dtype=np.int64)
+        return np.sort(np.concatenate(positions))
+
+    def _open_vectors(self, dimension: int, epoch: int) -> Optional[np.memmap]:
+        """Projette le fichier de vecteurs d'une époque en mémoire (lignes complètes uniquement).
+
+        Lève FileNotFoundError si le fichier d'une époque de compactage a été retiré.
+        """
+        path = self._path(self._vectors_name, epoch)
+        if not dimension or (epoch == 0 and not os.path.exists(path)):
+            return None
+        row_size = dimension * np.dtype(self._np_dtype).itemsize
+        row_count = os.path.getsize(path) // row_size
+        if row_count == 0:
+            return None
+        return np.memmap(path, dtype=self._np_dtype, mode="r", shape=(row_count, dimension))
+
+    def _open_codes(self, dimension: int, epoch: int) -> Optional[np.memmap]:
+        """Projette le fichier de codes d'une époque en mémoire (lignes complètes uniquement)."""
+        if self._quantizer is None or not self._quantizer.is_trained:
+            return None
+        path = self._path(self._codes_name, epoch)
+        if not dimension or not os.path.exists(path):
+            return None
+        row_dtype = self._quantizer.row_dtype(dimension)
+        row_count = os.path.getsize(path) // row_dtype.itemsize
+        if row_count == 0:
+            return None
+        return np.memmap(path, dtype=row_dtype, mode="r", shape=(row_count,))
+
+    def _faiss_index(self, epoch: int) -> Optional[FaissIndex]:
+        """Index approché d'une époque (None pour un index "flat")."""
+        if self._index is None:
+            return None
+        with self._lock:
+            path = self._path(self._index_name, epoch)
+            if self._index.path != path:
+                self._index = FaissIndex(path, self.index_spec, self.quantization, self.pq_subvector_dims)
+            return self._index
+
+    def _encode_pending(self, dimension: int, epoch: int) -> None:
+        """Encode les vecteurs d'une époque qui n'ont pas encore de codes (verrou _maintenance tenu).
+
+        Le dictionnaire de la quantification "pq" est appris ici, sur un
+        échantillon des vecteurs, dès que la base atteint le seuil
+        d'apprentissage.
+        """
+        if self._quantizer is None:
+            return
+        vectors = self._open_vectors(dimension, epoch)
+        if vectors is None:
+            return
+        if not self._quantizer.is_trained:
+            if vectors.shape[0] < self._quantizer.train_threshold:
+                return
+            rng = np.random.default_rng(0)
+            sample = np.sort(rng.choice(vectors.shape[0], self._quantizer.train_threshold, replace=False))
+            self._quantizer.train(np.asarray(vectors[sample], dtype=np.float32))
+
+        row_size = self._quantizer.row_dtype(dimension).itemsize
+        with open(self._path(self._codes_name, epoch), "ab") as f:
+            # Une fin de fichier incomplète (écriture interrompue) est écrasée
+            encoded_rows = f.tell() // row_size
+            f.truncate(encoded_rows * row_size)
+            f.seek(encoded_rows * row_size)
+            for start in range(encoded_rows, vectors.shape[0], _BLOCK_ROWS):
+                block = np.asarray(vectors[start:start + _BLOCK_ROWS], dtype=np.float32)
+                self._quantizer.encode(block).tofile(f)
+
+    def _update_index(self, dimension: int, epoch: int, index: Optional[FaissIndex] = None) -> None:
+        """Construit l'index approché d'une époque au seuil de min_rows, puis le complète (verrou _maintenance tenu).
+
+        L'index est construit ou complété sur une copie, publiée une fois prête.
+
+        Args:
+            dimension: Dimension des vecteurs
+            epoch: Époque des fichiers de vecteurs et d'index
+            index: Index à compléter, par défaut celui de l'époque (voir _faiss_index)
+        """
+        index = index or self._faiss_index(epoch)
+        if index is None:
+            return
+        vectors = self._open_vectors(dimension, epoch)
+        if vectors is None:
+            return
+        if index.refresh():
+            index.extend(vectors, _BLOCK_ROWS)
+        elif vectors.shape[0] >= self.index_spec["min_rows"]:
+            index.build(vectors, _BLOCK_ROWS)
+
+    def _update_derived(self) -> None:
+        """Complète les codes et l'index de l'époque courante avec les lignes ajoutées."""
+        if self._quantizer is None and self._index is None:
+            return
+        with self._maintenance():
+            # Époque lue sous le verrou : aucun compactage ne peut la changer pendant la mise à jour
+            with self._connect() as conn:
+                dimension = self._info(conn, "dimension")
+                epoch = self._info(conn, "epoch")
+            self._encode_pending(dimension, epoch)
+            self._update_index(dimension, epoch)
+
+    def add_vectors(self, vectors: Sequence[Sequence[float]], metadata: Sequence[Dict[str, Any]]) -> None:
+        """Ajoute des vecteurs et leurs métadonnées à la suite du stockage."""
+        if len(vectors) != len(metadata):
+            raise ValueError("Le nombre de vecteurs et de métadonnées doit être identique")
+        if not len(vectors):
+            return
+        matrix = np.asarray(vectors, dtype=np.float32)
+        norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+        matrix = matrix / np.where(norms == 0, 1, norms)
+
+        with self._write_lock, self._connect() as conn:
+            # Verrou d'écriture pris avant de lire la fin du fichier : deux processus
+            # ne peuvent pas calculer le même first_row
+            conn.execute("BEGIN IMMEDIATE")
+            dimension = self._info(conn, "dimension")
+            if dimension == 0:
+                dimension = matrix.shape[1]
+                conn.execute("UPDATE info SET value = ? WHERE key = 'dimension'", (dimension,))
+            elif matrix.shape[1] != dimension:
+                raise ValueError(f"Dimension {matrix.shape[1]} incompatible avec la base ({dimension})")
+            epoch = self._info(conn, "epoch")
+
+            # Une fin de fichier incomplète (écriture interrompue) est écrasée
+            row_size = dimension * np.dtype(self._np_dtype).itemsize
+            with open(self._path(self._vectors_name, epoch), "ab") as f:
+                first_row = f.tell() // row_size
+                f.truncate(first_row * row_size)
+                f.seek(first_row * row_size)
+                matrix.astype(self._np_dtype).tofile(f)
+
+            conn.executemany(
+                "INSERT INTO rows (row_id, doc_id, chunk_index, metadata) VALUES (?, ?, ?, ?)",
+                [
+                    (first_row + offset, item.get("doc_id", ""), item.get("chunk_index"), json.dumps(item))
+                    for offset, item in enumerate(metadata)
+                ]
+            )
+            self._bump(conn)
+        # Après la validation : l'apprentissage et l'indexation ne bloquent ni les écritures ni les recherches
+        self._update_derived()
+
+    @staticmethod
+    def _filter_mask(
+        conn: sqlite3.Connection,
+        metadata_filter: MetadataFilter,
+        row_ids: np.ndarray,
+        doc_ids: np.ndarray
+    ) -> np.ndarray:
+        """Masque des lignes satisfaisant un filtre de métadonnées."""
+        field = metadata_filter["field"]
+        operator = metadata_filter["operator"]
+        expected = metadata_filter["value"]
+        if operator not in _FILTER_OPERATORS:
+            raise ValueError(f"Opérateur de filtre non supporté: {operator}")
+        if operator in ("in", "not_in"):
+            expected = set(expected)
+        test = _FILTER_OPERATORS[operator]
+
+        if field == "doc_id" and operator in ("in", "not_in"):
+            mask = np.isin(doc_ids, list(expected))
+            return mask if operator == "in" else ~mask
+        if field == "doc_id":
+            values = doc_ids
+        else:
+            rows = conn.execute(
+                "SELECT row_id, json_extract(metadata, ?) FROM rows ORDER BY row_id",
+                (f"$.{field}",)
+            ).fetchall()
+            by_row = dict(rows)
+            values = [by_row.get(row_id) for row_id in row_ids.tolist()]
+        return np.fromiter((test(value, expected) for value in values), dtype=bool, count=len(row_ids))
+
+    @staticmethod
+    def _top_rows(
+        row_ids: np.ndarray,
+        score_rows: Callable[[np.ndarray], np.ndarray],
+        top_k: int
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """Scores par blocs, en ne gardant que les top_k meilleurs de chaque bloc."""
+        best_rows = np.zeros(0, dtype=np.int64)
+        best_scores = np.zeros(0, dtype=np.float32)
+        for start in range(0, len(row_ids), _BLOCK_ROWS):
+            block = row_ids[start:start + _BLOCK_ROWS]
+            scores = score_rows(block)
+            if len(scores) > top_k:
+                keep = np.argpartition(-scores, top_k)[:top_k]
+                block, scores = block[keep], scores[keep]
+            best_rows = np.concatenate([best_rows, block])
+            best_scores = np.concatenate([best_scores, scores])
+        order = np.argsort(-best_scores)[:top_k]
+        return best_rows[order], best_scores[order]
+
+    def search(
+        self,
+        query_vector: Sequence[float],
+        top_k: int = 10,
+        metadata_filter: Optional[MetadataFilter] = None,
+        exact: bool = False,
+        nprobe: Optional[int] = None,
+        ef_search: Optional[int] = None
+    ) -> List[Dict[str, Any]]:
+        """Retourne les top_k lignes les plus similaires (similarité cosinus).
+
+        Args:
+            query_vector: Vecteur de la requête
+            top_k: Nombre de résultats
+            metadata_filter: Filtre de métadonnées optionnel
+            exact: Si True, ignore l'index et la quantification et score tous les vecteurs d'origine
+            nprobe: Listes parcourues par un index "ivf" (par défaut, paramètres de la requête ou de l'index)
+            ef_search: Taille de la liste de recherche d'un index "hnsw" (idem)
+        """
+        # Paramètres explicites, sinon ceux fixés par le moteur de recherche pour cette question
+        search_params = {
+            **current_vector_search_params(),
+            **{name: value for name, value in (("nprobe", nprobe), ("ef_search", ef_search)) if value is not None}
+        }
+        query = np.asarray(query_vector, dtype=np.float32)
+        norm = np.linalg.norm(query)
+        if norm == 0:
+            return []
+        query = query / norm
+
+        with self._connect() as conn:
+            row_ids, doc_ids, doc_ranges, dimension, epoch, vectors = self._snapshot(conn)
+            if vectors is None:
+                return []
+            # Lignes triées : les lignes visibles sont un préfixe
+            visible_count = int(np.searchsorted(row_ids, vectors.shape[0]))
+            row_ids, doc_ids = row_ids[:visible_count], doc_ids[:visible_count]
+            all_live = len(row_ids) == vectors.shape[0]
+            if metadata_filter:
+                positions = self._preselect(metadata_filter, doc_ranges, visible_count)
+                if positions is not None:
+                    row_ids = row_ids[positions]
+                else:
+                    row_ids = row_ids[self._filter_mask(conn, metadata_filter, row_ids, doc_ids)]
+                all_live = False
+            if len(row_ids) == 0:
+                return []
+            # Peu de lignes retenues : un score exact de ces seules lignes est moins coûteux et sans perte
+            if metadata_filter and len(row_ids) <= self.prefilter_max_rows:
+                exact = True
+
+            def exact_scores(rows: np.ndarray) -> np.ndarray:
+                return np.asarray(vectors[rows], dtype=np.float32) @ query
+
+            candidates = None
+            index = None if exact else self._faiss_index(epoch)
+            if index is not None:
+                if index.refresh():
+                    candidates, indexed_rows = index.search(
+                        query,
+                        top_k * self.rescore_factor,
+                        selected_rows=None if all_live else row_ids,
+                        **{name: search_params[name] for name in SEARCH_PARAMS if name in search_params}
+                    )
+            codes = None if exact or candidates is not None else self._open_codes(dimension, epoch)
+            if candidates is not None:
+                # Candidats de l'index parmi les lignes retenues ; les plus récentes, hors index, en exact
+                candidates = np.union1d(candidates, row_ids[row_ids >= indexed_rows])
+                best_rows, best_scores = self._top_rows(candidates, exact_scores, top_k)
+            elif codes is None:
+                best_rows, best_scores = self._top_rows(row_ids, exact_scores, top_k)
+            else:
+                # Lignes encodées parcourues en codes ; les plus récentes, pas encore encodées, en exact
+                encoded = row_ids < codes.shape[0]
+                candidates, _ = self._top_rows(
+                    row_ids[encoded],
+                    lambda rows: self._quantizer.scores(codes[rows], query),
+                    top_k * self.rescore_factor
+                )
+                candidates = np.sort(np.concatenate([candidates, row_ids[~encoded]]))
+                best_rows, best_scores = self._top_rows(candidates, exact_scores, top_k)
+
+            # Métadonnées lues dans la transaction de l'état parcouru
+            placeholders = ",".join("?" * len(best_rows))
+            metadata_by_row = dict(conn.execute(
+                f"SELECT row_id, metadata FROM rows WHERE row_id IN ({placeholders})",
+                best_rows.tolist()
+            ).fetchall())
+
+        results = []
+        for row_id, score in zip(best_rows.tolist(), best_scores.tolist()):
+            metadata = json.loads(metadata_by_row[row_id])
+            results.append({
+                "doc_id": metadata.get("doc_id", ""),
+                "metadata": metadata,
+                "similarity": score,
+                "vector": np.asarray(vectors[row_id], dtype=np.float32),
+            })
+        return results
+
+    def remove_document(self, doc_id: str) -> None:
+        """Retire les lignes d'un document (les vecteurs restent jusqu'au compactage)."""
+        with self._write_lock, self._connect() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            conn.execute("DELETE FROM rows WHERE doc_id = ?", (doc_id,))
+            self._bump(conn, "layout")
+
+    def _remove_files_before(self, epoch: int) -> None:
+        """Supprime les fichiers de données des époques antérieures à epoch."""
+        for filename in os.listdir(self.directory):
+            for name in (self._vectors_name, self._codes_name, self._index_name):
+                prefix = filename[:-len(name)].rstrip(".")
+                if filename.endswith(name) and (prefix == "" or (prefix.isdigit() and int(prefix) < epoch)):
+                    try:
+                        os.remove(os.path.join(self.directory, filename))
+                    except OSError:
+                        pass
+
+    def compact(self) -> int:
+        """Réécrit le fichier de vecteurs sans les lignes supprimées.
+
+        Les fichiers compactés sont écrits sous les noms de l'époque suivante,
+        puis l'époque change dans la transaction qui renumérote les lignes :
+        une interruption avant la validation laisse l'état précédent intact.
+
+        Returns:
+            Nombre de lignes récupérées
+        """
+        with self._maintenance(), self._write_lock:
+            with self._connect() as conn:
+                # Écritures des autres processus bloquées jusqu'à la validation ; les lectures continuent
+                conn.execute("BEGIN IMMEDIATE")
+                dimension = self._info(conn, "dimension")
+                epoch = self._info(conn, "epoch")
+                row_ids = np.array(
+                    [row[0] for row in conn.execute("SELECT row_id FROM rows ORDER BY row_id")],
+                    dtype=np.int64
+                )
+                vectors = self._open_vectors(dimension, epoch) if len(row_ids) else None
+                if vectors is None:
+                    return 0
+                live_rows = row_ids[row_ids < vectors.shape[0]]
+                reclaimed = vectors.shape[0] - len(live_rows)
+                if reclaimed == 0:
+                    return 0
+
+                # Restes d'un compactage interrompu vers la même époque
+                new_epoch = epoch + 1
+                for name in (self._vectors_name, self._codes_name, self._index_name):
+                    if os.path.exists(self._path(name, new_epoch)):
+                        os.remove(self._path(name, new_epoch))
+
+                new_vectors_path = self._path(self._vectors_name, new_epoch)
+                temporary_path = f"{new_vectors_path}.tmp"
+                with open(temporary_path, "wb") as f:
+                    for start in range(0, len(live_rows), _BLOCK_ROWS):
+                        np.asarray(vectors[live_rows[start:start + _BLOCK_ROWS]]).tofile(f)
+                del vectors
+                os.replace(temporary_path, new_vectors_path)
+                # Codes réencodés dans la nouvelle numérotation, avec le même dictionnaire
+                self._encode_pending(dimension, new_epoch)
+                # Index reconstruit dans la nouvelle numérotation, sans remplacer celui des recherches en cours
+                if self._index is not None:
+                    self._update_index(dimension, new_epoch, FaissIndex(
+                        self._path(self._index_name, new_epoch), self.index_spec, self.quantization, self.pq_subvector_dims
+                    ))
+
+                # Renumérotation dans l'ordre : les nouveaux numéros ne rencontrent jamais d'anciens
+                conn.executemany(
+                    "UPDATE rows SET row_id = ? WHERE row_id = ?",
+                    [(new_row, old_row) for new_row, old_row in enumerate(live_rows.tolist())]
+                )
+                conn.execute("DELETE FROM rows WHERE row_id >= ?", (len(live_rows),))
+                conn.execute("UPDATE info SET value = ? WHERE key = 'epoch'", (new_epoch,))
+                self._bump(conn, "layout")
+            # Les recherches en cours sur l'époque précédente gardent leurs projections
+            self._remove_files_before(new_epoch)
+            return reclaimed
+
+    def sample_vectors(self, count: int, seed: int = 0) -> np.ndarray:
+        """Retourne des vecteurs tirés au hasard parmi les lignes vivantes."""
+        with self._connect() as conn:
+            row_ids, _, _, _, _, vectors = self._snapshot(conn)
+        if vectors is None:
+            return np.zeros((0, 0), dtype=np.float32)
+        row_ids = row_ids[row_ids < vectors.shape[0]]
+        rng = np.random.default_rng(seed)
+        chosen = np.sort(rng.choice(row_ids, min(count, len(row_ids)), replace=False))
+        return np.asarray(vectors[chosen], dtype=np.float32)
+
+    def memory_stats(self) -> Dict[str, int]:
+        """Taille des vecteurs d'origine et des codes (ou de l'index) parcourus par les recherches."""
+        with self._connect() as conn:
+            epoch = self._info(conn, "epoch")
+
+        def size(name: str) -> int:
+            path = self._path(name, epoch)
+            return os.path.getsize(path) if os.path.exists(path) else 0
+
+        vector_bytes = size(self._vectors_name)
+        if self._index is not None:
+            code_bytes = size(self._index_name)
+        else:
+            code_bytes = size(self._codes_name) if self._quantizer else 0
+        return {
+            "vector_bytes": vector_bytes,
+            "code_bytes": code_bytes,
+            "scanned_bytes": code_bytes or vector_bytes,
+        }
+
+    def get_num_vectors(self) -> int:
+        with self._connect() as conn:
+            return conn.execute("SELECT COUNT(*) FROM rows").fetchone()[0]
+
+    def delete(self) -> None:
+        """Supprime tous les fichiers du stockage."""
+        with self._write_lock, self._lock:
+            shutil.rmtree(self.directory, ignore_errors=True)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            **super().to_dict(),
+            "kb_id": self.kb_id,
+            "storage_directory": self.storage_directory,
+            "dtype": self.dtype,
+            "quantization": self.quantization,
+            "rescore_factor": self.rescore_factor,
+            "pq_subvector_dims": self.pq_subvector_dims,
+            "index": format_index_spec(self.index_spec),
+            "prefilter_max_rows": self.prefilter_max_rows,
+        }
@@ -0,0 +1,101 @@
+"""
+Partage des embeddings de requête entre les bases de connaissances.
+
+Chaque appel à kb.query() ou kb.search() embarque normalement un appel à l'API
+d'embedding. Les bases qui partagent le même modèle (même bloc
+`components.embedding_model` dans leur fichier de métadonnées) peuvent
+réutiliser un unique vecteur par question.
+"""
+
+import json
+import threading
+from collections import OrderedDict
+from typing import List, Optional, Tuple, Union
+from dsrag.embedding import Embedding
+from dsrag.knowledge_base import KnowledgeBase
+
+Vector = List[float]
+
+
+def embedding_model_key(kb: KnowledgeBase) -> str:
+    """Retourne la clé du modèle d'embedding d'une base.
+
+    La clé est le bloc `components.embedding_model` sérialisé tel qu'il est
+    enregistré dans le fichier de métadonnées de la base.
+    """
+    model = kb.embedding_model
+    if isinstance(model, SharedQueryEmbedding):
+        model = model.embedding_model
+    return json.dumps(model.to_dict(), sort_keys=True)
+
+
+class QueryEmbeddingStore:
+    """Cache LRU borné des embeddings de requête, par modèle."""
+
+    def __init__(self, max_entries: int = 256):
+        """Initialise le cache.
+
+        Args:
+            max_entries: Nombre maximal de vecteurs conservés
+        """
+        self.max_entries = max_entries
+        self._vectors: "OrderedDict[Tuple[str, str], Vector]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, model_key: str, query: str) -> Optional[Vector]:
+        """Retourne le vecteur en cache pour une requête, ou None."""
+        with self._lock:
+            vector = self._vectors.get((model_key, query))
+            if vector is not None:
+                self._vectors.move_to_end((model_key, query))
+            return vector
+
+    def embed(self, model_key: str, embedding_model: Embedding, query: str) -> Vector:
+        """Retourne l'embedding d'une requête, en appelant le modèle si nécessaire.
+
+        Args:
+            model_key: Clé du modèle (voir embedding_model_key)
+            embedding_model: Modèle à utiliser en cas d'absence du cache
+            query: Texte de la requête
+        """
+        vector = self.get(model_key, query)
+        if vector is not None:
+            return vector
+
+        vector = embedding_model.get_embeddings([query], input_type="query")[0]
+        with self._lock:
+            self._vectors[(model_key, query)] = vector
+            self._vectors.move_to_end((model_key, query))
+            while len(self._vectors) > self.max_entries:
+                self._vectors.popitem(last=False)
+        return vector
+
+
+class SharedQueryEmbedding(Embedding):
+    """Modèle d'embedding qui sert les requêtes depuis un QueryEmbeddingStore.
+
+    Les embeddings de documents sont délégués tels quels au modèle d'origine,
+    et la sérialisation reste celle du modèle d'origine : les métadonnées de la
+    base ne sont pas modifiées.
+    """
+
+    def __init__(self, embedding_model: Embedding, store: QueryEmbeddingStore, model_key: str):
+        super().__init__(dimension=embedding_model.dimension)
+        self.embedding_model = embedding_model
+        self.store = store
+        self.model_key = model_key
+
+    def get_embeddings(self, text: Union[str, List[str]], input_type: Optional[str] = None):
+        if input_type != "query":
+            return self.embedding_model.get_embeddings(text, input_type)
+
+        texts = [text] if isinstance(text, str) else list(text)
+        vectors = [self.store.embed(self.model_key, self.embedding_model, t) for t in texts]
+        return vectors[0] if isinstance(text, str) else vectors
+
+    def to_dict(self):
+        return self.embedding_model.to_dict()
+
+
+# Cache partagé par tous les moteurs de recherche du processus
+query_embedding_store = QueryEmbeddingStore()
@@ -0,0 +1,163 @@
+"""
+Cache persistant des scores de reranking.
+
+Les mêmes couples (question, chunk) sont rescorés d'un mode RSE à l'autre,
+d'une question répétée à l'autre et d'une session à l'autre. Les scores sont
+conservés dans une base SQLite du répertoire de stockage, indexés par le
+modèle de reranking, la requête normalisée et l'empreinte du texte du chunk,
+avec un LRU borné en mémoire devant. Seuls les chunks absents du cache sont
+envoyés au fournisseur.
+"""
+
+import hashlib
+import json
+import sqlite3
+import threading
+from collections import OrderedDict
+from contextlib import closing, contextmanager
+from typing import Dict, Iterator, List
+from dsrag.reranker import Reranker
+
+from src.core.result_cache import normalize_query
+
+# Nombre maximal de paramètres par requête SQLite
+_SQL_BATCH = 500
+
+class RerankScoreCache:
+    """Scores de reranking persistés sur disque, avec un LRU en mémoire."""
+
+    def __init__(self, db_path: str, max_entries: int = 100000):
+        """Initialise le cache et crée la table si nécessaire.
+
+        Args:
+            db_path: Chemin du fichier SQLite
+            max_entries: Nombre maximal de scores conservés en mémoire
+        """
+        self.db_path = db_path
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._memory: "OrderedDict[str, float]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._db_lock = threading.Lock()
+        with self._connect() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS rerank_scores (key TEXT PRIMARY KEY, score REAL NOT NULL) WITHOUT ROWID"
+            )
+
+    @contextmanager
+    def _connect(self) -> Iterator[sqlite3.Connection]:
+        """Ouvre une connexion dédiée et valide la transaction en sortie."""
+        with self._db_lock, closing(sqlite3.connect(self.db_path, timeout=30)) as conn:
+            with conn:
+                yield conn
+
+    @staticmethod
+    def make_key(model_key: str, query: str, chunk_text: str) -> str:
+        """Construit la clé d'un score (modèle, requête normalisée, empreinte du chunk)."""
+        chunk_hash = hashlib.sha256(chunk_text.encode("utf-8")).hexdigest()
+        return hashlib.sha256(
+            "\0".join((model_key, normalize_query(query), chunk_hash)).encode("utf-8")
+        ).hexdigest()
+
+    def _remember(self, scores: Dict[str, float]) -> None:
+        """Ajoute des scores au LRU en mémoire (verrou tenu par l'appelant)."""
+        for key, score in scores.items():
+            self._memory[key] = score
+            self._memory.move_to_end(key)
+        while len(self._memory) > self.max_entries:
+            self._memory.popitem(last=False)
+
+    def get_many(self, keys: List[str]) -> Dict[str, float]:
+        """Retourne les scores connus parmi les clés demandées."""
+        found = {}
+        with self._lock:
+            for key in keys:
+                if key in self._memory:
+                    self._memory.move_to_end(key)
+                    found[key] = self._memory[key]
+
+        missing = [key for key in keys if key not in found]
+        from_disk = {}
+        with self._connect() as conn:
+            for start in range(0, len(missing), _SQL_BATCH):
+                batch = missing[start:start + _SQL_BATCH]
+                rows = conn.execute(
+                    f"SELECT key, score FROM rerank_scores WHERE key IN ({','.join('?' * len(batch))})",
+                    batch
+                ).fetchall()
+                from_disk.update(rows)
+
+        with self._lock:
+            self._remember(from_disk)
+            found.update(from_disk)
+            self.hits += len(found)
+            self.misses += len(keys) - len(found)
+        return found
+
+    def put_many(self, scores: Dict[str, float]) -> None:
+        """Enregistre des scores en mémoire et sur disque."""
+        if not scores:
+            return
+        with self._lock:
+            self._remember(scores)
+        with self._connect() as conn:
+            conn.executemany(
+                "INSERT OR REPLACE INTO rerank_scores (key, score) VALUES (?, ?)",
+                list(scores.items())
+            )
+
+    def stats(self) -> Dict[str, int]:
+        """Retourne les compteurs du cache."""
+        with self._lock:
+            return {"hits": self.hits, "misses": self.misses, "entries": len(self._memory)}
+
+class CachedReranker(Reranker):
+    """Reranker qui ne soumet au fournisseur que les chunks absents du cache.
+
+    La sérialisation reste celle du reranker d'origine : les métadonnées de la
+    base ne sont pas modifiées.
+    """
+
+    def __init__(self, reranker: Reranker, cache: RerankScoreCache):
+        self.reranker = reranker
+        self.cache = cache
+        self.model_key = json.dumps(reranker.to_dict(), sort_keys=True)
+
+    @staticmethod
+    def _document_text(result: Dict) -> str:
+        """Texte soumis au reranker pour un résultat (en-tête et contenu du chunk)."""
+        metadata = result.get("metadata", {})
+        return f"{metadata.get('chunk_header', '')}\n\n{metadata.get('chunk_text', '')}"
+
+    def rerank_search_results(self, query: str, search_results: List[Dict]) -> List[Dict]:
+        keys = [
+            self.cache.make_key(self.model_key, query, self._document_text(result))
+            for result in search_results
+        ]
+        scores = self.cache.get_many(keys)
+
+        misses = [(key, result) for key, result in zip(keys, search_results) if key not in scores]
+        if misses:
+            # Copies : les résultats d'origine ne sont pas modifiés par le reranker
+            copies = [dict(result) for _, result in misses]
+            owners = {id(copy): key for (key, _), copy in zip(misses, copies)}
+            new_scores = {}
+            for result in self.reranker.rerank_search_results(query, copies):
+                key = owners.get(id(result))
+                if key is not None:
+                    new_scores[key] = result["similarity"]
+            self.cache.put_many(new_scores)
+            scores.update(new_scores)
+
+        reranked = [
+            {**result, "similarity": scores[key]}
+            for key, result in zip(keys, search_results)
+            if key in scores
+        ]
+        reranked.sort(key=lambda result: result["similarity"], reverse=True)
+        return reranked
+
+    def to_dict(self):
+        return self.reranker.to_dict()
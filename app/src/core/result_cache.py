@@ -0,0 +1,108 @@
+"""
+Cache des résultats de recherche.
+
+Les entrées sont indexées par la requête normalisée, la sélection de documents
+et la version de chaque base interrogée. Toute modification d'une base
+incrémente sa version : les entrées calculées avant la modification ne peuvent
+donc plus être atteintes et finissent évincées par le LRU ou le TTL.
+"""
+
+import threading
+import time
+import unicodedata
+from collections import OrderedDict
+from typing import Dict, Hashable, List, Optional, Tuple
+
+from src.core.document_reference import DocumentReference
+
+def normalize_query(query: str) -> str:
+    """Normalise une requête (Unicode, casse et espaces)."""
+    return " ".join(unicodedata.normalize("NFC", query).lower().split())
+
+class SearchResultCache:
+    """Cache LRU à durée de vie limitée des résultats de recherche."""
+
+    def __init__(self, max_entries: int = 128, ttl: float = 600.0):
+        """Initialise le cache.
+
+        Args:
+            max_entries: Nombre maximal de recherches conservées
+            ttl: Durée de vie d'une entrée en secondes
+        """
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._entries: "OrderedDict[Hashable, Tuple[float, Tuple[DocumentReference, ...]]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def make_scope(
+        kb_versions: Dict[str, int],
+        selected_docs: Optional[List[str]] = None,
+        search_params: Optional[Dict[str, int]] = None
+    ) -> Hashable:
+        """Construit la portée d'une recherche (bases versionnées, documents et paramètres).
+
+        Args:
+            kb_versions: Version de chaque base interrogée
+            selected_docs: Documents sélectionnés
+            search_params: Paramètres des index approchés
+        """
+        return (
+            tuple(sorted(kb_versions.items())),
+            tuple(sorted(set(selected_docs or []))),
+            tuple(sorted((search_params or {}).items()))
+        )
+
+    @staticmethod
+    def make_key(
+        query: str,
+        kb_versions: Dict[str, int],
+        selected_docs: Optional[List[str]] = None,
+        search_params: Optional[Dict[str, int]] = None
+    ) -> Hashable:
+        """Construit la clé d'une recherche.
+
+        Args:
+            query: Requête de l'utilisateur
+            kb_versions: Version de chaque base interrogée
+            selected_docs: Documents sélectionnés
+            search_params: Paramètres des index approchés
+        """
+        return (
+            normalize_query(query),
+            SearchResultCache.make_scope(kb_versions, selected_docs, search_params)
+        )
+
+    def get(self, key: Hashable) -> Optional[List[DocumentReference]]:
+        """Retourne les résultats en cache pour une clé, ou None."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and time.monotonic() - entry[0] > self.ttl:
+                del self._entries[key]
+                entry = None
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return list(entry[1])
+
+    def put(self, key: Hashable, references: List[DocumentReference]) -> None:
+        """Enregistre les résultats d'une recherche."""
+        with self._lock:
+            self._entries[key] = (time.monotonic(), tuple(references))
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self) -> None:
+        """Vide le cache."""
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> Dict[str, int]:
+        """Retourne les compteurs du cache."""
+        with self._lock:
+            return {"hits": self.hits, "misses": self.misses, "entries": len(self._entries)}
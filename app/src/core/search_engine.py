@@ -3,46 +3,113 @@ Moteur de recherche pour les bases de connaissances.
 """
 
 import logging
-from dataclasses import dataclass
-from typing import List, Dict, Optional, Union, Tuple
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from contextvars import copy_context
+from functools import partial
+from typing import Any, List, Dict, Optional, Union, Tuple, Callable
 from dsrag.knowledge_base import KnowledgeBase
 from dsrag.database.vector.types import MetadataFilter
 
-from src.core.knowledge_bases_manager import KnowledgeBasesManager
+from src.core.knowledge_bases_manager import KnowledgeBasesManager, get_shared_manager
+from src.core.document_reference import DocumentReference
+from src.core.query_embeddings import SharedQueryEmbedding, embedding_model_key, query_embedding_store
+from src.core.segment_merger import merge_document_references
+from src.core.result_cache import SearchResultCache
+from src.core.semantic_cache import SemanticQueryCache
+from src.core.global_rerank import GlobalRerankReranker, chunk_key, global_rerank_scores, reranker_key
+from src.core.vector_index import SEARCH_PARAMS, vector_search_params
 from src.config import config
 
-@dataclass
-class DocumentReference:
-    """Référence à un document trouvé lors d'une recherche."""
-    doc_id: str
-    kb_id: str
-    text: str
-    relevance_score: float
-    page_numbers: Tuple[int, int]
-    search_mode: str
+RSE_MODES = ["precision", "balanced", "find_all"]
+
+# Stratégies d'enchaînement des modes RSE :
+# - "all": tous les modes sont exécutés et leurs résultats concaténés
+# - "cascade": passage au mode suivant seulement si le mode courant est insuffisant
+MODE_STRATEGIES = ["all", "cascade"]
+
+def _get_all_ranked_results(
+    kb: KnowledgeBase,
+    search_queries: List[str],
+    metadata_filter: Optional[MetadataFilter] = None
+) -> List[List[Dict]]:
+    """KnowledgeBase.get_all_ranked_results, avec le contexte de l'appelant.
+    
+    dsrag lance les kb.search() de kb.query() dans son propre
+    ThreadPoolExecutor, sans copier le contexte : les paramètres des index
+    approchés et les scores du reranking global de la question y seraient
+    perdus. Chaque recherche s'exécute ici dans une copie du contexte courant.
+    """
+    with ThreadPoolExecutor() as executor:
+        futures = [
+            executor.submit(copy_context().run, kb.search, query, 200, metadata_filter)
+            for query in search_queries
+        ]
+        return [future.result() for future in futures]
 
 class SearchEngine:
     """Moteur de recherche avec stratégies de fallback."""
     
-    def __init__(self, storage_directory: Optional[str] = None):
-        """Initialise le moteur de recherche."""
-        self.kb_manager = KnowledgeBasesManager(storage_directory=storage_directory)
+    def __init__(
+        self,
+        storage_directory: Optional[str] = None,
+        kb_manager: Optional[KnowledgeBasesManager] = None
+    ):
+        """Initialise le moteur de recherche.
+        
+        Args:
+            storage_directory: Répertoire des bases, si aucun gestionnaire n'est fourni
+            kb_manager: Gestionnaire de bases (par défaut, le gestionnaire partagé du processus)
+        """
+        self.kb_manager = kb_manager or get_shared_manager(storage_directory)
         self.logger = logging.getLogger(__name__)
         logging.basicConfig(
             level=getattr(logging, config.logging.level.upper()),
             format=config.logging.format
         )
+        
+        # Pool partagé pour interroger les bases en parallèle
+        self.kb_timeout = config.search.kb_timeout
+        self.max_workers = config.search.max_workers
+        self._executor = ThreadPoolExecutor(
+            max_workers=self.max_workers,
+            thread_name_prefix="kb-search"
+        )
+        
+        # Embeddings de requête partagés entre les bases et les modes
+        self.query_embeddings = query_embedding_store
+        
+        if config.search.mode_strategy not in MODE_STRATEGIES:
+            raise ValueError(f"Stratégie de recherche non supportée: {config.search.mode_strategy}")
+        self.mode_strategy = config.search.mode_strategy
+        self.cascade_min_segments = config.search.cascade_min_segments
+        self.cascade_min_score = config.search.cascade_min_score
+        
+        # Reranking unique des meilleurs candidats de toutes les bases
+        self.global_rerank_enabled = config.search.global_rerank_enabled
+        self.rerank_top_k = config.search.rerank_top_k
+        
+        # Cache des résultats, invalidé par les versions des bases
+        self.result_cache = SearchResultCache(
+            max_entries=config.search.cache_max_entries,
+            ttl=config.search.cache_ttl
+        )
+        
+        # Cache sémantique optionnel pour les reformulations d'une même question
+        self.semantic_cache = None
+        if config.search.semantic_cache_enabled:
+            self.semantic_cache = SemanticQueryCache(
+                threshold=config.search.semantic_cache_threshold,
+                max_entries=config.search.semantic_cache_max_entries
+            )
 
-    @staticmethod
-    def _create_metadata_filter(kb: KnowledgeBase, selected_docs: List[str]) -> Optional[MetadataFilter]:
+    def _create_metadata_filter(self, kb: KnowledgeBase, selected_docs: List[str]) -> Optional[MetadataFilter]:
         """Crée un filtre de métadonnées pour les documents sélectionnés."""
         if not selected_docs:
             return None
             
-        selected_docs_in_kb = [
-            doc_id for doc_id in selected_docs
-            if doc_id in [doc["doc_id"] for doc in kb.list_documents()]
-        ]
+        doc_ids = self.kb_manager.get_document_ids(kb.kb_id)
+        selected_docs_in_kb = [doc_id for doc_id in selected_docs if doc_id in doc_ids]
         
         if not selected_docs_in_kb:
             return None
@@ -58,9 +125,14 @@ class SearchEngine:
         result: Dict,
         kb: KnowledgeBase,
         search_mode: str,
-        is_query_result: bool = True
+        is_query_result: bool = True,
+        page_numbers: Optional[Tuple[int, int]] = None
     ) -> DocumentReference:
-        """Crée une référence de document à partir d'un résultat de recherche."""
+        """Crée une référence de document à partir d'un résultat de recherche.
+        
+        Pour un résultat de search(), page_numbers peut être fourni déjà résolu
+        afin d'éviter une lecture du stockage des chunks par résultat.
+        """
         if is_query_result:
             return DocumentReference(
                 doc_id=result["doc_id"],
@@ -71,26 +143,32 @@ class SearchEngine:
                     result.get("segment_page_start", 0),
                     result.get("segment_page_end", 0)
                 ),
-                search_mode=search_mode
+                search_mode=search_mode,
+                chunk_range=(
+                    (result["chunk_start"], result["chunk_end"])
+                    if "chunk_start" in result and "chunk_end" in result else None
+                )
             )
         else:
             metadata = result.get("metadata", {})
             doc_id = metadata.get("doc_id", "")
             chunk_index = metadata.get("chunk_index", 0)
             
-            page_start, page_end = kb.get_segment_page_numbers(
-                doc_id=doc_id,
-                chunk_start=chunk_index,
-                chunk_end=chunk_index + 1
-            )
+            if page_numbers is None:
+                page_numbers = kb.get_segment_page_numbers(
+                    doc_id=doc_id,
+                    chunk_start=chunk_index,
+                    chunk_end=chunk_index + 1
+                )
             
             return DocumentReference(
                 doc_id=doc_id,
                 kb_id=kb.kb_id if hasattr(kb, 'kb_id') else "",
                 text=metadata.get("chunk_text", ""),
                 relevance_score=result.get("similarity", 0),
-                page_numbers=(page_start, page_end),
-                search_mode=search_mode
+                page_numbers=tuple(page_numbers),
+                search_mode=search_mode,
+                chunk_range=(chunk_index, chunk_index + 1)
             )
 
     def _query_knowledge_base(
@@ -100,23 +178,22 @@ class SearchEngine:
         metadata_filter: Optional[MetadataFilter],
         mode: str
     ) -> List[DocumentReference]:
-        """Effectue une recherche via query() avec un mode spécifique."""
-        try:
-            results = kb.query(
-                search_queries=[query],
-                rse_params=mode,
-                return_mode="text",
-                metadata_filter=metadata_filter
-            )
-            
-            return [
-                self._create_document_reference(result, kb, mode)
-                for result in results
-            ]
-            
-        except Exception as e:
-            self.logger.warning(f"Erreur lors de la recherche query dans {kb.kb_id}: {str(e)}")
-            return []
+        """Effectue une recherche via query() avec un mode spécifique.
+        
+        Les erreurs sont propagées à _run_concurrently, qui les journalise et
+        signale la base en échec : des résultats partiels ne sont pas mis en cache.
+        """
+        results = kb.query(
+            search_queries=[query],
+            rse_params=mode,
+            return_mode="text",
+            metadata_filter=metadata_filter
+        )
+        
+        return [
+            self._create_document_reference(result, kb, mode)
+            for result in results
+        ]
 
     def _search_knowledge_base(
         self,
@@ -124,58 +201,372 @@ class SearchEngine:
         query: str,
         metadata_filter: Optional[MetadataFilter]
     ) -> List[DocumentReference]:
-        """Effectue une recherche directe via search()."""
-        try:
-            results = kb.search(
-                query=query,
-                top_k=10,
-                metadata_filter=metadata_filter
+        """Effectue une recherche directe via search().
+        
+        Comme pour _query_knowledge_base, les erreurs sont propagées à _run_concurrently.
+        """
+        results = kb.search(
+            query=query,
+            top_k=10,
+            metadata_filter=metadata_filter
+        )
+        
+        # Résolution des pages en un seul passage pour tous les résultats
+        chunks = [
+            (result.get("metadata", {}).get("doc_id", ""), result.get("metadata", {}).get("chunk_index", 0))
+            for result in results
+        ]
+        page_ranges = self.kb_manager.get_chunk_page_ranges(kb.kb_id, chunks)
+        
+        return [
+            self._create_document_reference(
+                result, kb, "direct_search", False,
+                page_numbers=page_ranges.get(chunk)
             )
+            for result, chunk in zip(results, chunks)
+        ]
+
+    def _prepare_query_embeddings(self, query: str, knowledge_bases: List[KnowledgeBase]) -> Dict[str, List[float]]:
+        """Calcule l'embedding de la requête une seule fois par modèle d'embedding.
+        
+        Le modèle de chaque base est enveloppé dans un SharedQueryEmbedding :
+        les appels internes de kb.query() et kb.search() réutilisent alors le
+        vecteur calculé ici au lieu de rappeler l'API.
+        
+        Returns:
+            Embedding de la requête par clé de modèle (modèles en erreur exclus)
+        """
+        models = {}
+        for kb in knowledge_bases:
+            if not isinstance(kb.embedding_model, SharedQueryEmbedding):
+                kb.embedding_model = SharedQueryEmbedding(
+                    kb.embedding_model,
+                    self.query_embeddings,
+                    embedding_model_key(kb)
+                )
+            models.setdefault(kb.embedding_model.model_key, kb.embedding_model)
+        
+        vectors = {}
+        for model_key, model in models.items():
+            try:
+                vectors[model_key] = model.store.embed(model_key, model.embedding_model, query)
+            except Exception as e:
+                self.logger.warning(f"Erreur lors du calcul de l'embedding de la requête: {str(e)}")
+        self.logger.info(f"Embedding de la requête calculé pour {len(models)} modèle(s)")
+        return vectors
+
+    def _propagate_context(self, knowledge_bases: List[KnowledgeBase]) -> None:
+        """Transmet le contexte de la question aux recherches internes de kb.query().
+        
+        Voir _get_all_ranked_results ; la méthode n'est remplacée qu'une fois par base.
+        """
+        for kb in knowledge_bases:
+            if "get_all_ranked_results" not in vars(kb):
+                kb.get_all_ranked_results = partial(_get_all_ranked_results, kb)
+
+    def _run_concurrently(
+        self,
+        tasks: List[Tuple[str, Callable[[], List[Any]]]],
+        failures: Optional[List[str]] = None
+    ) -> List[Any]:
+        """Exécute les recherches en parallèle sur le pool de workers.
+        
+        Le délai kb_timeout s'applique à chaque tâche, à partir de son
+        démarrage : l'attente dans la file du pool n'est pas décomptée. Une
+        tâche encore en file est abandonnée après kb_timeout par vague de
+        max_workers tâches, pour ne pas attendre indéfiniment un pool occupé par
+        des recherches bloquées. Les tâches abandonnées ne sont pas interrompues :
+        seuls les résultats des bases ayant répondu sont retournés.
+        
+        Args:
+            tasks: Liste de couples (libellé, recherche à exécuter)
+            failures: Liste complétée avec les libellés des tâches abandonnées ou en erreur
             
-            return [
-                self._create_document_reference(result, kb, "direct_search", False)
-                for result in results
-            ]
-            
-        except Exception as e:
-            self.logger.warning(f"Erreur lors de la recherche search dans {kb.kb_id}: {str(e)}")
+        Returns:
+            Résultats des tâches terminées à temps, concaténés
+        """
+        if not tasks:
             return []
+        
+        started: Dict[int, float] = {}
+        
+        def timed(position: int, task: Callable[[], List[Any]]) -> List[Any]:
+            started[position] = time.monotonic()
+            return task()
+        
+        # Chaque tâche s'exécute dans une copie du contexte de l'appelant
+        # (paramètres de recherche et scores de cette question)
+        futures = {
+            self._executor.submit(copy_context().run, timed, position, task): (position, label)
+            for position, (label, task) in enumerate(tasks)
+        }
+        waves = -(-len(tasks) // self.max_workers)
+        queue_deadline = time.monotonic() + self.kb_timeout * waves
+        
+        pending = set(futures)
+        abandoned = set()
+        while pending:
+            now = time.monotonic()
+            deadlines = {}
+            for future in pending:
+                start = started.get(futures[future][0])
+                if start is not None:
+                    deadlines[future] = start + self.kb_timeout
+                else:
+                    # Une tâche démarrée après now aura une échéance au-delà de now + kb_timeout
+                    deadlines[future] = min(queue_deadline, now + self.kb_timeout)
+            expired = {future for future in pending if deadlines[future] <= now and not future.done()}
+            abandoned |= expired
+            pending -= expired
+            if not pending:
+                break
+            wait(pending, timeout=min(deadlines[future] for future in pending) - now, return_when=FIRST_COMPLETED)
+            pending = {future for future in pending if not future.done()}
+        
+        references = []
+        for future, (_, label) in futures.items():
+            if future in abandoned:
+                future.cancel()
+                self.logger.warning(f"Délai dépassé pour {label}, résultats ignorés")
+                if failures is not None:
+                    failures.append(label)
+                continue
+            try:
+                references.extend(future.result())
+            except Exception as e:
+                self.logger.warning(f"Erreur lors de la recherche {label}: {str(e)}")
+                if failures is not None:
+                    failures.append(label)
+        return references
+
+    @staticmethod
+    def _vector_candidates(
+        kb: KnowledgeBase,
+        query_vector: List[float],
+        metadata_filter: Optional[MetadataFilter],
+        top_k: int
+    ) -> List[Tuple[KnowledgeBase, Dict]]:
+        """Retourne les meilleurs candidats vectoriels d'une base, sans reranking."""
+        results = kb.vector_db.search(query_vector, top_k, metadata_filter)
+        return [(kb, result) for result in results]
+
+    def _global_rerank(
+        self,
+        query: str,
+        target_kbs: List[KnowledgeBase],
+        query_vectors: Dict[str, List[float]],
+        metadata_filters: Dict[str, Optional[MetadataFilter]],
+        failures: Optional[List[str]] = None
+    ) -> Dict[str, Dict]:
+        """Reranke en un seul appel les meilleurs candidats de toutes les bases.
+        
+        Les candidats vectoriels des bases sont fusionnés et les rerank_top_k
+        meilleurs soumis au reranker. Les scores obtenus sont ensuite servis
+        aux kb.query() et kb.search() de cette question par GlobalRerankReranker
+        (voir global_rerank_scores). Une base dont les candidats n'ont pu être
+        obtenus, ou dont le reranking a échoué, conserve son reranking habituel.
+        
+        Returns:
+            Scores des candidats retenus, par ID de base
+        """
+        tasks = []
+        task_kbs = {}
+        for kb in target_kbs:
+            if not isinstance(kb.reranker, GlobalRerankReranker):
+                kb.reranker = GlobalRerankReranker(kb.reranker, kb.kb_id)
+            query_vector = query_vectors.get(embedding_model_key(kb))
+            if query_vector is not None:
+                label = f"{kb.kb_id} (candidats)"
+                task_kbs[label] = kb.kb_id
+                tasks.append((
+                    label,
+                    partial(self._vector_candidates, kb, query_vector, metadata_filters[kb.kb_id], self.rerank_top_k)
+                ))
+        candidate_failures = []
+        candidates = self._run_concurrently(tasks, candidate_failures)
+        if failures is not None:
+            failures.extend(candidate_failures)
+        
+        # Meilleurs candidats toutes bases confondues, regroupés par reranker
+        candidates.sort(key=lambda candidate: candidate[1].get("similarity", 0), reverse=True)
+        # Chaque candidat porte l'ID de sa base, conservé par les rerankers
+        groups: Dict[str, List[Tuple[KnowledgeBase, Dict]]] = {}
+        for kb, result in candidates[:self.rerank_top_k]:
+            groups.setdefault(reranker_key(kb.reranker), []).append((kb, {**result, "kb_id": kb.kb_id}))
+        
+        scores: Dict[str, Dict] = {
+            kb_id: {} for label, kb_id in task_kbs.items() if label not in candidate_failures
+        }
+        for group in groups.values():
+            reranker = group[0][0].reranker.reranker
+            try:
+                reranked = reranker.rerank_search_results(query, [result for _, result in group])
+            except Exception as e:
+                self.logger.warning(f"Erreur lors du reranking global: {str(e)}")
+                if failures is not None:
+                    failures.append("reranking global")
+                for kb, _ in group:
+                    scores.pop(kb.kb_id, None)
+                continue
+            for result in reranked:
+                kb_id = result.get("kb_id")
+                if kb_id in scores:
+                    scores[kb_id][chunk_key(result)] = result.get("similarity", 0)
+        
+        self.logger.info(
+            f"Reranking global de {sum(len(group) for group in groups.values())} candidat(s) "
+            f"en {len(groups)} appel(s) pour {len(target_kbs)} base(s)"
+        )
+        return scores
+
+    def _is_sufficient(self, references: List[DocumentReference]) -> bool:
+        """Indique si les résultats d'un mode suffisent à arrêter la cascade."""
+        if len(references) < self.cascade_min_segments:
+            return False
+        return any(ref.relevance_score >= self.cascade_min_score for ref in references)
+
+    def _query_modes(
+        self,
+        target_kbs: List[KnowledgeBase],
+        query: str,
+        metadata_filters: Dict[str, Optional[MetadataFilter]],
+        modes: List[str],
+        failures: Optional[List[str]] = None
+    ) -> List[DocumentReference]:
+        """Interroge toutes les bases en parallèle pour les modes RSE donnés."""
+        return self._run_concurrently([
+            (
+                f"{kb.kb_id} ({mode})",
+                partial(self._query_knowledge_base, kb, query, metadata_filters[kb.kb_id], mode)
+            )
+            for mode in modes
+            for kb in target_kbs
+        ], failures)
+
+    def _search_modes(
+        self,
+        target_kbs: List[KnowledgeBase],
+        query: str,
+        metadata_filters: Dict[str, Optional[MetadataFilter]],
+        failures: Optional[List[str]] = None
+    ) -> List[DocumentReference]:
+        """Essaie les modes RSE selon la stratégie configurée, puis search() sans résultat."""
+        # Essai des différents modes RSE, toutes bases confondues
+        if self.mode_strategy == "cascade":
+            all_references = []
+            for mode in RSE_MODES:
+                self.logger.info(f"Essai du mode {mode} sur {len(target_kbs)} base(s)...")
+                references = self._query_modes(target_kbs, query, metadata_filters, [mode], failures)
+                all_references.extend(references)
+                if self._is_sufficient(references):
+                    self.logger.info(f"Résultats suffisants avec le mode {mode}, arrêt de la cascade")
+                    break
+        else:
+            self.logger.info(f"Essai des modes {', '.join(RSE_MODES)} sur {len(target_kbs)} base(s)...")
+            all_references = self._query_modes(target_kbs, query, metadata_filters, RSE_MODES, failures)
+        
+        # Fallback vers search() si nécessaire
+        if not all_references:
+            self.logger.info("Aucun résultat avec RSE, essai de la recherche directe...")
+            all_references = self._run_concurrently([
+                (
+                    f"{kb.kb_id} (direct_search)",
+                    partial(self._search_knowledge_base, kb, query, metadata_filters[kb.kb_id])
+                )
+                for kb in target_kbs
+            ], failures)
+        return all_references
 
     def search_knowledge_bases(
         self,
         query: str,
         knowledge_bases: List[KnowledgeBase],
         selected_kbs: Optional[List[str]] = None,
-        selected_docs: Optional[List[str]] = None
+        selected_docs: Optional[List[str]] = None,
+        search_params: Optional[Dict[str, int]] = None
     ) -> List[DocumentReference]:
-        """Recherche dans les bases de connaissances avec stratégie de fallback."""
-        all_references = []
-        target_kbs = [kb for kb in knowledge_bases if not selected_kbs or kb.kb_id in selected_kbs]
+        """Recherche dans les bases de connaissances avec stratégie de fallback.
         
-        # Essai des différents modes RSE
-        for mode in ["precision", "balanced", "find_all"]:
-            self.logger.info(f"Essai du mode {mode}...")
-            
-            for kb in target_kbs:
-                if not kb or not hasattr(kb, 'query'):
-                    self.logger.warning("Base de connaissances non valide, ignorée")
-                    continue
-                
-                metadata_filter = self._create_metadata_filter(kb, selected_docs)
-                results = self._query_knowledge_base(kb, query, metadata_filter, mode)
-                all_references.extend(results)
+        Les bases sont interrogées en parallèle : la latence totale est proche
+        de celle de la base la plus lente plutôt que de la somme des bases.
+        Les résultats complets sont mis en cache pour la version courante des
+        bases interrogées.
         
-        # Fallback vers search() si nécessaire
-        if not all_references:
-            self.logger.info("Aucun résultat avec RSE, essai de la recherche directe...")
+        Args:
+            query: Requête de l'utilisateur
+            knowledge_bases: Bases disponibles
+            selected_kbs: Bases à interroger (toutes par défaut)
+            selected_docs: Documents auxquels limiter la recherche
+            search_params: Compromis précision/vitesse des index approchés
+                ({"nprobe": 32} pour "ivf", {"ef_search": 128} pour "hnsw")
+        """
+        search_params = {
+            name: value for name, value in (search_params or {}).items()
+            if name in SEARCH_PARAMS and value is not None
+        }
+        target_kbs = []
+        for kb in knowledge_bases:
+            if not kb or not hasattr(kb, 'query'):
+                self.logger.warning("Base de connaissances non valide, ignorée")
+                continue
+            if not selected_kbs or kb.kb_id in selected_kbs:
+                target_kbs.append(kb)
+        
+        # Versions lues avant la recherche : une modification concurrente rend
+        # l'entrée mise en cache inaccessible
+        kb_versions = {kb.kb_id: self.kb_manager.get_kb_version(kb.kb_id) for kb in target_kbs}
+        cache_key = SearchResultCache.make_key(query, kb_versions, selected_docs, search_params)
+        cached_references = self.result_cache.get(cache_key)
+        if cached_references is not None:
+            self.logger.info(f"Résultats servis depuis le cache ({self.result_cache.stats()})")
+            return cached_references
+        
+        query_vectors = self._prepare_query_embeddings(query, target_kbs)
+        self._propagate_context(target_kbs)
+        
+        # Recherche d'une question similaire pour la même sélection
+        semantic_key = None
+        if self.semantic_cache is not None and query_vectors:
+            model_key = min(query_vectors)
+            semantic_key = (
+                model_key,
+                SearchResultCache.make_scope(kb_versions, selected_docs, search_params),
+                query_vectors[model_key]
+            )
+            cached_references = self.semantic_cache.get(*semantic_key)
+            if cached_references is not None:
+                self.logger.info(f"Résultats servis depuis le cache sémantique ({self.semantic_cache.stats()})")
+                self.result_cache.put(cache_key, cached_references)
+                return cached_references
+        failures = []
+        
+        # Filtres construits une seule fois par question, réutilisés par tous les modes
+        metadata_filters = {
+            kb.kb_id: self._create_metadata_filter(kb, selected_docs)
+            for kb in target_kbs
+        }
+        
+        # Paramètres des index approchés, propres à cette question et propagés aux
+        # threads des recherches par _run_concurrently et _get_all_ranked_results
+        with vector_search_params(search_params):
+            # Un seul reranking pour toutes les bases, avant la construction des segments
+            rerank_scores = {}
+            if self.global_rerank_enabled:
+                rerank_scores = self._global_rerank(query, target_kbs, query_vectors, metadata_filters, failures)
             
-            for kb in target_kbs:
-                if not kb or not hasattr(kb, 'query'):
-                    continue
-                
-                metadata_filter = self._create_metadata_filter(kb, selected_docs)
-                results = self._search_knowledge_base(kb, query, metadata_filter)
-                all_references.extend(results)
-        
-        # Tri final par score
-        return sorted(all_references, key=lambda x: x.relevance_score, reverse=True)
+            # Scores du reranking global servis aux recherches de cette question uniquement
+            with global_rerank_scores(query, rerank_scores):
+                all_references = self._search_modes(target_kbs, query, metadata_filters, failures)
+        
+        # Fusion des segments redondants entre modes et bases, tri final par score
+        merged_references, duplicates = merge_document_references(all_references)
+        self.logger.info(
+            f"{len(merged_references)} segment(s) retenu(s), {duplicates} doublon(s) fusionné(s)"
+        )
+        
+        # Des résultats partiels ne sont pas mis en cache
+        if not failures:
+            self.result_cache.put(cache_key, merged_references)
+            if semantic_key is not None:
+                self.semantic_cache.put(*semantic_key, merged_references)
+        return merged_references
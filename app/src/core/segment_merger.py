@@ -0,0 +1,77 @@
+"""
+Fusion des segments redondants retournés par les différents modes et bases.
+"""
+
+from collections import defaultdict
+from dataclasses import replace
+from typing import Dict, List, Tuple
+
+from src.core.document_reference import DocumentReference
+
+# Recouvrement (intersection / union) à partir duquel deux intervalles sont
+# considérés comme le même segment
+NEAR_IDENTICAL_OVERLAP = 0.8
+
+def _interval(reference: DocumentReference) -> Tuple[int, int]:
+    """Retourne l'intervalle semi-ouvert [début, fin) couvert par une référence.
+
+    Les plages de chunks sont déjà semi-ouvertes ; les plages de pages sont
+    inclusives et sont donc converties.
+    """
+    if reference.chunk_range is not None:
+        return reference.chunk_range
+    page_start, page_end = reference.page_numbers
+    return page_start, page_end + 1
+
+def _covers(kept: Tuple[int, int], other: Tuple[int, int]) -> bool:
+    """Indique si l'intervalle other n'apporte rien à kept : inclus ou quasi identique."""
+    if kept[0] <= other[0] and other[1] <= kept[1]:
+        return True
+    intersection = min(kept[1], other[1]) - max(kept[0], other[0])
+    union = max(kept[1], other[1]) - min(kept[0], other[0])
+    return intersection > 0 and intersection >= NEAR_IDENTICAL_OVERLAP * union
+
+def merge_document_references(
+    references: List[DocumentReference]
+) -> Tuple[List[DocumentReference], int]:
+    """Fusionne les références redondantes au sein d'un même document.
+
+    Les références d'un document sont examinées par score décroissant. Une
+    référence incluse dans une référence retenue, ou quasi identique (voir
+    NEAR_IDENTICAL_OVERLAP), est retirée. Une référence qui contient des
+    références retenues les remplace et prend le meilleur de leurs scores.
+    Des segments qui se chevauchent seulement en partie sont tous conservés :
+    aucune partie du document trouvée par la recherche n'est perdue.
+
+    Args:
+        references: Références issues de la recherche
+
+    Returns:
+        Couple (références fusionnées triées par score, nombre de doublons retirés)
+    """
+    groups: Dict[Tuple[str, str, bool], List[DocumentReference]] = defaultdict(list)
+    for reference in references:
+        # Les plages de chunks et de pages ne sont pas comparables entre elles
+        key = (reference.kb_id, reference.doc_id, reference.chunk_range is not None)
+        groups[key].append(reference)
+
+    merged = []
+    for group in groups.values():
+        group.sort(key=lambda x: x.relevance_score, reverse=True)
+        kept: List[DocumentReference] = []
+        for reference in group:
+            interval = _interval(reference)
+            if any(_covers(_interval(other), interval) for other in kept):
+                continue
+            absorbed = [other for other in kept if _covers(interval, _interval(other))]
+            if absorbed:
+                kept = [other for other in kept if not _covers(interval, _interval(other))]
+                reference = replace(
+                    reference,
+                    relevance_score=max(other.relevance_score for other in absorbed)
+                )
+            kept.append(reference)
+        merged.extend(kept)
+
+    merged.sort(key=lambda x: x.relevance_score, reverse=True)
+    return merged, len(references) - len(merged)
@@ -0,0 +1,117 @@
+"""
+Cache sémantique des résultats de recherche.
+
+Les reformulations d'une même question ("délai de garantie", "durée de la
+garantie") produisent des embeddings très proches. Ce cache conserve les
+embeddings des requêtes récentes dans une matrice compacte et sert les
+résultats d'une requête précédente lorsque la similarité cosinus dépasse un
+seuil, pour une même sélection de bases et de documents.
+"""
+
+import threading
+from typing import Dict, Hashable, List, Optional
+
+import numpy as np
+
+from src.core.document_reference import DocumentReference
+
+class _ModelBucket:
+    """Tampon circulaire des requêtes d'un modèle d'embedding."""
+
+    def __init__(self, capacity: int, dimension: int):
+        self.vectors = np.zeros((capacity, dimension), dtype=np.float32)
+        self.scopes: List[Optional[Hashable]] = [None] * capacity
+        self.results: List[tuple] = [()] * capacity
+        self.size = 0
+        self.next_slot = 0
+
+class SemanticQueryCache:
+    """Cache des résultats indexé par similarité des embeddings de requête."""
+
+    def __init__(self, threshold: float = 0.95, max_entries: int = 256):
+        """Initialise le cache.
+
+        Args:
+            threshold: Similarité cosinus minimale pour réutiliser un résultat
+            max_entries: Nombre de requêtes conservées par modèle d'embedding
+        """
+        self.threshold = threshold
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._buckets: Dict[str, _ModelBucket] = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _normalize(vector) -> Optional[np.ndarray]:
+        """Retourne le vecteur normalisé en float32, ou None s'il est nul."""
+        array = np.asarray(vector, dtype=np.float32)
+        norm = np.linalg.norm(array)
+        if norm == 0:
+            return None
+        return array / norm
+
+    def get(
+        self,
+        model_key: str,
+        scope: Hashable,
+        vector
+    ) -> Optional[List[DocumentReference]]:
+        """Retourne les résultats d'une requête similaire, ou None.
+
+        Args:
+            model_key: Modèle d'embedding ayant produit le vecteur
+            scope: Sélection de bases (avec leurs versions) et de documents
+            vector: Embedding de la requête
+        """
+        query = self._normalize(vector)
+        with self._lock:
+            bucket = self._buckets.get(model_key)
+            if query is None or bucket is None or bucket.vectors.shape[1] != query.shape[0]:
+                self.misses += 1
+                return None
+
+            similarities = bucket.vectors[:bucket.size] @ query
+            for slot in np.argsort(-similarities):
+                if similarities[slot] < self.threshold:
+                    break
+                if bucket.scopes[slot] == scope:
+                    self.hits += 1
+                    return list(bucket.results[slot])
+            self.misses += 1
+            return None
+
+    def put(
+        self,
+        model_key: str,
+        scope: Hashable,
+        vector,
+        references: List[DocumentReference]
+    ) -> None:
+        """Enregistre les résultats d'une requête, en écrasant la plus ancienne."""
+        query = self._normalize(vector)
+        if query is None:
+            return
+        with self._lock:
+            bucket = self._buckets.get(model_key)
+            if bucket is None or bucket.vectors.shape[1] != query.shape[0]:
+                bucket = _ModelBucket(self.max_entries, query.shape[0])
+                self._buckets[model_key] = bucket
+
+            slot = bucket.next_slot
+            bucket.vectors[slot] = query
+            bucket.scopes[slot] = scope
+            bucket.results[slot] = tuple(references)
+            bucket.next_slot = (slot + 1) % self.max_entries
+            bucket.size = min(bucket.size + 1, self.max_entries)
+
+    def clear(self) -> None:
+        """Vide le cache."""
+        with self._lock:
+            self._buckets.clear()
+
+    def stats(self) -> Dict[str, int]:
+        """Retourne les compteurs du cache."""
+        with self._lock:
+            entries = sum(bucket.size for bucket in self._buckets.values())
+            return {"hits": self.hits, "misses": self.misses, "entries": entries}
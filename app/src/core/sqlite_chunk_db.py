@@ -0,0 +1,367 @@
+"""
+Stockage des chunks dans SQLite.
+
+BasicChunkDB conserve les chunks d'une base dans un pickle réécrit en entier à
+chaque ajout ou suppression de document, et chargé en entier en mémoire par
+chaque processus. Ce stockage place les chunks de toutes les bases d'un
+répertoire dans une base SQLite (WAL) indexée sur (kb_id, doc_id,
+chunk_index) : ajouts et suppressions ne touchent que les lignes concernées,
+et seuls les chunks lus par une recherche sont chargés.
+
+La construction des segments RSE lit les chunks un par un et dans l'ordre :
+chaque lecture absente du cache charge en une requête une fenêtre de chunks
+consécutifs du même document. Chaque ajout ou suppression incrémente une
+génération propre à la base ; le cache est vidé dès qu'elle change, y compris
+quand la modification vient d'une autre instance ou d'un autre processus.
+"""
+
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from contextlib import closing, contextmanager
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+from dsrag.database.chunk.db import ChunkDB
+
+# Colonnes d'un chunk, dans l'ordre de la table
+_CHUNK_COLUMNS = (
+    "document_title",
+    "document_summary",
+    "section_title",
+    "section_summary",
+    "chunk_text",
+    "chunk_page_start",
+    "chunk_page_end",
+    "is_visual",
+)
+
+class SQLiteChunkDB(ChunkDB):
+    """Stockage des chunks d'une base dans la base SQLite partagée du répertoire."""
+
+    def __init__(
+        self,
+        kb_id: str,
+        storage_directory: str = "~/dsRAG",
+        prefetch_size: int = 32,
+        cache_size: int = 4096
+    ):
+        """Ouvre le stockage d'une base.
+
+        Args:
+            kb_id: ID de la base de connaissances
+            storage_directory: Répertoire de stockage des bases
+            prefetch_size: Nombre de chunks consécutifs chargés par lecture
+            cache_size: Nombre de chunks conservés en mémoire
+        """
+        self.kb_id = kb_id
+        self.storage_directory = storage_directory
+        self.prefetch_size = prefetch_size
+        self.cache_size = cache_size
+        directory = os.path.join(os.path.expanduser(storage_directory), "chunk_storage")
+        os.makedirs(directory, exist_ok=True)
+        self.db_path = os.path.join(directory, "chunks.sqlite3")
+        self._cache: "OrderedDict[Tuple[str, int], Optional[Dict[str, Any]]]" = OrderedDict()
+        # Génération de la base à laquelle correspond le contenu du cache (None : cache invalidé)
+        self._cache_generation: Optional[int] = None
+        self._lock = threading.Lock()
+        # Connexion de lecture de la génération, une par thread
+        self._local = threading.local()
+        with self._connect() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS chunks (
+                    kb_id TEXT NOT NULL,
+                    doc_id TEXT NOT NULL,
+                    chunk_index INTEGER NOT NULL,
+                    supp_id TEXT NOT NULL DEFAULT '',
+                    document_title TEXT,
+                    document_summary TEXT,
+                    section_title TEXT,
+                    section_summary TEXT,
+                    chunk_text TEXT,
+                    chunk_page_start INTEGER,
+                    chunk_page_end INTEGER,
+                    is_visual INTEGER,
+                    created_on REAL,
+                    metadata TEXT,
+                    PRIMARY KEY (kb_id, doc_id, chunk_index)
+                ) WITHOUT ROWID
+                """
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_chunks_supp_id ON chunks (kb_id, supp_id)")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS chunk_generations (kb_id TEXT PRIMARY KEY, generation INTEGER NOT NULL)"
+            )
+
+    @contextmanager
+    def _connect(self) -> Iterator[sqlite3.Connection]:
+        """Ouvre une connexion dédiée et valide la transaction en sortie."""
+        with closing(sqlite3.connect(self.db_path, timeout=30)) as conn:
+            conn.row_factory = sqlite3.Row
+            with conn:
+                yield conn
+
+    def _bump_generation(self, conn: sqlite3.Connection) -> None:
+        """Incrémente la génération de la base, dans la transaction de la modification."""
+        conn.execute(
+            """
+            INSERT INTO chunk_generations (kb_id, generation) VALUES (?, 1)
+            ON CONFLICT (kb_id) DO UPDATE SET generation = generation + 1
+            """,
+            (self.kb_id,)
+        )
+
+    @staticmethod
+    def _read_generation(conn: sqlite3.Connection, kb_id: str) -> int:
+        row = conn.execute("SELECT generation FROM chunk_generations WHERE kb_id = ?", (kb_id,)).fetchone()
+        return row[0] if row else 0
+
+    def _current_generation(self) -> int:
+        """Lit la génération courante de la base sur la connexion du thread (lecture de quelques µs)."""
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            # Sans transaction ouverte, chaque lecture voit les dernières modifications validées
+            conn = self._local.conn = sqlite3.connect(self.db_path, timeout=30, isolation_level=None)
+        return self._read_generation(conn, self.kb_id)
+
+    def _invalidate(self) -> None:
+        """Vide le cache ; une fenêtre lue avant l'invalidation n'y sera pas écrite."""
+        with self._lock:
+            self._cache.clear()
+            self._cache_generation = None
+
+    def add_document(
+        self,
+        doc_id: str,
+        chunks: Dict[int, Dict[str, Any]],
+        supp_id: str = "",
+        metadata: Optional[Dict[str, Any]] = None
+    ) -> None:
+        created_on = time.time()
+        encoded_metadata = json.dumps(metadata or {})
+        with self._connect() as conn:
+            conn.executemany(
+                f"""
+                INSERT OR REPLACE INTO chunks
+                    (kb_id, doc_id, chunk_index, supp_id, {", ".join(_CHUNK_COLUMNS)}, created_on, metadata)
+                VALUES ({", ".join("?" * (len(_CHUNK_COLUMNS) + 6))})
+                """,
+                [
+                    (
+                        self.kb_id, doc_id, int(chunk_index), supp_id or "",
+                        *(chunk.get(column) for column in _CHUNK_COLUMNS),
+                        created_on, encoded_metadata
+                    )
+                    for chunk_index, chunk in chunks.items()
+                ]
+            )
+            self._bump_generation(conn)
+        self._invalidate()
+
+    def remove_document(self, doc_id: str) -> None:
+        with self._connect() as conn:
+            conn.execute("DELETE FROM chunks WHERE kb_id = ? AND doc_id = ?", (self.kb_id, doc_id))
+            self._bump_generation(conn)
+        self._invalidate()
+
+    def _read_chunks(
+        self,
+        conn: sqlite3.Connection,
+        doc_id: str,
+        chunk_start: int,
+        chunk_end: int
+    ) -> Dict[int, Dict[str, Any]]:
+        rows = conn.execute(
+            """
+            SELECT * FROM chunks
+            WHERE kb_id = ? AND doc_id = ? AND chunk_index >= ? AND chunk_index < ?
+            ORDER BY chunk_index
+            """,
+            (self.kb_id, doc_id, chunk_start, chunk_end)
+        ).fetchall()
+        return {row["chunk_index"]: dict(row) for row in rows}
+
+    def get_chunks(self, doc_id: str, chunk_start: int, chunk_end: int) -> Dict[int, Dict[str, Any]]:
+        """Lit en une requête les chunks [chunk_start, chunk_end) d'un document."""
+        with self._connect() as conn:
+            return self._read_chunks(conn, doc_id, chunk_start, chunk_end)
+
+    def _get_chunk(self, doc_id: str, chunk_index: int) -> Optional[Dict[str, Any]]:
+        """Retourne un chunk, en chargeant au besoin une fenêtre de chunks suivants."""
+        key = (doc_id, int(chunk_index))
+        generation = self._current_generation()
+        with self._lock:
+            if generation != self._cache_generation:
+                # Base modifiée depuis le remplissage du cache, éventuellement par un autre processus
+                self._cache.clear()
+                self._cache_generation = generation
+            elif key in self._cache:
+                self._cache.move_to_end(key)
+                return self._cache[key]
+
+        # Fenêtre et génération lues dans la même transaction
+        with self._connect() as conn:
+            conn.execute("BEGIN")
+            window_generation = self._read_generation(conn, self.kb_id)
+            window = self._read_chunks(conn, doc_id, key[1], key[1] + self.prefetch_size)
+        with self._lock:
+            # Fenêtre lue avant une modification ou une invalidation : non conservée
+            if window_generation != self._cache_generation:
+                return window.get(key[1])
+            for index in range(key[1], key[1] + self.prefetch_size):
+                self._cache[(doc_id, index)] = window.get(index)
+                self._cache.move_to_end((doc_id, index))
+            while len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+        return window.get(key[1])
+
+    def _get_field(self, doc_id: str, chunk_index: int, field: str) -> Any:
+        chunk = self._get_chunk(doc_id, chunk_index)
+        return chunk.get(field) if chunk else None
+
+    def get_chunk_text(self, doc_id: str, chunk_index: int) -> Optional[str]:
+        return self._get_field(doc_id, chunk_index, "chunk_text")
+
+    def get_is_visual(self, doc_id: str, chunk_index: int) -> Optional[bool]:
+        is_visual = self._get_field(doc_id, chunk_index, "is_visual")
+        return bool(is_visual) if is_visual is not None else None
+
+    def get_chunk_page_numbers(self, doc_id: str, chunk_index: int) -> Tuple[Optional[int], Optional[int]]:
+        chunk = self._get_chunk(doc_id, chunk_index)
+        if not chunk:
+            return None, None
+        return chunk.get("chunk_page_start"), chunk.get("chunk_page_end")
+
+    def get_document_title(self, doc_id: str, chunk_index: int) -> Optional[str]:
+        return self._get_field(doc_id, chunk_index, "document_title")
+
+    def get_document_summary(self, doc_id: str, chunk_index: int) -> Optional[str]:
+        return self._get_field(doc_id, chunk_index, "document_summary")
+
+    def get_section_title(self, doc_id: str, chunk_index: int) -> Optional[str]:
+        return self._get_field(doc_id, chunk_index, "section_title")
+
+    def get_section_summary(self, doc_id: str, chunk_index: int) -> Optional[str]:
+        return self._get_field(doc_id, chunk_index, "section_summary")
+
+    def get_document(self, doc_id: str, include_content: bool = False) -> Optional[Dict[str, Any]]:
+        columns = "chunk_index, document_title, document_summary, supp_id, created_on, metadata"
+        if include_content:
+            columns += ", chunk_text"
+        with self._connect() as conn:
+            rows = conn.execute(
+                f"SELECT {columns} FROM chunks WHERE kb_id = ? AND doc_id = ? ORDER BY chunk_index",
+                (self.kb_id, doc_id)
+            ).fetchall()
+        if not rows:
+            return None
+        first = rows[0]
+        return {
+            "id": doc_id,
+            "title": first["document_title"],
+            "content": "\n".join(row["chunk_text"] or "" for row in rows) if include_content else None,
+            "summary": first["document_summary"],
+            "created_on": first["created_on"],
+            "supp_id": first["supp_id"],
+            "metadata": json.loads(first["metadata"] or "{}"),
+            "chunk_count": len(rows),
+        }
+
+    def get_all_doc_ids(self, supp_id: Optional[str] = None) -> List[str]:
+        query = "SELECT DISTINCT doc_id FROM chunks WHERE kb_id = ?"
+        params: List[Any] = [self.kb_id]
+        if supp_id:
+            query += " AND supp_id = ?"
+            params.append(supp_id)
+        with self._connect() as conn:
+            return [row["doc_id"] for row in conn.execute(query, params).fetchall()]
+
+    def get_document_count(self) -> int:
+        with self._connect() as conn:
+            return conn.execute(
+                "SELECT COUNT(DISTINCT doc_id) FROM chunks WHERE kb_id = ?", (self.kb_id,)
+            ).fetchone()[0]
+
+    def get_total_num_characters(self) -> int:
+        with self._connect() as conn:
+            return conn.execute(
+                "SELECT COALESCE(SUM(LENGTH(chunk_text)), 0) FROM chunks WHERE kb_id = ?", (self.kb_id,)
+            ).fetchone()[0]
+
+    def count_chunks(self, doc_id: Optional[str] = None) -> int:
+        """Compte les chunks d'un document, ou de toute la base si doc_id est None."""
+        query = "SELECT COUNT(*) FROM chunks WHERE kb_id = ?"
+        params: List[Any] = [self.kb_id]
+        if doc_id is not None:
+            query += " AND doc_id = ?"
+            params.append(doc_id)
+        with self._connect() as conn:
+            return conn.execute(query, params).fetchone()[0]
+
+    def get_page_ranges(self, doc_id: str) -> Dict[int, Tuple[Optional[int], Optional[int]]]:
+        """Retourne en une requête la plage de pages de chaque chunk d'un document."""
+        with self._connect() as conn:
+            rows = conn.execute(
+                "SELECT chunk_index, chunk_page_start, chunk_page_end FROM chunks WHERE kb_id = ? AND doc_id = ?",
+                (self.kb_id, doc_id)
+            ).fetchall()
+        return {row["chunk_index"]: (row["chunk_page_start"], row["chunk_page_end"]) for row in rows}
+
+    def list_documents(self) -> List[Dict[str, Any]]:
+        """Retourne en une requête les métadonnées de tous les documents, triées par doc_id."""
+        with self._connect() as conn:
+            rows = conn.execute(
+                """
+                SELECT doc_id,
+                       MIN(chunk_index) AS first_chunk,
+                       COUNT(*) AS chunk_count,
+                       MIN(chunk_page_start) AS page_start,
+                       MAX(chunk_page_end) AS page_end,
+                       MIN(created_on) AS created_on
+                FROM chunks WHERE kb_id = ?
+                GROUP BY doc_id
+                ORDER BY doc_id
+                """,
+                (self.kb_id,)
+            ).fetchall()
+            titles = dict(conn.execute(
+                """
+                SELECT c.doc_id, c.document_title FROM chunks c
+                JOIN (
+                    SELECT doc_id, MIN(chunk_index) AS first_chunk FROM chunks WHERE kb_id = ? GROUP BY doc_id
+                ) f ON c.doc_id = f.doc_id AND c.chunk_index = f.first_chunk
+                WHERE c.kb_id = ?
+                """,
+                (self.kb_id, self.kb_id)
+            ).fetchall())
+        return [
+            {
+                'doc_id': row["doc_id"],
+                'title': titles.get(row["doc_id"]) or row["doc_id"],
+                'page_count': (
+                    row["page_end"] - row["page_start"] + 1
+                    if row["page_start"] is not None and row["page_end"] is not None else None
+                ),
+                'chunk_count': row["chunk_count"],
+                'created_on': row["created_on"],
+            }
+            for row in rows
+        ]
+
+    def delete(self) -> None:
+        """Supprime tous les chunks de la base."""
+        with self._connect() as conn:
+            conn.execute("DELETE FROM chunks WHERE kb_id = ?", (self.kb_id,))
+            self._bump_generation(conn)
+        self._invalidate()
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            **super().to_dict(),
+            "kb_id": self.kb_id,
+            "storage_directory": self.storage_directory,
+        }
@@ -0,0 +1,70 @@
+"""
+Mesure du rappel et de la latence d'une recherche vectorielle approchée.
+
+Les stockages qui acceptent search(..., exact=True) peuvent être comparés à
+leur propre recherche exacte : pour chaque requête, le rappel est la part des
+top_k résultats exacts retrouvés par la recherche approchée. Les requêtes sont
+des embeddings de questions réelles ou, à défaut, des vecteurs tirés de la
+base.
+"""
+
+import time
+from typing import Any, Dict, Sequence, Tuple
+
+import numpy as np
+from dsrag.database.vector.db import VectorDB
+
+def _result_key(result: Dict[str, Any]) -> Tuple[str, Any]:
+    metadata = result.get("metadata", {})
+    return result.get("doc_id", ""), metadata.get("chunk_index")
+
+def _timed_search(vector_db: VectorDB, query_vector: Sequence[float], top_k: int, **search_kwargs):
+    start = time.perf_counter()
+    results = vector_db.search(query_vector, top_k, **search_kwargs)
+    return results, (time.perf_counter() - start) * 1000
+
+def evaluate_vector_search(
+    vector_db: VectorDB,
+    query_vectors: Sequence[Sequence[float]],
+    top_k: int = 10,
+    **search_kwargs
+) -> Dict[str, Any]:
+    """Compare la recherche d'un stockage à sa recherche exacte.
+
+    Args:
+        vector_db: Stockage vectoriel dont search() accepte exact=True
+        query_vectors: Vecteurs des requêtes
+        top_k: Nombre de résultats comparés par requête
+        **search_kwargs: Paramètres transmis à la recherche évaluée
+
+    Returns:
+        Dict: rappel moyen et minimal, latences moyennes et p95 (ms) des deux
+        recherches, nombre de requêtes, et tailles mémoire si le stockage les
+        expose
+    """
+    recalls = []
+    exact_latencies = []
+    approximate_latencies = []
+    for query_vector in query_vectors:
+        expected, exact_ms = _timed_search(vector_db, query_vector, top_k, exact=True)
+        found, approximate_ms = _timed_search(vector_db, query_vector, top_k, **search_kwargs)
+        exact_latencies.append(exact_ms)
+        approximate_latencies.append(approximate_ms)
+        expected_keys = {_result_key(result) for result in expected}
+        if expected_keys:
+            found_keys = {_result_key(result) for result in found}
+            recalls.append(len(expected_keys & found_keys) / len(expected_keys))
+
+    report: Dict[str, Any] = {
+        "queries": len(recalls),
+        "top_k": top_k,
+        "recall": float(np.mean(recalls)) if recalls else None,
+        "min_recall": float(np.min(recalls)) if recalls else None,
+        "exact_latency_ms": float(np.mean(exact_latencies)) if exact_latencies else None,
+        "exact_p95_ms": float(np.percentile(exact_latencies, 95)) if exact_latencies else None,
+        "latency_ms": float(np.mean(approximate_latencies)) if approximate_latencies else None,
+        "p95_ms": float(np.percentile(approximate_latencies, 95)) if approximate_latencies else None,
+    }
+    if hasattr(vector_db, "memory_stats"):
+        report.update(vector_db.memory_stats())
+    return report
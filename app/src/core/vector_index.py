@@ -0,0 +1,275 @@
+"""
+Index FAISS approchés du stockage projeté en mémoire.
+
+Une base MemmapVectorDB score par défaut tous ses vecteurs (index "flat"). Un
+index "ivf" ou "hnsw" ne propose qu'un sous-ensemble de candidats, rescorés
+exactement à partir des vecteurs d'origine (voir MemmapVectorDB). L'index est
+construit une fois la base assez grande (min_rows), puis complété à chaque
+ajout ; les lignes supprimées y restent jusqu'au compactage et sont exclues
+des recherches par un sélecteur.
+
+Spécification d'un index, en chaîne ou en dictionnaire :
+- "flat"
+- "ivf:nlist=1024,nprobe=16" (nlist=0 : 4·√n listes, choisi à l'apprentissage)
+- "hnsw:m=32,ef_search=64,ef_construction=80"
+
+nprobe et ef_search peuvent être modifiés à chaque requête : par paramètres
+de search(), ou pour les recherches internes de dsrag par le contexte
+vector_search_params() du module.
+
+faiss (paquet faiss-cpu) n'est nécessaire que pour les index "ivf" et
+"hnsw".
+"""
+
+import os
+import threading
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Dict, Iterator, Optional, Tuple, Union
+
+import numpy as np
+
+try:
+    import faiss
+except ImportError:
+    faiss = None
+
+INDEX_TYPES = ("flat", "ivf", "hnsw")
+
+_INDEX_DEFAULTS: Dict[str, Dict[str, int]] = {
+    "flat": {},
+    "ivf": {"nlist": 0, "nprobe": 16, "min_rows": 50000},
+    "hnsw": {"m": 32, "ef_search": 64, "ef_construction": 80, "min_rows": 10000},
+}
+
+# Paramètres modifiables à chaque requête
+SEARCH_PARAMS = ("nprobe", "ef_search")
+
+# Nombre de lignes ajoutées entre deux enregistrements de l'index
+_SAVE_EVERY_ROWS = 10000
+# Vecteurs d'apprentissage par liste d'un index "ivf"
+_TRAIN_ROWS_PER_LIST = 64
+
+def parse_index_spec(spec: Union[str, Dict[str, Any], None]) -> Dict[str, Any]:
+    """Normalise une spécification d'index, complétée des valeurs par défaut.
+
+    Args:
+        spec: "flat", "ivf:nlist=1024,nprobe=16", {"type": "hnsw", "m": 32}... (None : "flat")
+
+    Returns:
+        Dict: type de l'index et tous ses paramètres
+    """
+    if spec is None:
+        spec = "flat"
+    if isinstance(spec, str):
+        index_type, _, raw_params = spec.partition(":")
+        params: Dict[str, Any] = {"type": index_type.strip()}
+        for item in filter(None, (part.strip() for part in raw_params.split(","))):
+            name, separator, value = item.partition("=")
+            if not separator:
+                raise ValueError(f"Paramètre d'index invalide: {item}")
+            params[name.strip()] = int(value)
+    else:
+        params = dict(spec)
+        params.setdefault("type", "flat")
+
+    index_type = params.pop("type")
+    if index_type not in INDEX_TYPES:
+        raise ValueError(f"Type d'index non supporté: {index_type}")
+    unknown = set(params) - set(_INDEX_DEFAULTS[index_type])
+    if unknown:
+        raise ValueError(f"Paramètres non supportés pour l'index {index_type}: {', '.join(sorted(unknown))}")
+    return {"type": index_type, **_INDEX_DEFAULTS[index_type], **params}
+
+def format_index_spec(spec: Dict[str, Any]) -> str:
+    """Forme textuelle d'une spécification normalisée (inverse de parse_index_spec)."""
+    params = ",".join(f"{name}={value}" for name, value in spec.items() if name != "type")
+    return f"{spec['type']}:{params}" if params else spec["type"]
+
+class FaissIndex:
+    """Index FAISS dont les identifiants sont les numéros de ligne du stockage.
+
+    Les lignes sont ajoutées dans l'ordre à partir de 0 : les identifiants
+    séquentiels de FAISS sont donc les numéros de ligne, et l'index couvre les
+    lignes [0, ntotal).
+
+    Un index publié n'est jamais modifié : construction et ajouts se font sur
+    une copie, qui remplace l'index publié une fois complète. Les recherches
+    n'attendent donc jamais un ajout.
+    """
+
+    def __init__(
+        self,
+        path: str,
+        spec: Dict[str, Any],
+        quantization: str = "none",
+        pq_subvector_dims: int = 4
+    ):
+        """Prépare l'index (chargé au premier accès s'il a déjà été construit).
+
+        Args:
+            path: Fichier de l'index (un par époque de compactage du stockage)
+            spec: Spécification normalisée (voir parse_index_spec)
+            quantization: Encodage des vecteurs dans l'index ("none", "int8" ou "pq")
+            pq_subvector_dims: Dimensions par sous-vecteur de l'encodage "pq"
+        """
+        if faiss is None:
+            raise ImportError(f"Le paquet faiss-cpu est nécessaire pour l'index {spec['type']}")
+        self.spec = spec
+        self.quantization = quantization
+        self.pq_subvector_dims = pq_subvector_dims
+        self.path = path
+        self._index = None
+        self._loaded_mtime: Optional[float] = None
+        self._saved_rows = 0
+        # Protège uniquement la publication d'un index (échange de références)
+        self._lock = threading.Lock()
+
+    @property
+    def ntotal(self) -> int:
+        index = self._index
+        return index.ntotal if index is not None else 0
+
+    def refresh(self) -> bool:
+        """Recharge l'index si son fichier a été modifié par un autre processus.
+
+        Returns:
+            True si un index est disponible
+        """
+        try:
+            mtime = os.stat(self.path).st_mtime
+        except FileNotFoundError:
+            # Supprimé par un compactage : les numéros de ligne ont changé
+            with self._lock:
+                if self._loaded_mtime is not None:
+                    self._index, self._loaded_mtime, self._saved_rows = None, None, 0
+                return self._index is not None
+        if mtime != self._loaded_mtime:
+            # Lecture hors verrou ; l'index chargé n'est publié que s'il est toujours plus récent
+            try:
+                index = faiss.read_index(self.path)
+            except RuntimeError:
+                # Remplacé pendant la lecture : l'index publié reste utilisable
+                return self._index is not None
+            with self._lock:
+                if mtime != self._loaded_mtime and index.ntotal >= self.ntotal:
+                    self._index, self._loaded_mtime, self._saved_rows = index, mtime, index.ntotal
+        return self._index is not None
+
+    def reset(self) -> None:
+        """Oublie l'index et supprime son fichier."""
+        with self._lock:
+            self._index, self._loaded_mtime, self._saved_rows = None, None, 0
+        if os.path.exists(self.path):
+            os.remove(self.path)
+
+    def _factory_string(self, row_count: int, dimension: int) -> str:
+        if self.quantization == "int8":
+            storage = "SQ8"
+        elif self.quantization == "pq":
+            if dimension % self.pq_subvector_dims:
+                raise ValueError(f"Dimension {dimension} non divisible par pq_subvector_dims={self.pq_subvector_dims}")
+            storage = f"PQ{dimension // self.pq_subvector_dims}"
+        else:
+            storage = "Flat"
+        if self.spec["type"] == "ivf":
+            nlist = self.spec["nlist"] or int(4 * np.sqrt(row_count))
+            # Au moins 39 vecteurs d'apprentissage par liste
+            nlist = max(1, min(nlist, row_count // 39))
+            return f"IVF{nlist},{storage}"
+        return f"HNSW{self.spec['m']},{storage}"
+
+    def build(self, vectors: np.ndarray, block_rows: int) -> None:
+        """Construit l'index sur toutes les lignes du fichier de vecteurs, puis le publie."""
+        row_count, dimension = vectors.shape
+        index = faiss.index_factory(dimension, self._factory_string(row_count, dimension), faiss.METRIC_INNER_PRODUCT)
+        if self.spec["type"] == "hnsw":
+            faiss.downcast_index(index).hnsw.efConstruction = self.spec["ef_construction"]
+        if not index.is_trained:
+            nlist = getattr(faiss.try_extract_index_ivf(index), "nlist", 0) if self.spec["type"] == "ivf" else 0
+            train_rows = min(row_count, max(nlist * _TRAIN_ROWS_PER_LIST, 10000))
+            rng = np.random.default_rng(0)
+            sample = np.sort(rng.choice(row_count, train_rows, replace=False))
+            index.train(np.ascontiguousarray(vectors[sample], dtype=np.float32))
+        self._add_and_publish(index, vectors, block_rows, force_save=True)
+
+    def extend(self, vectors: np.ndarray, block_rows: int, force_save: bool = False) -> None:
+        """Ajoute à une copie de l'index les lignes qu'il ne couvre pas encore, puis la publie."""
+        if self._index.ntotal >= vectors.shape[0] and not force_save:
+            return
+        self._add_and_publish(faiss.clone_index(self._index), vectors, block_rows, force_save)
+
+    def _add_and_publish(self, index: Any, vectors: np.ndarray, block_rows: int, force_save: bool) -> None:
+        """Complète un index non publié, l'enregistre si nécessaire et le publie."""
+        for start in range(index.ntotal, vectors.shape[0], block_rows):
+            index.add(np.ascontiguousarray(vectors[start:start + block_rows], dtype=np.float32))
+        mtime, saved_rows = self._loaded_mtime, self._saved_rows
+        if force_save or index.ntotal - saved_rows >= _SAVE_EVERY_ROWS:
+            temporary_path = f"{self.path}.tmp"
+            faiss.write_index(index, temporary_path)
+            os.replace(temporary_path, self.path)
+            mtime, saved_rows = os.stat(self.path).st_mtime, index.ntotal
+        with self._lock:
+            self._index, self._loaded_mtime, self._saved_rows = index, mtime, saved_rows
+
+    def search(
+        self,
+        query: np.ndarray,
+        k: int,
+        selected_rows: Optional[np.ndarray] = None,
+        nprobe: Optional[int] = None,
+        ef_search: Optional[int] = None
+    ) -> Tuple[np.ndarray, int]:
+        """Retourne les numéros de ligne des k meilleurs candidats.
+
+        Args:
+            query: Vecteur normalisé de la requête
+            k: Nombre de candidats
+            selected_rows: Seules lignes autorisées (None : toutes les lignes de l'index)
+            nprobe: Listes parcourues (index "ivf")
+            ef_search: Taille de la liste de recherche (index "hnsw")
+
+        Returns:
+            Candidats et nombre de lignes couvertes par l'index parcouru
+        """
+        # Index publié, jamais modifié : aucune attente d'un ajout en cours
+        index = self._index
+        selector = None
+        if selected_rows is not None:
+            mask = np.zeros(index.ntotal, dtype=bool)
+            mask[selected_rows[selected_rows < index.ntotal]] = True
+            bitmap = np.packbits(mask, bitorder="little")
+            selector = faiss.IDSelectorBitmap(index.ntotal, faiss.swig_ptr(bitmap))
+
+        if self.spec["type"] == "ivf":
+            params = faiss.SearchParametersIVF(nprobe=nprobe or self.spec["nprobe"])
+        else:
+            params = faiss.SearchParametersHNSW(efSearch=ef_search or self.spec["ef_search"])
+        if selector is not None:
+            params.sel = selector
+
+        _, labels = index.search(query[None, :].astype(np.float32), k, params=params)
+        labels = labels[0]
+        return labels[labels >= 0].astype(np.int64), index.ntotal
+
+# Paramètres de la recherche en cours ; un contexte par appel, propagé aux threads du moteur de recherche
+_current_search_params: ContextVar[Dict[str, int]] = ContextVar("vector_search_params", default={})
+
+@contextmanager
+def vector_search_params(params: Dict[str, int]) -> Iterator[None]:
+    """Applique des paramètres de recherche aux recherches du contexte courant.
+
+    Les recherches internes de kb.query() et kb.search() n'exposent pas de
+    paramètres : le moteur de recherche les fixe ici pour une question, et les
+    stockages les lisent avec current_vector_search_params(). Deux questions
+    simultanées ont chacune leur contexte.
+    """
+    token = _current_search_params.set(dict(params))
+    try:
+        yield
+    finally:
+        _current_search_params.reset(token)
+
+def current_vector_search_params() -> Dict[str, int]:
+    """Retourne les paramètres de recherche du contexte courant ({} par défaut)."""
+    return _current_search_params.get()
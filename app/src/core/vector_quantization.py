@@ -0,0 +1,144 @@
+"""
+Quantification des vecteurs du stockage projeté en mémoire.
+
+Les recherches parcourent les codes compacts au lieu des vecteurs float, puis
+rescorent exactement les meilleurs candidats à partir des vecteurs d'origine
+(voir MemmapVectorDB). Deux quantificateurs sont disponibles :
+- "int8" : quantification scalaire, un octet par dimension et une échelle
+  par vecteur (environ 4× moins de mémoire qu'en float32) ;
+- "pq" : quantification produit, un octet par sous-vecteur de
+  subvector_dims dimensions (16× moins de mémoire avec 4 dimensions par
+  sous-vecteur). Les dictionnaires sont appris par k-means une fois la base
+  assez grande ; avant cela, la recherche reste exacte.
+"""
+
+import os
+from typing import Optional
+
+import numpy as np
+
+SUPPORTED_QUANTIZATIONS = ("none", "int8", "pq")
+
+# Nombre de centroïdes par sous-espace (un code tient sur un octet)
+_PQ_CENTROIDS = 256
+# Nombre de lignes nécessaires à l'apprentissage des dictionnaires
+_PQ_TRAIN_THRESHOLD = 10000
+_PQ_TRAIN_ITERATIONS = 12
+
+class ScalarQuantizer:
+    """Quantification int8 avec une échelle par vecteur."""
+
+    name = "int8"
+    is_trained = True
+    train_threshold = 0
+
+    def row_dtype(self, dimension: int) -> np.dtype:
+        """Type d'une ligne du fichier de codes."""
+        return np.dtype([("scale", "<f4"), ("codes", "i1", (dimension,))])
+
+    def train(self, sample: np.ndarray) -> None:
+        """Aucun apprentissage : l'échelle est calculée pour chaque vecteur."""
+
+    def encode(self, matrix: np.ndarray) -> np.ndarray:
+        """Encode des vecteurs float32 (une ligne par vecteur)."""
+        peaks = np.abs(matrix).max(axis=1)
+        scales = np.where(peaks == 0, 1, peaks) / 127
+        encoded = np.empty(len(matrix), dtype=self.row_dtype(matrix.shape[1]))
+        encoded["scale"] = scales
+        encoded["codes"] = np.clip(np.rint(matrix / scales[:, None]), -127, 127)
+        return encoded
+
+    def scores(self, encoded: np.ndarray, query: np.ndarray) -> np.ndarray:
+        """Produits scalaires approchés entre la requête et des lignes encodées."""
+        return (encoded["codes"].astype(np.float32) @ query) * encoded["scale"]
+
+class ProductQuantizer:
+    """Quantification produit avec des dictionnaires appris par k-means."""
+
+    name = "pq"
+    train_threshold = _PQ_TRAIN_THRESHOLD
+
+    def __init__(self, directory: str, subvector_dims: int = 4):
+        """Initialise le quantificateur.
+
+        Args:
+            directory: Répertoire du stockage, où est conservé le dictionnaire
+            subvector_dims: Nombre de dimensions par sous-vecteur
+        """
+        self.subvector_dims = subvector_dims
+        self.codebook_path = os.path.join(directory, "pq_codebook.npy")
+        self._codebook: Optional[np.ndarray] = None
+
+    @property
+    def is_trained(self) -> bool:
+        # Le dictionnaire a pu être appris par un autre processus
+        if self._codebook is None and os.path.exists(self.codebook_path):
+            self._codebook = np.load(self.codebook_path)
+        return self._codebook is not None
+
+    def _subvectors(self, matrix: np.ndarray) -> np.ndarray:
+        """Découpe des vecteurs en sous-vecteurs, complétés par des zéros."""
+        subvector_count = -(-matrix.shape[1] // self.subvector_dims)
+        padding = subvector_count * self.subvector_dims - matrix.shape[1]
+        if padding:
+            matrix = np.pad(matrix, ((0, 0), (0, padding)))
+        return matrix.reshape(len(matrix), subvector_count, self.subvector_dims)
+
+    def row_dtype(self, dimension: int) -> np.dtype:
+        """Type d'une ligne du fichier de codes."""
+        return np.dtype([("codes", "u1", (-(-dimension // self.subvector_dims),))])
+
+    @staticmethod
+    def _nearest(data: np.ndarray, centroids: np.ndarray) -> np.ndarray:
+        """Indice du centroïde le plus proche de chaque ligne."""
+        distances = (centroids ** 2).sum(axis=1)[None, :] - 2 * data @ centroids.T
+        return np.argmin(distances, axis=1)
+
+    def train(self, sample: np.ndarray) -> None:
+        """Apprend un dictionnaire par sous-espace et l'enregistre."""
+        subvectors = self._subvectors(sample)
+        rng = np.random.default_rng(0)
+        codebook = np.empty(
+            (subvectors.shape[1], _PQ_CENTROIDS, self.subvector_dims),
+            dtype=np.float32
+        )
+        for position in range(subvectors.shape[1]):
+            data = subvectors[:, position, :]
+            centroids = data[rng.choice(len(data), _PQ_CENTROIDS, replace=len(data) < _PQ_CENTROIDS)].copy()
+            for _ in range(_PQ_TRAIN_ITERATIONS):
+                assignments = self._nearest(data, centroids)
+                counts = np.bincount(assignments, minlength=_PQ_CENTROIDS)
+                filled = counts > 0
+                for dim in range(self.subvector_dims):
+                    sums = np.bincount(assignments, weights=data[:, dim], minlength=_PQ_CENTROIDS)
+                    centroids[filled, dim] = sums[filled] / counts[filled]
+            codebook[position] = centroids
+
+        temporary_path = f"{self.codebook_path}.tmp.npy"
+        np.save(temporary_path, codebook)
+        os.replace(temporary_path, self.codebook_path)
+        self._codebook = codebook
+
+    def encode(self, matrix: np.ndarray) -> np.ndarray:
+        """Encode des vecteurs float32 (une ligne par vecteur)."""
+        subvectors = self._subvectors(matrix)
+        encoded = np.empty(len(matrix), dtype=self.row_dtype(matrix.shape[1]))
+        for position in range(subvectors.shape[1]):
+            encoded["codes"][:, position] = self._nearest(subvectors[:, position, :], self._codebook[position])
+        return encoded
+
+    def scores(self, encoded: np.ndarray, query: np.ndarray) -> np.ndarray:
+        """Produits scalaires approchés, par tables de distances précalculées."""
+        tables = np.einsum("mkd,md->mk", self._codebook, self._subvectors(query[None, :])[0])
+        codes = encoded["codes"]
+        return tables[np.arange(codes.shape[1])[None, :], codes].sum(axis=1, dtype=np.float32)
+
+def create_quantizer(quantization: str, directory: str, subvector_dims: int = 4):
+    """Crée le quantificateur d'un stockage (None sans quantification)."""
+    if quantization not in SUPPORTED_QUANTIZATIONS:
+        raise ValueError(f"Quantification non supportée: {quantization}")
+    if quantization == "int8":
+        return ScalarQuantizer()
+    if quantization == "pq":
+        return ProductQuantizer(directory, subvector_dims)
+    return None
@@ -2,21 +2,24 @@
 Page de chat avec l'assistant documentaire.
 """
 import streamlit as st
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Optional
 from dsrag.knowledge_base import KnowledgeBase
 from dsrag.llm import OpenAIChatAPI
 from src.core.search_engine import SearchEngine, DocumentReference
 from src.core.knowledge_bases_manager import KnowledgeBasesManager
+from src.core.answer_stream import stream_chat_answer
+from src.core.context_builder import pack_context
 
 class ChatPage:
-    def __init__(self, kb_manager: KnowledgeBasesManager):
+    def __init__(self, kb_manager: KnowledgeBasesManager, search_engine: Optional[SearchEngine] = None):
         """Initialise la page de chat.
         
         Args:
             kb_manager: Gestionnaire de bases de connaissances
+            search_engine: Moteur de recherche partagé (créé si absent)
         """
         self.kb_manager = kb_manager
-        self.search_engine = SearchEngine()
+        self.search_engine = search_engine or SearchEngine(kb_manager=kb_manager)
         
         if 'messages' not in st.session_state:
             st.session_state.messages = []
@@ -194,45 +197,57 @@ class ChatPage:
                 st.error("Aucune base de connaissances valide sélectionnée!")
                 return
                 
-            # Recherche dans toutes les bases
-            relevant_segments = self.search_engine.search_knowledge_bases(
-                query=query,
-                knowledge_bases=knowledge_bases,
-                selected_kbs=st.session_state.selected_kbs,
-                selected_docs=st.session_state.selected_docs
-            )
-            
-            # Préparation du contexte avec indication des sources
-            context_parts = []
-            sorted_segments = sorted(relevant_segments, key=lambda x: x.relevance_score, reverse=True)
-            
-            # Préparation des segments pour le contexte
-            for i, segment in enumerate(sorted_segments, 1):
-                context = f"[Source {i}] {segment.text}"
-                context_parts.append(context)
-            
-            # Préparation de la réponse
-            context_text = "\n\n".join(context_parts)
-            system_prompt = f"""Tu es un assistant documentaire expert. Réponds à la question en te basant uniquement sur les sources fournies.
-            Cite tes sources en utilisant les numéros entre crochets [Source X].
-            Si tu ne trouves pas l'information dans les sources, dis-le clairement.
-            
-            Sources:
-            {context_text}
-            """
-            
-            messages = [
-                {"role": "system", "content": system_prompt},
-                {"role": "user", "content": query}
-            ]
-            
-            # Appel à l'API OpenAI
-            llm = OpenAIChatAPI()
-            answer = llm.make_llm_call(messages)
-            
-            # Affichage de la réponse
-            st.session_state.messages.append({"role": "assistant", "content": answer})
             with st.chat_message("assistant"):
-                st.markdown(answer)
-                self.render_source_summary(sorted_segments)
-                self.render_sources(sorted_segments)
+                # La réponse s'affiche au-dessus des sources, qui sont rendues dès la fin de la recherche
+                answer_placeholder = st.empty()
+                
+                # Recherche dans toutes les bases
+                with st.spinner("Recherche dans les documents..."):
+                    relevant_segments = self.search_engine.search_knowledge_bases(
+                        query=query,
+                        knowledge_bases=knowledge_bases,
+                        selected_kbs=st.session_state.selected_kbs,
+                        selected_docs=st.session_state.selected_docs
+                    )
+                
+                # Sélection des segments dans le budget de tokens du contexte
+                context = pack_context(relevant_segments)
+                self.render_source_summary(context.segments)
+                self.render_sources(context.segments)
+                st.caption(
+                    f"Contexte : {len(context.segments)} sources, "
+                    f"{context.tokens_used}/{context.token_budget} tokens"
+                )
+                
+                # Préparation de la réponse
+                context_text = context.text
+                system_prompt = f"""Tu es un assistant documentaire expert. Réponds à la question en te basant uniquement sur les sources fournies.
+                Cite tes sources en utilisant les numéros entre crochets [Source X].
+                Si tu ne trouves pas l'information dans les sources, dis-le clairement.
+                
+                Sources:
+                {context_text}
+                """
+                
+                messages = [
+                    {"role": "system", "content": system_prompt},
+                    {"role": "user", "content": query}
+                ]
+                
+                # Appel à l'API OpenAI en streaming : les tokens sont affichés dès leur arrivée
+                answer = ""
+                try:
+                    for token in stream_chat_answer(OpenAIChatAPI(), messages):
+                        answer += token
+                        answer_placeholder.markdown(answer + "▌")
+                except Exception as e:
+                    st.error(f"Erreur lors de la génération de la réponse: {str(e)}")
+                answer_placeholder.markdown(answer)
+            
+            # Conservation de la réponse complète dans l'historique
+            if answer:
+                st.session_state.messages.append({
+                    "role": "assistant",
+                    "content": answer,
+                    "context_tokens": context.tokens_used
+                })
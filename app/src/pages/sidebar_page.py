@@ -4,17 +4,40 @@ Page de gestion des bases de connaissances.
 import streamlit as st
 import tempfile
 import os
-from typing import List
+from typing import List, Optional
 from src.core.knowledge_bases_manager import KnowledgeBasesManager
+from src.core.ingestion import IngestionItem
+from src.core.ingestion_queue import FINAL_STATUSES, IngestionWorker, get_shared_worker
+from src.utils.hashing import bytes_sha256
 from dsrag.knowledge_base import KnowledgeBase
 from src.pages import components
 
+# Libellés des états d'ingestion d'un document
+INGESTION_STATUS_LABELS = {
+    "queued": "en attente",
+    "parsing": "analyse",
+    "embedding": "indexation",
+    "done": "terminé",
+    "skipped": "ignoré",
+    "failed": "erreur",
+}
+
 class KnowledgeBasePage:
     """Page de gestion des bases de connaissances."""
     
-    def __init__(self, kb_manager: KnowledgeBasesManager):
-        """Initialise la page avec le gestionnaire de bases."""
+    def __init__(self, kb_manager: KnowledgeBasesManager, ingestion_worker: Optional[IngestionWorker] = None):
+        """Initialise la page avec le gestionnaire de bases.
+        
+        Args:
+            kb_manager: Gestionnaire de bases de connaissances
+            ingestion_worker: Worker d'ingestion partagé (démarré si absent)
+        """
         self.kb_manager = kb_manager
+        self.ingestion_worker = ingestion_worker or get_shared_worker(kb_manager)
+        if 'enqueued_uploads' not in st.session_state:
+            st.session_state.enqueued_uploads = set()
+        if 'active_ingestion_jobs' not in st.session_state:
+            st.session_state.active_ingestion_jobs = set()
         if 'current_kb' not in st.session_state:
             st.session_state.current_kb = None
         if 'active_expander' not in st.session_state:
@@ -53,26 +76,86 @@ class KnowledgeBasePage:
             st.error(f"Erreur lors du chargement: {str(e)}")
     
     def handle_document_upload(self, files: List[tempfile.NamedTemporaryFile]):
-        """Gère l'upload de documents."""
+        """Place les documents déposés dans la file d'ingestion."""
+        kb_id = st.session_state.current_kb_id
+        
+        # Le composant d'upload renvoie les mêmes fichiers à chaque réexécution
+        new_files = []
         for uploaded_file in files:
-            with tempfile.NamedTemporaryFile(delete=False, suffix='.pdf') as tmp_file:
-                tmp_file.write(uploaded_file.getvalue())
-                tmp_path = tmp_file.name
-                
-                try:
-                    st.session_state.current_kb.add_document(
-                        doc_id=uploaded_file.name,
-                        file_path=tmp_path,
-                        auto_context_config={
-                            "use_generated_title": False,
-                            "document_title": uploaded_file.name.replace('.pdf', '')
-                        }
-                    )
-                    st.success(f"Document {uploaded_file.name} ajouté!")
-                except Exception as e:
-                    st.error(f"Erreur: {str(e)}")
-                finally:
-                    os.unlink(tmp_path)
+            content = uploaded_file.getvalue()
+            upload_key = (kb_id, uploaded_file.name, bytes_sha256(content))
+            if upload_key not in st.session_state.enqueued_uploads:
+                new_files.append((uploaded_file.name, content, upload_key))
+        if not new_files:
+            return
+        
+        queue = self.ingestion_worker.queue
+        try:
+            job_id, job_directory = queue.create_job_directory()
+            items = []
+            for position, (file_name, content, upload_key) in enumerate(new_files):
+                file_path = os.path.join(job_directory, f"{position}.pdf")
+                with open(file_path, 'wb') as f:
+                    f.write(content)
+                document_title = file_name.replace('.pdf', '')
+                items.append(IngestionItem(
+                    doc_id=file_name,
+                    file_path=file_path,
+                    document_title=document_title,
+                    content_hash=upload_key[2],
+                    auto_context_config={
+                        "use_generated_title": False,
+                        "document_title": document_title
+                    }
+                ))
+            queue.enqueue(job_id, kb_id, items)
+        except Exception as e:
+            st.error(f"Erreur lors de la mise en file: {str(e)}")
+            return
+        
+        st.session_state.enqueued_uploads.update(upload_key for _, _, upload_key in new_files)
+        st.session_state.active_ingestion_jobs.add(job_id)
+        self.ingestion_worker.wake()
+        st.info(f"{len(items)} document(s) en attente d'ingestion")
+    
+    def render_ingestion_jobs(self, kb_id: str):
+        """Affiche l'état des derniers lots d'ingestion d'une base."""
+        queue = self.ingestion_worker.queue
+        jobs = queue.list_jobs(kb_id, limit=5)
+        if not jobs:
+            return
+        
+        st.markdown("#### Ingestions")
+        has_active_job = False
+        for job in jobs:
+            details = queue.get_job(job['job_id'])
+            items = details['items'] if details else []
+            processed = sum(item['status'] in FINAL_STATUSES for item in items)
+            
+            if job['status'] in ("queued", "running"):
+                has_active_job = True
+                st.session_state.active_ingestion_jobs.add(job['job_id'])
+                st.progress(
+                    processed / len(items) if items else 1.0,
+                    text=f"{processed}/{len(items)} documents traités"
+                )
+                shown = [item for item in items if item['status'] not in FINAL_STATUSES]
+            else:
+                if job['job_id'] in st.session_state.active_ingestion_jobs:
+                    # Rafraîchir les compteurs de documents depuis le catalogue
+                    st.session_state.active_ingestion_jobs.discard(job['job_id'])
+                    st.session_state.knowledge_bases = self.kb_manager.list_knowledge_bases()
+                shown = items
+            
+            for item in shown:
+                label = INGESTION_STATUS_LABELS.get(item['status'], item['status'])
+                if item['status'] == "done" and item['action'] == "update":
+                    label = "mis à jour"
+                detail = item['error'] or item['message']
+                st.caption(f"{item['doc_id']} : {label}" + (f" ({detail})" if detail else ""))
+        
+        if has_active_job:
+            st.button("🔄 Actualiser", key=f"refresh_ingestion_{kb_id}")
     
     def handle_expander_change(self, kb_id: str, is_expanded: bool):
         """Gère le changement d'état d'un expander."""
@@ -144,6 +227,7 @@ class KnowledgeBasePage:
                     )
                     if uploaded_files:
                         self.handle_document_upload(uploaded_files)
+                    self.render_ingestion_jobs(kb_id)
                     
                     st.divider()
                     
@@ -0,0 +1,29 @@
+"""
+Verrou exclusif entre processus sur un fichier.
+"""
+
+from contextlib import contextmanager
+from typing import Iterator
+
+try:
+    import fcntl
+except ImportError:
+    # Windows : seul le verrou entre threads de l'appelant s'applique
+    fcntl = None
+
+@contextmanager
+def exclusive_file_lock(lock_path: str) -> Iterator[None]:
+    """Tient un verrou exclusif (flock) sur un fichier, créé si nécessaire.
+
+    Le verrou n'est pas réentrant : un même processus ne doit pas le reprendre
+    avant de l'avoir relâché. Sans fcntl, il ne fait rien.
+    """
+    if fcntl is None:
+        yield
+        return
+    with open(lock_path, "a") as f:
+        fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(f.fileno(), fcntl.LOCK_UN)
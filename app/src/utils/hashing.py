@@ -0,0 +1,17 @@
+"""
+Fonctions de hachage de contenu.
+"""
+
+import hashlib
+
+def file_sha256(file_path: str, block_size: int = 1 << 20) -> str:
+    """Retourne l'empreinte SHA-256 hexadécimale du contenu d'un fichier."""
+    digest = hashlib.sha256()
+    with open(file_path, 'rb') as f:
+        for block in iter(lambda: f.read(block_size), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+def bytes_sha256(data: bytes) -> str:
+    """Retourne l'empreinte SHA-256 hexadécimale de données binaires."""
+    return hashlib.sha256(data).hexdigest()
@@ -0,0 +1,66 @@
+"""
+Configuration commune des tests.
+
+Les modèles d'embedding et de reranking sont remplacés par des modèles
+locaux déterministes : aucun test n'appelle d'API.
+"""
+
+import hashlib
+import os
+import sys
+from typing import List, Optional
+
+import numpy as np
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "app"))
+
+from dsrag.embedding import Embedding
+from dsrag.reranker import Reranker
+
+from src.core.knowledge_bases_manager import KnowledgeBasesManager
+
+class HashEmbedding(Embedding):
+    """Embedding déterministe : sac de mots projeté par hachage."""
+
+    calls = 0
+
+    def __init__(self, dimension: int = 32):
+        super().__init__(dimension)
+
+    def _embed(self, text: str) -> List[float]:
+        vector = np.zeros(self.dimension, dtype=np.float32)
+        for word in text.lower().split():
+            vector[int(hashlib.sha1(word.encode("utf-8")).hexdigest(), 16) % self.dimension] += 1
+        return (vector if vector.any() else vector + 1).tolist()
+
+    def get_embeddings(self, text, input_type: Optional[str] = None):
+        HashEmbedding.calls += 1
+        if isinstance(text, str):
+            return self._embed(text)
+        return [self._embed(t) for t in text]
+
+class CountingReranker(Reranker):
+    """Reranker qui conserve l'ordre vectoriel et compte ses appels (toutes instances confondues)."""
+
+    calls = 0
+
+    def rerank_search_results(self, query: str, search_results: list) -> list:
+        CountingReranker.calls += 1
+        return [{**result, "similarity": 0.9} for result in search_results]
+
+@pytest.fixture
+def manager(tmp_path, monkeypatch) -> KnowledgeBasesManager:
+    """Gestionnaire sur un répertoire temporaire, avec les modèles locaux."""
+    manager = KnowledgeBasesManager(storage_directory=str(tmp_path))
+    monkeypatch.setattr(
+        manager, "_create_embedding_model",
+        lambda *args, **kwargs: manager._wrap_embedding_model(HashEmbedding())
+    )
+    monkeypatch.setattr(
+        manager, "_create_reranker",
+        lambda *args, **kwargs: manager._wrap_reranker(CountingReranker())
+    )
+    CountingReranker.calls = 0
+    HashEmbedding.calls = 0
+    return manager
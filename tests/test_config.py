@@ -0,0 +1,9 @@
+from src.config import config
+from src.config.load_config import load_config
+
+def test_load_config_matches_package_config():
+    loaded = load_config()
+
+    assert loaded.embedding.cache_enabled == config.embedding.cache_enabled
+    assert loaded.reranker.cache_enabled == config.reranker.cache_enabled
+    assert loaded.reranker.cache_max_entries == config.reranker.cache_max_entries
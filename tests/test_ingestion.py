@@ -0,0 +1,49 @@
+from src.core.ingestion import IngestionItem, IngestionPipeline
+
+# Sans appel LLM : titre fourni, ni résumés ni sectionnement sémantique
+_NO_LLM = {
+    "auto_context_config": {
+        "use_generated_title": False,
+        "get_document_summary": False,
+        "get_section_summaries": False,
+    },
+    "semantic_sectioning_config": {"use_semantic_sectioning": False},
+}
+
+def _write_text(tmp_path, name: str, text: str) -> str:
+    path = tmp_path / name
+    path.write_text(text, encoding="utf-8")
+    return str(path)
+
+def _item(doc_id: str, file_path: str) -> IngestionItem:
+    return IngestionItem(doc_id=doc_id, file_path=file_path, document_title=doc_id, **_NO_LLM)
+
+def test_ingest_writes_document(manager, tmp_path):
+    manager.create_knowledge_base("kb", chunk_db_backend="sqlite", vector_db_backend="memmap")
+    file_path = _write_text(tmp_path, "notice.txt", "Le frein de service agit sur les quatre roues. " * 40)
+
+    items = IngestionPipeline(manager, max_processes=1, max_threads=2).ingest("kb", [_item("notice", file_path)])
+
+    assert [(item.status, item.error) for item in items] == [("done", None)]
+    kb = manager.get_knowledge_base("kb")
+    assert manager.get_document_ids("kb") == {"notice"}
+    assert kb.chunk_db.get_chunk_text("notice", 0)
+    assert kb.vector_db.get_num_vectors() == manager.catalog.get("kb")["chunk_count"] > 0
+
+def test_ingest_replaces_modified_document_and_skips_duplicate(manager, tmp_path):
+    manager.create_knowledge_base("kb", chunk_db_backend="sqlite", vector_db_backend="memmap")
+    pipeline = IngestionPipeline(manager, max_processes=1, max_threads=2)
+    pipeline.ingest("kb", [_item("notice", _write_text(tmp_path, "v1.txt", "Première version du texte."))])
+
+    items = pipeline.ingest("kb", [
+        _item("notice", _write_text(tmp_path, "v2.txt", "Seconde version du texte.")),
+        _item("copie", _write_text(tmp_path, "v1-bis.txt", "Première version du texte.")),
+    ])
+
+    assert [(item.doc_id, item.action, item.status) for item in items] == [
+        ("notice", "update", "done"),
+        ("copie", "add", "skipped"),
+    ]
+    kb = manager.get_knowledge_base("kb")
+    assert "Seconde" in kb.chunk_db.get_chunk_text("notice", 0)
+    assert manager.get_document_ids("kb") == {"notice"}
@@ -0,0 +1,42 @@
+import threading
+
+import pytest
+
+def _lock_free_elsewhere(manager) -> bool:
+    """Indique si un autre thread peut prendre le verrou du cache du gestionnaire."""
+    acquired = []
+
+    def probe():
+        acquired.append(manager._lock.acquire(timeout=1))
+        if acquired[-1]:
+            manager._lock.release()
+
+    thread = threading.Thread(target=probe)
+    thread.start()
+    thread.join()
+    return acquired[0]
+
+def test_create_existing_base_requires_exists_ok(manager):
+    manager.create_knowledge_base("kb", chunk_db_backend="sqlite", vector_db_backend="memmap")
+
+    with pytest.raises(ValueError):
+        manager.create_knowledge_base("kb", chunk_db_backend="sqlite", vector_db_backend="memmap")
+
+def test_recreate_deletes_existing_base_outside_cache_lock(manager, monkeypatch):
+    manager.create_knowledge_base("kb", title="Ancienne", chunk_db_backend="sqlite", vector_db_backend="memmap")
+    delete = manager.delete_knowledge_base
+    lock_free = []
+
+    def spy(kb_id):
+        lock_free.append(_lock_free_elsewhere(manager))
+        return delete(kb_id)
+
+    monkeypatch.setattr(manager, "delete_knowledge_base", spy)
+
+    kb = manager.create_knowledge_base(
+        "kb", title="Nouvelle", chunk_db_backend="sqlite", vector_db_backend="memmap", exists_ok=True
+    )
+
+    assert lock_free == [True]
+    assert manager.get_knowledge_base("kb") is kb
+    assert manager.catalog.get("kb")["title"] == "Nouvelle"
@@ -0,0 +1,68 @@
+import pytest
+
+import src.core.memmap_vector_db as memmap_vector_db
+from src.core.ingestion import IngestionItem, IngestionPipeline
+from src.core.search_engine import SearchEngine
+
+from tests.conftest import CountingReranker
+
+_TEXT = " ".join(
+    f"Paragraphe {i} : le frein numéro {i} se règle avec la vis de réglage {i}."
+    for i in range(60)
+)
+
+@pytest.fixture
+def kb(manager, tmp_path):
+    manager.create_knowledge_base("kb", chunk_db_backend="sqlite", vector_db_backend="memmap")
+    path = tmp_path / "notice.txt"
+    path.write_text(_TEXT, encoding="utf-8")
+    IngestionPipeline(manager, max_processes=1, max_threads=2).ingest("kb", [IngestionItem(
+        doc_id="notice",
+        file_path=str(path),
+        document_title="Notice",
+        auto_context_config={"use_generated_title": False, "get_document_summary": False, "get_section_summaries": False},
+        semantic_sectioning_config={"use_semantic_sectioning": False},
+        chunking_config={"chunk_size": 200, "min_length_for_chunking": 100},
+    )])
+    kb = manager.get_knowledge_base("kb")
+    assert kb.vector_db.get_num_vectors() > 1
+    # Reranker sans cache persistant : chaque appel atteint le modèle
+    kb.reranker = CountingReranker()
+    CountingReranker.calls = 0
+    return kb
+
+@pytest.fixture
+def engine(manager):
+    return SearchEngine(kb_manager=manager)
+
+def test_global_rerank_is_the_only_reranker_call(engine, kb):
+    engine.global_rerank_enabled = True
+
+    references = engine.search_knowledge_bases("réglage du frein", [kb])
+
+    assert references
+    assert CountingReranker.calls == 1
+
+def test_reranker_runs_inside_query_without_global_rerank(engine, kb):
+    engine.global_rerank_enabled = False
+
+    engine.search_knowledge_bases("réglage du frein", [kb])
+
+    assert CountingReranker.calls >= 1
+
+@pytest.mark.parametrize("global_rerank", [False, True])
+def test_search_params_reach_vector_db_inside_query(engine, kb, monkeypatch, global_rerank):
+    engine.global_rerank_enabled = global_rerank
+    seen = []
+    current = memmap_vector_db.current_vector_search_params
+
+    def spy():
+        seen.append(current())
+        return seen[-1]
+
+    monkeypatch.setattr(memmap_vector_db, "current_vector_search_params", spy)
+
+    engine.search_knowledge_bases("réglage du frein", [kb], search_params={"nprobe": 7})
+
+    assert seen
+    assert all(params == {"nprobe": 7} for params in seen)
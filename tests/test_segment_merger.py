@@ -0,0 +1,76 @@
+from src.core.document_reference import DocumentReference
+from src.core.segment_merger import merge_document_references
+
+def _ref(start, end, score, doc_id="doc", kb_id="kb", mode="balanced"):
+    return DocumentReference(
+        doc_id=doc_id,
+        kb_id=kb_id,
+        text=f"{doc_id}[{start}:{end}]",
+        relevance_score=score,
+        page_numbers=(1, 1),
+        search_mode=mode,
+        chunk_range=(start, end),
+    )
+
+def _page_ref(start, end, score):
+    return DocumentReference(
+        doc_id="doc",
+        kb_id="kb",
+        text="",
+        relevance_score=score,
+        page_numbers=(start, end),
+        search_mode="direct_search",
+    )
+
+def _ranges(references):
+    return sorted(reference.chunk_range for reference in references)
+
+def test_contained_range_is_dropped():
+    merged, duplicates = merge_document_references([_ref(0, 10, 0.9), _ref(2, 5, 0.6)])
+
+    assert _ranges(merged) == [(0, 10)]
+    assert duplicates == 1
+
+def test_container_replaces_better_contained_range_and_keeps_its_score():
+    merged, duplicates = merge_document_references([_ref(2, 5, 0.9), _ref(0, 10, 0.6)])
+
+    assert [(ref.chunk_range, ref.relevance_score) for ref in merged] == [((0, 10), 0.9)]
+    assert duplicates == 1
+
+def test_nearly_identical_ranges_keep_best():
+    merged, duplicates = merge_document_references([_ref(0, 10, 0.5), _ref(1, 10, 0.8)])
+
+    assert [(ref.chunk_range, ref.relevance_score) for ref in merged] == [((1, 10), 0.8)]
+    assert duplicates == 1
+
+def test_partial_overlap_keeps_both():
+    merged, duplicates = merge_document_references([_ref(0, 6, 0.9), _ref(4, 10, 0.7)])
+
+    assert _ranges(merged) == [(0, 6), (4, 10)]
+    assert duplicates == 0
+
+def test_chain_of_overlaps_keeps_coverage():
+    # A recouvre B, B recouvre C, mais A et C sont disjoints
+    merged, duplicates = merge_document_references([
+        _ref(0, 5, 0.9), _ref(4, 9, 0.5), _ref(8, 13, 0.7)
+    ])
+
+    assert _ranges(merged) == [(0, 5), (4, 9), (8, 13)]
+    assert [ref.relevance_score for ref in merged] == [0.9, 0.7, 0.5]
+    assert duplicates == 0
+
+def test_same_range_in_other_document_or_base_is_kept():
+    merged, duplicates = merge_document_references([
+        _ref(0, 5, 0.9), _ref(0, 5, 0.8, doc_id="other"), _ref(0, 5, 0.7, kb_id="other"),
+    ])
+
+    assert len(merged) == 3
+    assert duplicates == 0
+
+def test_page_ranges_are_inclusive():
+    merged, duplicates = merge_document_references([
+        _page_ref(3, 3, 0.9), _page_ref(3, 5, 0.4), _page_ref(6, 6, 0.8)
+    ])
+
+    assert sorted((ref.page_numbers, ref.relevance_score) for ref in merged) == [((3, 5), 0.9), ((6, 6), 0.8)]
+    assert duplicates == 1